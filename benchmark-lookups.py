@@ -0,0 +1,123 @@
+#!python3
+
+# Benchmark of lexicon backends (see grammalecte/lexicon.py): the same words go through each backend,
+# word by word (isValid, getMorph, stem) and by batch (isValidBatch, isValidTokenBatch).
+# With option --grammar, the paragraphs of the text file go through the grammar checker with each backend.
+
+import argparse
+import random
+import time
+import tracemalloc
+
+import grammalecte.lexicon as lex
+import grammalecte.tokenizer as tkz
+import grammalecte.text as txt
+from grammalecte.echo import echo
+
+
+def getWordsFromFile (spf):
+    "returns words of text file spf"
+    oTokenizer = tkz.Tokenizer("fr")
+    lWord = []
+    with open(spf, "r", encoding="utf-8") as hSrc:
+        for sLine in hSrc:
+            lWord.extend( dToken["sValue"]  for dToken in oTokenizer.genTokens(sLine)  if dToken["sType"] == "WORD" )
+    return lWord
+
+
+def getWordsFromDictionary (oDict, nWords):
+    "returns nWords words drawn from the dictionary, three out of eight being altered (capitalized, with a suffix or reversed)"
+    lFlex = list(set( sFlex  for sFlex, _, _ in oDict.iterEntries() ))
+    xRandom = random.Random(0)
+    lWord = []
+    for i in range(nWords):
+        sWord = xRandom.choice(lFlex)
+        if i % 8 == 1:
+            sWord = sWord.capitalize()
+        elif i % 8 == 3:
+            sWord = sWord + "z"
+        elif i % 8 == 5:
+            sWord = sWord[::-1]
+        lWord.append(sWord)
+    return lWord
+
+
+def timeFunc (func, nRepeat):
+    "returns (result, best time) of func() called nRepeat times"
+    fBest = None
+    for i in range(nRepeat):
+        fStart = time.perf_counter()
+        result = func()
+        fTime = time.perf_counter() - fStart
+        fBest = fTime  if fBest is None  else min(fBest, fTime)
+    return result, fBest
+
+
+def main ():
+    xParser = argparse.ArgumentParser()
+    xParser.add_argument("dictionary", help="name of the binary dictionary in grammalecte/_dictionaries (default: french.bdic)", type=str, nargs="?", default="french.bdic")
+    xParser.add_argument("-b", "--backends", help="lexicon backends, separated by commas (default: all)", type=str, default=",".join(lex.dBackend))
+    xParser.add_argument("-f", "--file", help="words of this text file (UTF-8) (default: words drawn from the dictionary)", type=str)
+    xParser.add_argument("-n", "--number", help="number of words drawn from the dictionary (default: 100000)", type=int, default=100000)
+    xParser.add_argument("-r", "--repeat", help="number of runs of each benchmark, the best time is kept (default: 3)", type=int, default=3)
+    xParser.add_argument("-m", "--memory", help="measure memory allocated by each backend (each backend is loaded twice)", action="store_true")
+    xParser.add_argument("-g", "--grammar", help="check paragraphs of the text file with the grammar checker (option --file required)", action="store_true")
+    xArgs = xParser.parse_args()
+
+    lBackend = xArgs.backends.split(",")
+    for sBackend in lBackend:
+        if sBackend not in lex.dBackend:
+            xParser.error("unknown backend: {} (known: {})".format(sBackend, ", ".join(lex.dBackend)))
+    oDict = lex.createBackend("packed", xArgs.dictionary)
+    echo(oDict.getInfo())
+    lWord = getWordsFromFile(xArgs.file)  if xArgs.file  else getWordsFromDictionary(oDict, xArgs.number)
+    echo("{:,} words ({:,} different)\n".format(len(lWord), len(set(lWord))))
+    nRepeat = max(1, xArgs.repeat)
+    if xArgs.grammar:
+        if not xArgs.file:
+            xParser.error("option --grammar requires option --file")
+        import grammalecte.fr as gce
+        with open(xArgs.file, "r", encoding="utf-8") as hSrc:
+            lParagraph = list(txt.getParagraph(hSrc.read()))
+
+    lBenchmark = [
+        ("isValid",             lambda oDict: [ oDict.isValid(sWord)  for sWord in lWord ]),
+        ("isValidBatch",        lambda oDict: oDict.isValidBatch(lWord)),
+        ("isValidTokenBatch",   lambda oDict: oDict.isValidTokenBatch(lWord)),
+        ("getMorph",            lambda oDict: [ oDict.getMorph(sWord)  for sWord in lWord ]),
+        ("stem",                lambda oDict: [ oDict.stem(sWord)  for sWord in lWord ]),
+    ]
+    dReference = {}
+    echo("{:<14} {:>10} {:>12}".format("backend", "load (s)", "memory (MB)") + "".join( " {:>18}".format(sName)  for sName, _ in lBenchmark ) + (" {:>12}".format("grammar")  if xArgs.grammar  else ""))
+    for sBackend in lBackend:
+        sMemory = "-"
+        if xArgs.memory:
+            # separate loading: tracing allocations slows down loading and the following benchmarks
+            tracemalloc.start()
+            oDict = lex.createBackend(sBackend, xArgs.dictionary)
+            sMemory = "{:.1f}".format(tracemalloc.get_traced_memory()[0] / 1000000)
+            tracemalloc.stop()
+            del oDict
+        fStart = time.perf_counter()
+        oDict = lex.createBackend(sBackend, xArgs.dictionary)
+        fLoadTime = time.perf_counter() - fStart
+        sLine = "{:<14} {:>10.3f} {:>12}".format(sBackend, fLoadTime, sMemory)
+        lDiff = []
+        for sName, func in lBenchmark:
+            result, fTime = timeFunc(lambda: func(oDict), nRepeat)
+            sLine += " {:>18}".format("{:,.0f} w/s".format(len(lWord) / fTime))
+            if sName not in dReference:
+                dReference[sName] = result
+            elif result != dReference[sName]:
+                lDiff.append(sName)
+        if xArgs.grammar:
+            gce.load(oDict)
+            _, fTime = timeFunc(lambda: [ gce.parse(sParagraph)  for sParagraph in lParagraph ], nRepeat)
+            sLine += " {:>10.3f} s".format(fTime)
+        echo(sLine)
+        if lDiff:
+            echo("# Error. Results differ from the first backend: " + ", ".join(lDiff))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!python3
+
+# Build a binary dictionary (.bdic) from a lexicon: one entry per line, flexion, stem and tags separated by tabulations.
+# Work is split by first character of flexions across a pool of processes (see grammalecte/dawg.py).
+# With option --speedup, the dictionary is built with 1, 2, 4… processes: binaries must be identical.
+# With option --profile, arcs and nodes are sorted according to a profile of lookups (see record-profile.py).
+
+import os
+import argparse
+import tempfile
+import time
+
+from grammalecte.dawg import DAWG
+from grammalecte.echo import echo
+
+
+def buildDictionary (spfLexicon, spfDest, xArgs, nProcess):
+    "builds the dictionary of lexicon spfLexicon with nProcess processes, writes it in spfDest, returns time of build"
+    fStartTime = time.perf_counter()
+    oDawg = DAWG(spfLexicon, xArgs.name, xArgs.stemming, nRunSize=xArgs.run_size, nProcess=nProcess, spfProfile=xArgs.profile)
+    fBuildTime = time.perf_counter() - fStartTime
+    oDawg.createBinary(spfDest, xArgs.method)
+    return fBuildTime
+
+
+def main ():
+    xParser = argparse.ArgumentParser()
+    xParser.add_argument("lexicon", help="lexicon file (UTF-8)", type=str)
+    xParser.add_argument("-o", "--output", help="binary dictionary to write (default: <lexicon>.bdic)", type=str)
+    xParser.add_argument("-n", "--name", help="name of language (default: French)", type=str, default="French")
+    xParser.add_argument("-s", "--stemming", help="stemming method: A (affixes), S (suffixes), N (none) (default: S)", type=str, choices=["A", "S", "N"], default="S")
+    xParser.add_argument("-m", "--method", help="binary format (default: 1)", type=int, choices=range(1, 7), default=1)
+    xParser.add_argument("-r", "--run_size", help="words sorted in memory at once, 0: no limit (default: 1000000)", type=int, default=1000000)
+    xParser.add_argument("-j", "--jobs", help="number of processes (default: number of CPUs)", type=int, default=os.cpu_count() or 1)
+    xParser.add_argument("-p", "--profile", help="profile of lookups written by record-profile.py", type=str)
+    xParser.add_argument("--speedup", help="build with 1, 2, 4… processes up to --jobs, report speedups", action="store_true")
+    xArgs = xParser.parse_args()
+
+    nJobs = max(1, xArgs.jobs)
+    spfDest = xArgs.output or xArgs.lexicon[:xArgs.lexicon.rfind(".")] + ".bdic"
+    if not xArgs.speedup:
+        fBuildTime = buildDictionary(xArgs.lexicon, spfDest, xArgs, nJobs)
+        echo("{} written ({} processes, build: {:.1f} s)".format(spfDest, nJobs, fBuildTime))
+        return
+    lProcess = sorted(set( [ 2**i  for i in range(nJobs.bit_length())  if 2**i < nJobs ] + [nJobs] ))
+    lResult = []
+    with tempfile.TemporaryDirectory() as spTemp:
+        for nProcess in lProcess:
+            spfPart = os.path.join(spTemp, "{}.bdic".format(nProcess))
+            fBuildTime = buildDictionary(xArgs.lexicon, spfPart, xArgs, nProcess)
+            with open(spfPart, "rb") as hSrc:
+                by = hSrc.read()
+            lResult.append((nProcess, fBuildTime, by))
+        with open(spfDest, "wb") as hDst:
+            hDst.write(lResult[0][2])
+    echo("\n{:>10} {:>10} {:>8}".format("processes", "build (s)", "speedup"))
+    for nProcess, fBuildTime, by in lResult:
+        echo("{:>10} {:>10.1f} {:>8.2f}".format(nProcess, fBuildTime, lResult[0][1] / fBuildTime))
+        if by != lResult[0][2]:
+            echo("# Error. Binary dictionary differs from the one built by 1 process.")
+    echo("{} written (CPUs: {})".format(spfDest, os.cpu_count()))
+
+
+if __name__ == '__main__':
+    main()
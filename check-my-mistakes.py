@@ -13,16 +13,15 @@ import grammalecte.fr.lexicographe as lxg
 import grammalecte.fr.textformatter as tf
 import grammalecte.text as txt
 import grammalecte.tokenizer as tkz
+import grammalecte.lexicon as lex
 from grammalecte.echo import echo
 
 
 
 def generateText (iParagraph, sText, oTokenizer, oDict, bJSON, nWidth=100, bDebug=False, bEmptyIfNoErrors=False):
     aGrammErrs = gce.parse(sText, "FR", bDebug)
-    aSpellErrs = []
-    for dToken in oTokenizer.genTokens(sText):
-        if dToken['sType'] == "WORD" and not oDict.isValidToken(dToken['sValue']):
-            aSpellErrs.append(dToken)
+    lWordToken = [ dToken  for dToken in oTokenizer.genTokens(sText)  if dToken['sType'] == "WORD" ]
+    aSpellErrs = [ dToken  for dToken, bValid in zip(lWordToken, oDict.isValidTokenBatch([ dToken['sValue']  for dToken in lWordToken ]))  if not bValid ]
     if bEmptyIfNoErrors and not aGrammErrs and not aSpellErrs:
         return ""
     if not bJSON:
@@ -39,9 +38,16 @@ def main ():
     xParser.add_argument("-w", "--width", help="width in characters (40 < width < 200; default: 100)", type=int, choices=range(40,201,10), default=100)
     xParser.add_argument("-tf", "--textformatter", help="auto-format text according to typographical rules", action="store_true")
     xParser.add_argument("-tfo", "--textformatteronly", help="auto-format text and disable grammar checking (only with option 'file' or 'file_to_file')", action="store_true")
+    xParser.add_argument("-l", "--lexicon", help="lexicon backend (default: packed)", type=str, choices=list(lex.dBackend), default="packed")
+    xParser.add_argument("-u", "--user_lexicon", help="add words of this lexicon file (UTF-8): one entry per line, a word or “word<TAB>lemma<TAB>tags” (option repeatable)", type=str, action="append", default=[])
+    xParser.add_argument("-li", "--lemma_index", help="index forms of lemmas for suggestions of gender and number (several seconds at start without --cache)", action="store_true")
+    xParser.add_argument("-c", "--cache", help="directory where files built from the dictionary (index of lemmas, snapshots) are saved to be reused (default: {})".format(lex.spUserCache), type=str, default=lex.spUserCache)
     xArgs = xParser.parse_args()
 
-    gce.load()
+    oDict = lex.createBackend(xArgs.lexicon, bLemmaIndex=xArgs.lemma_index, spCache=xArgs.cache)
+    for spfLexicon in xArgs.user_lexicon:
+        oDict.loadOverlay(os.path.basename(spfLexicon), spfLexicon)
+    gce.load(oDict)
     gce.setOptions({"html": True})
     oDict = gce.getDictionary()
     oTokenizer = tkz.Tokenizer("fr")
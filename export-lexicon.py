@@ -0,0 +1,56 @@
+#!python3
+
+# Export a binary dictionary (.bdic) as a lexicon: one entry per line, flexion, stem and tags separated by tabulations.
+# Work is split by first character of flexions across a pool of processes.
+
+import sys
+import os
+import argparse
+import tempfile
+import multiprocessing
+import time
+
+from grammalecte.ibdawg import IBDAWG
+from grammalecte.echo import echo
+
+
+def exportEntries (tArgs):
+    "writes entries of dictionary sDicName beginning with sPrefix in spfDest, returns number of entries"
+    sDicName, sPrefix, spfDest = tArgs
+    oDict = IBDAWG(sDicName)
+    nEntry = 0
+    with open(spfDest, "w", encoding="utf-8", newline="\n") as hDst:
+        for sFlex, sStem, sTags in oDict.iterEntries(sPrefix):
+            hDst.write("{}\t{}\t{}\n".format(sFlex, sStem, sTags))
+            nEntry += 1
+    return nEntry
+
+
+def main ():
+    xParser = argparse.ArgumentParser()
+    xParser.add_argument("dictionary", help="name of the binary dictionary in grammalecte/_dictionaries (default: french.bdic)", type=str, nargs="?", default="french.bdic")
+    xParser.add_argument("-o", "--output", help="lexicon file to write (default: <dictionary>.lex)", type=str)
+    xParser.add_argument("-j", "--jobs", help="number of processes (default: number of CPUs)", type=int, default=os.cpu_count() or 1)
+    xArgs = xParser.parse_args()
+
+    fStartTime = time.time()
+    oDict = IBDAWG(xArgs.dictionary)
+    echo(oDict.getInfo())
+    spfDest = xArgs.output or xArgs.dictionary[:xArgs.dictionary.rfind(".")] + ".lex"
+    # one task per first character (first level of the word graph)
+    lPrefix = [ oDict.lArcVal[nVal]  for nVal, _ in oDict._getArcs(0)  if nVal < oDict.nChar ]
+    with tempfile.TemporaryDirectory() as spTemp:
+        lTask = [ (xArgs.dictionary, sPrefix, os.path.join(spTemp, "{}.lex".format(i)))  for i, sPrefix in enumerate(lPrefix) ]
+        with multiprocessing.Pool(max(1, xArgs.jobs)) as xPool:
+            lCount = xPool.map(exportEntries, lTask, chunksize=1)
+        with open(spfDest, "w", encoding="utf-8", newline="\n") as hDst:
+            hDst.write("# Lexicon exported from {}\n# {}\n".format(xArgs.dictionary, oDict.sHeader))
+            for _, _, spfPart in lTask:
+                with open(spfPart, "r", encoding="utf-8") as hSrc:
+                    for sLine in hSrc:
+                        hDst.write(sLine)
+    echo("{:,} entries written in {} ({} processes, {:.1f} s)".format(sum(lCount), spfDest, xArgs.jobs, time.time() - fStartTime))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Bloom filter
+# License: MPL 2
+
+import math
+import hashlib
+
+
+class BloomFilter:
+    """Set of strings in a fixed number of bits: “s in oBloomFilter” may be wrong if True (false positive), never if False.
+    Positions of bits are computed from a blake2b hash of each string (double hashing)."""
+
+    def __init__ (self, nItems, fFalsePositiveRate=0.01, nMaxBytes=0):
+        "filter for <nItems> strings with a rate of false positives of <fFalsePositiveRate>, in <nMaxBytes> bytes at most (0: no limit)"
+        if not 0 < fFalsePositiveRate < 1:
+            raise ValueError("# Error. False positive rate must be between 0 and 1: {}".format(fFalsePositiveRate))
+        nItems = max(nItems, 1)
+        nBits = math.ceil(-nItems * math.log(fFalsePositiveRate) / (math.log(2) ** 2))
+        if nMaxBytes:
+            nBits = min(nBits, nMaxBytes * 8)
+        self.nBits = max(nBits, 8)
+        self.nHash = max(1, round(self.nBits / nItems * math.log(2)))
+        self.nItems = 0
+        self.byBits = bytearray((self.nBits + 7) // 8)
+
+    def _getHashes (self, s):
+        "returns two hashes of string s: positions of bits are hash1 + i * hash2 (modulo number of bits), for i from 0 to nHash-1"
+        byHash = hashlib.blake2b(s.encode("utf-8"), digest_size=16).digest()
+        return int.from_bytes(byHash[:8], byteorder='little'), int.from_bytes(byHash[8:], byteorder='little') | 1
+
+    def add (self, s):
+        nHash, nStep = self._getHashes(s)
+        for i in range(self.nHash):
+            nPos = nHash % self.nBits
+            self.byBits[nPos >> 3] |= 1 << (nPos & 7)
+            nHash += nStep
+        self.nItems += 1
+
+    def __contains__ (self, s):
+        nHash, nStep = self._getHashes(s)
+        byBits = self.byBits
+        nBits = self.nBits
+        for i in range(self.nHash):
+            nPos = nHash % nBits
+            if not (byBits[nPos >> 3] & (1 << (nPos & 7))):
+                return False
+            nHash += nStep
+        return True
+
+    def getFalsePositiveRate (self):
+        "returns the expected rate of false positives, according to the number of strings added"
+        return (1 - math.exp(-self.nHash * self.nItems / self.nBits)) ** self.nHash
+
+    def getInfo (self):
+        return "  Bloom filter: {:>10,} strings,  {:>10,} bytes,  {} hashes,  false positives: {:.2%}\n" \
+                .format(self.nItems, len(self.byBits), self.nHash, self.getFalsePositiveRate())
+
+    def toBytes (self, sTag=""):
+        """returns the filter as bytes, with sTag (a string without “/”: e.g. what the filter was built from)
+        Format: /pybloom/1/[tag]/[number of bits]/[number of hashes]/[number of strings] + 4 bytes of \\0 + bits"""
+        return "/pybloom/1/{}/{}/{}/{}".format(sTag, self.nBits, self.nHash, self.nItems).encode("utf-8") + b"\0\0\0\0" + bytes(self.byBits)
+
+    @classmethod
+    def fromBytes (cls, by):
+        "returns (filter, tag) from bytes created by toBytes()"
+        if by[0:11] != b"/pybloom/1/":
+            raise ValueError("# Error. Not a Bloom filter. Header: {}".format(by[0:11]))
+        info, bits = by.split(b"\0\0\0\0", 1)
+        sTag, sBits, sHash, sItems = str(info[11:], "utf-8").split("/")
+        oBloomFilter = cls.__new__(cls)
+        oBloomFilter.nBits = int(sBits)
+        oBloomFilter.nHash = int(sHash)
+        oBloomFilter.nItems = int(sItems)
+        oBloomFilter.byBits = bytearray(bits)
+        if len(oBloomFilter.byBits) != (oBloomFilter.nBits + 7) // 8:
+            raise ValueError("# Error. Bloom filter truncated.")
+        return oBloomFilter, sTag
@@ -12,6 +12,11 @@
 import sys
 import os
 import collections
+import heapq
+import itertools
+import marshal
+import multiprocessing
+import tempfile
 
 from . import str_transform as st
 from .progressbar import ProgressBar
@@ -24,8 +29,22 @@ class DAWG:
     # A word is a list of numbers [ c1, c2, c3 . . . cN, iAffix, iTags]
     # Each arc is an index in self.lArcVal, where are stored characters, suffix/affix codes for stemming and tags.
     # Important: As usual, the last node (after ‘iTags’) is tagged final, AND the node after ‘cN’ is ALSO tagged final.
+    # Words are encoded while the lexicon is read, and sorted by runs of <nRunSize> words: if there are several runs,
+    # they are written in temporary files, then merged while inserted in the graph (memory is bounded by the size of runs).
+    # With <nProcess> processes, words are split by first arc value, groups of more than <nShardSize> words by longer prefixes
+    # (see _genShards): each shard is built by a process without its prefix (see buildShard), then shards are merged in order,
+    # under the nodes of their prefix, nodes of shards being checked for duplication again (see _mergeShard).
+    # The graph is identical to the one built by a single process. Shards are sent to processes as they are read:
+    # at most <nShardPerProcess> shards per process are waiting to be built or merged (memory is bounded by the size of shards).
+    # With a profile of lookups (see IBDAWG.startProfile), arcs the most traversed come first in their node,
+    # and nodes reached by lookups come first in the binary dictionary (versions 2 to 6), the most reached next nodes first.
 
-    def __init__ (self, spfSrc, sLangName, cStemming):
+    nCodeOffset = 0x110000  # while reading, affix and tag codes are iAff/iTag + nCodeOffset (above any char code)
+    nBlockSize = 10000      # words per block in files of runs
+    nShardPerProcess = 2    # shards in flight per process (sent to the pool, not merged yet)
+    nShardSize = 20000      # words per shard at most (unless words of a shard are all the same)
+
+    def __init__ (self, spfSrc, sLangName, cStemming, nRunSize=1000000, nProcess=1, spfProfile=None):
         print("===== Direct Acyclic Word Graph - Minimal Acyclic Finite State Automaton =====")
         cStemming = cStemming.upper()
         if cStemming == "A":
@@ -38,7 +57,9 @@ class DAWG:
             print("# Error code: {}".format(cStemming))
             exit()
 
-        lEntry = []
+        nEntry = 0
+        lRun = []       # temporary files of sorted runs
+        lWord = []      # current run
         lChar = ['']; dChar = {}; nChar = 1; dCharOccur = {}
         lAff  = [];   dAff  = {}; nAff  = 0; dAffOccur = {}
         lTag  = [];   dTag  = {}; nTag  = 0; dTagOccur = {}
@@ -75,19 +96,24 @@ class DAWG:
                         lTag.append(tag)
                         nTag += 1
                     dTagOccur[tag] = dTagOccur.get(tag, 0) + 1
-                    lEntry.append((flex, dAff[aff], dTag[tag]))
+                    # word: chars are final codes, affix and tag are shifted to final codes when runs are merged
+                    lWord.append([ dChar[c]  for c in flex ] + [dAff[aff]+self.nCodeOffset, dTag[tag]+self.nCodeOffset])
+                    nEntry += 1
+                    if nRunSize and len(lWord) >= nRunSize:
+                        lRun.append(self._writeRun(lWord))
+                        lWord = []
             hSrc.close()
         if nErr:
             print(" # Lines ignored: {:>10}".format(nErr))
-        if not(lEntry):
+        if not nEntry:
             print(" # Empty lexicon")
             exit()
+        if lRun:
+            print(" > Sorted runs written in temporary files: {}".format(len(lRun) + bool(lWord)))
+        lWord.sort()
         
         # Preparing DAWG
-        print(" > Preparing list of words")
         lVal = lChar + lAff + lTag
-        lWord = [ [dChar[c] for c in sFlex] + [iAff+nChar] + [iTag+nChar+nAff]  for sFlex, iAff, iTag in lEntry ]
-        lEntry = None
         
         # Dictionary of arc values occurrency, to sort arcs of each node
         dValOccur = dict( [ (dChar[c], dCharOccur[c])  for c in dChar ] \
@@ -100,17 +126,16 @@ class DAWG:
         
         self.sFile = spfSrc
         self.sLang = sLangName
-        self.nEntry = len(lWord)
-        self.previousWord = []
-        DawgNode.resetNextId()
-        self.root = DawgNode()
-        self.uncheckedNodes = []  # list of nodes that have not been checked for duplication.
-        self.minimizedNodes = {}  # list of unique nodes that have been checked for duplication.
+        self.nEntry = nEntry
+        self._initGraph()
         self.sortedNodes = []     # version 2 and 3
+        self.dArcCount = {}       # profile: {node id: {arc value: number of transitions}}
+        self.lProfile = []        # profile: transitions (node, arc value or None, number of transitions)
         self.nNode = 0
         self.nArc = 0
+        self.nWord = 0
         self.dChar = dChar
-        self.nChar = len(dChar)
+        self.nChar = len(lChar)   # chars and the empty value 0
         self.nAff = nAff
         self.lArcVal = lVal
         self.nArcVal = len(lVal)
@@ -124,19 +149,121 @@ class DAWG:
             self.funcStemming = st.noStemming
         
         # build
-        lWord.sort()
-        oProgBar = ProgressBar(0, len(lWord))
-        for word in lWord:
-            self.insert(word)
-            oProgBar.increment(1)
+        oProgBar = ProgressBar(0, nEntry)
+        iWord = self._genWords(heapq.merge(*[ self._readRun(hRun)  for hRun in lRun ], lWord), nChar - self.nCodeOffset, nChar + nAff - self.nCodeOffset)
+        if nProcess > 1:
+            # Pool.imap would read all shards at once: results are waited for in order, in a queue of bounded length
+            dqResult = collections.deque()
+            with multiprocessing.Pool(nProcess) as xPool:
+                for tPrefix, lShard in self._genShards(iWord):
+                    dqResult.append((tPrefix, xPool.apply_async(buildShard, ([ word[len(tPrefix):]  for word in lShard ],))))
+                    lShard = None
+                    if len(dqResult) >= nProcess * self.nShardPerProcess:
+                        tPrefix, xResult = dqResult.popleft()
+                        oProgBar.increment(self._mergeShard(tPrefix, *xResult.get()))
+                while dqResult:
+                    tPrefix, xResult = dqResult.popleft()
+                    oProgBar.increment(self._mergeShard(tPrefix, *xResult.get()))
+        else:
+            for word in iWord:
+                self.insert(word)
+                oProgBar.increment(1)
         oProgBar.done()
+        lWord = None
+        for hRun in lRun:
+            hRun.close()
         self.finish()
         self.countNodes()
         self.countArcs()
+        self.countWords()
+        if spfProfile:
+            self.loadProfile(spfProfile)
         self.sortNodes()
         self.sortNodeArcs(dValOccur)
+        if self.lProfile:
+            self.sortNodeArcsByProfile()
         self.displayInfo()
 
+    # SORTED RUNS
+    def _writeRun (self, lWord):
+        "sorts lWord, writes it in a temporary file (deleted when closed) by blocks, returns the file rewound"
+        lWord.sort()
+        hRun = tempfile.TemporaryFile()
+        for i in range(0, len(lWord), self.nBlockSize):
+            marshal.dump(lWord[i:i+self.nBlockSize], hRun)
+        hRun.seek(0)
+        return hRun
+
+    def _readRun (self, hRun):
+        "yields words of a file written by _writeRun"
+        while True:
+            try:
+                lBlock = marshal.load(hRun)
+            except EOFError:
+                return
+            yield from lBlock
+
+    def _genWords (self, iWord, nAffShift, nTagShift):
+        "yields words of iWord with final codes of affix and tag"
+        for word in iWord:
+            word[-2] += nAffShift
+            word[-1] += nTagShift
+            yield word
+
+    # SHARDS
+    def _genShards (self, iWord, nDepth=1):
+        """yields shards of iWord (sorted words) as tuples (prefix, list of words beginning with prefix), in order:
+        words with the same <nDepth> first arc values, split by longer prefixes if there are more than nShardSize words"""
+        for _, iGroup in itertools.groupby(iWord, key=lambda word: word[:nDepth]):
+            lShard = list(itertools.islice(iGroup, self.nShardSize + 1))
+            if len(lShard) > self.nShardSize and len(lShard[0]) > nDepth:
+                yield from self._genShards(itertools.chain(lShard, iGroup), nDepth + 1)
+            else:
+                # shorter words can’t be split (all words of the group are the same)
+                lShard.extend(iGroup)
+                yield (tuple(lShard[0][:nDepth]), lShard)
+
+    def _mergeShard (self, tPrefix, nShardEntry, bRootFinal, lNode, lRootArc):
+        """adds nodes of a shard built by buildShard (children first) to the graph, except nodes already minimized,
+        under the nodes reached with tPrefix (created as insert does with words), returns nShardEntry"""
+        # prefixes of shards are never prefixes of each other: nodes of the previous prefix which are not in tPrefix are complete
+        commonPrefix = 0
+        for i in range(min(len(tPrefix), len(self.previousWord))):
+            if tPrefix[i] != self.previousWord[i]:
+                break
+            commonPrefix += 1
+        self._minimize(commonPrefix)
+        # nodes of the shard, children first, then its root, reached with tPrefix
+        lShardNode = []
+        for bFinal, lArc in lNode:
+            oNode = DawgNode()
+            oNode.final = bFinal
+            for arc, iNext in lArc:
+                oNode.arcs[arc] = lShardNode[iNext]
+            oNode.freeze()
+            lShardNode.append(self.minimizedNodes.setdefault(oNode, oNode))
+        oShardRoot = DawgNode()
+        oShardRoot.final = bRootFinal
+        for arc, iNext in lRootArc:
+            oShardRoot.arcs[arc] = lShardNode[iNext]
+        oShardRoot.freeze()
+        oShardRoot = self.minimizedNodes.setdefault(oShardRoot, oShardRoot)
+        # nodes of the prefix (unchecked, as nodes of the last word inserted)
+        oNode = self.uncheckedNodes[-1][2]  if self.uncheckedNodes  else self.root
+        for i in range(commonPrefix, len(tPrefix)):
+            if self.nChar <= tPrefix[i] < self.nChar + self.nAff:
+                # arc of affix code: the node is reached with a whole word
+                oNode.final = True
+            if i == len(tPrefix) - 1:
+                oNode.arcs[tPrefix[i]] = oShardRoot
+            else:
+                oNextNode = DawgNode()
+                oNode.arcs[tPrefix[i]] = oNextNode
+                self.uncheckedNodes.append((oNode, tPrefix[i], oNextNode))
+                oNode = oNextNode
+        self.previousWord = list(tPrefix)
+        return nShardEntry
+
     # BUILD DAWG
     def insert (self, word):
         if word < self.previousWord:
@@ -175,10 +302,18 @@ class DAWG:
         "minimize unchecked nodes"
         self._minimize(0)
 
+    def _initGraph (self):
+        self.previousWord = []
+        DawgNode.resetNextId()
+        self.root = DawgNode()
+        self.uncheckedNodes = []  # list of nodes that have not been checked for duplication.
+        self.minimizedNodes = {}  # list of unique nodes that have been checked for duplication.
+
     def _minimize (self, downTo):
         # proceed from the leaf up to a certain point
         for i in range( len(self.uncheckedNodes)-1, downTo-1, -1 ):
             (parent, char, child) = self.uncheckedNodes[i]
+            child.freeze()
             if child in self.minimizedNodes:
                 # replace the child with the previously encountered one
                 parent.arcs[char] = self.minimizedNodes[child]
@@ -195,6 +330,23 @@ class DAWG:
         for node in self.minimizedNodes:
             self.nArc += len(node.arcs)
     
+    def countWords (self):
+        "for each node, counts words (paths of chars to a final node) reachable from this node (version 4)"
+        lStack = [self.root]
+        while lStack:
+            oNode = lStack[-1]
+            if oNode.nWord is not None:
+                lStack.pop()
+                continue
+            lNextNode = [ oNextNode  for arc, oNextNode in oNode.arcs.items()  if arc < self.nChar ]
+            lTodo = [ oNextNode  for oNextNode in lNextNode  if oNextNode.nWord is None ]
+            if lTodo:
+                lStack.extend(lTodo)
+                continue
+            lStack.pop()
+            oNode.nWord = int(oNode.final) + sum( oNextNode.nWord  for oNextNode in lNextNode )
+        self.nWord = self.root.nWord
+
     def sortNodeArcs (self, dValOccur):
         print(" > Sort node arcs")
         self.root.sortArcs(dValOccur)
@@ -203,17 +355,99 @@ class DAWG:
     
     def sortNodes (self):
         print(" > Sort nodes")
+        if self.dArcCount:
+            # nodes reached by the profile first, then other nodes (next nodes of nodes reached too)
+            for oNode in self._getHotNextNodes(self.root):
+                self._parseNodes(oNode, self._getHotNextNodes)
+            for oNode in [self.root] + self.sortedNodes:
+                for oNextNode in oNode.arcs.values():
+                    self._parseNodes(oNextNode)
+            return
         for oNode in self.root.arcs.values():
             self._parseNodes(oNode)
     
-    def _parseNodes (self, oNode):
-        # Warning: recursive method
+    def _parseNodes (self, oNode, funcNextNodes=None):
+        """depth-first traversal from oNode: each node not parsed yet gets a position and is appended to sortedNodes
+        funcNextNodes: function returning next nodes to parse of a node (default: all next nodes)"""
         if oNode.pos > 0:
             return
         oNode.setPos()
         self.sortedNodes.append(oNode)
-        for oNextNode in oNode.arcs.values():
-             self._parseNodes(oNextNode)
+        lStack = [ iter(funcNextNodes(oNode)  if funcNextNodes  else oNode.arcs.values()) ]   # next nodes to parse, for each node of the current path
+        while lStack:
+            for oNextNode in lStack[-1]:
+                if oNextNode.pos == 0:
+                    oNextNode.setPos()
+                    self.sortedNodes.append(oNextNode)
+                    lStack.append(iter(funcNextNodes(oNextNode)  if funcNextNodes  else oNextNode.arcs.values()))
+                    break
+            else:
+                lStack.pop()
+
+    def _getHotNextNodes (self, oNode):
+        "returns next nodes of oNode reached by the profile, the most reached first"
+        dCount = self.dArcCount.get(oNode.i, {})
+        return [ oNode.arcs[nVal]  for nVal in sorted(dCount, key=dCount.get, reverse=True) ]
+
+    # PROFILE
+    def loadProfile (self, spfProfile):
+        "reads a profile of lookups written by IBDAWG.saveProfile (transitions leading nowhere in this graph are ignored)"
+        print(" > Reading profile: " + spfProfile)
+        nIgnored = 0
+        with open(spfProfile, "r", encoding="utf-8") as hSrc:
+            for sLine in hSrc:
+                sLine = sLine.rstrip("\r\n")
+                if not sLine or sLine.startswith("#"):
+                    continue
+                try:
+                    sPath, sChar, sCount = sLine.split("\t")
+                    nCount = int(sCount)
+                except ValueError:
+                    nIgnored += 1
+                    continue
+                oNode = self._getNodeFromPath(sPath)
+                if oNode is None:
+                    nIgnored += 1
+                    continue
+                nVal = self.dChar.get(sChar)
+                self.lProfile.append((oNode, nVal, nCount))
+                if nVal in oNode.arcs:
+                    dCount = self.dArcCount.setdefault(oNode.i, {})
+                    dCount[nVal] = dCount.get(nVal, 0) + nCount
+        print("   Transitions: {:,}, ignored: {:,}".format(len(self.lProfile), nIgnored))
+
+    def _getNodeFromPath (self, sPath):
+        "returns node reached from the root with chars of sPath, None if there is no such path"
+        oNode = self.root
+        for c in sPath:
+            oNode = oNode.arcs.get(self.dChar.get(c))
+            if oNode is None:
+                return None
+        return oNode
+
+    def getAvgArcsScanned (self):
+        """returns numbers of arcs scanned per lookup (transition from the root) and per transition of the profile,
+        arcs being scanned in order until the arc is found (versions 1 to 4 and 6; version 5: dichotomy)"""
+        nLookup = 0
+        nTransition = 0
+        nScanned = 0
+        for oNode, nVal, nCount in self.lProfile:
+            lArc = list(oNode.arcs)
+            nScanned += (lArc.index(nVal) + 1  if nVal in oNode.arcs  else max(len(lArc), 1)) * nCount
+            nTransition += nCount
+            if oNode is self.root:
+                nLookup += nCount
+        return nScanned / max(nLookup, 1), nScanned / max(nTransition, 1)
+
+    def sortNodeArcsByProfile (self):
+        print(" > Sort node arcs by profile")
+        fBeforeLookup, fBeforeTransition = self.getAvgArcsScanned()
+        dNode = { oNode.i: oNode  for oNode, _, _ in self.lProfile }
+        for iNode, dCount in self.dArcCount.items():
+            dNode[iNode].sortArcs(dCount)
+        fAfterLookup, fAfterTransition = self.getAvgArcsScanned()
+        print("   Arcs scanned per lookup:     {:>8.2f} -> {:>8.2f}".format(fBeforeLookup, fAfterLookup))
+        print("   Arcs scanned per transition: {:>8.3f} -> {:>8.3f}".format(fBeforeTransition, fAfterTransition))
         
     def lookup (self, sWord):
         oNode = self.root
@@ -243,6 +477,7 @@ class DAWG:
 
     def displayInfo (self):
         print(" * {:<12} {:>16,}".format("Entries:", self.nEntry))
+        print(" * {:<12} {:>16,}".format("Words:", self.nWord))
         print(" * {:<12} {:>16,}".format("Characters:", self.nChar))
         print(" * {:<12} {:>16,}".format("Affixes:", self.nAff))
         print(" * {:<12} {:>16,}".format("Tags:", self.nTag))
@@ -273,6 +508,8 @@ class DAWG:
     # BINARY CONVERSION
     def createBinary (self, sPathFile, nMethod, bDebug=False):
         print(" > Write DAWG as an indexable binary dictionary [method: %d]" % nMethod)
+        self.nBytesWordCount = 0
+        self.nBytesNodeHeader = 0
         if nMethod == 1:
             self.nBytesArc = ( ( (self.nArcVal).bit_length() + 2 ) // 8 ) + 1   # We add 2 bits. See DawgNode.convToBytes1()
             self._calcNumBytesNodeAddress()
@@ -287,6 +524,24 @@ class DAWG:
             self.nMaxOffset = (2 ** (self.nBytesOffset * 8)) - 1
             self._calcNumBytesNodeAddress()
             self._calcNodesAddress3()
+        elif nMethod == 4:
+            # version 3 + number of words reachable from each node (except the root), before the node
+            self.nBytesArc = ( ( (self.nArcVal).bit_length() + 3 ) // 8 ) + 1   # We add 3 bits. See DawgNode.convToBytes3()
+            self.nBytesOffset = 1
+            self.nMaxOffset = (2 ** (self.nBytesOffset * 8)) - 1
+            self.nBytesWordCount = max(1, (self.nWord.bit_length() + 7) // 8)
+            self._calcNumBytesNodeAddress()
+            self._calcNodesAddress3()
+        elif nMethod == 5:
+            # arcs sorted by value, all of the same size, so that arcs can be searched by dichotomy
+            self.nBytesArc = max(1, ( (self.nArcVal).bit_length() + 7 ) // 8)     # no flag. See DawgNode.convToBytes5()
+            self.nBytesNodeHeader = ( self._getMaxNumArcs().bit_length() + 1 + 7 ) // 8   # We add 1 bit for the final flag.
+            self._calcNumBytesNodeAddress()
+            self._calcNodesAddress5()
+        elif nMethod == 6:
+            self.nBytesArc = ( (self.nArcVal).bit_length() + 4 + 7 ) // 8     # We add 4 bits. See DawgNode.convToBytes6()
+            self._calcNumBytesNodeAddress()
+            self._calcNodesAddress6()
         else:
             print(" # Error: unknown compression method")
         print("   Arc values (chars, affixes and tags): {}  ->  {} bytes".format( self.nArcVal, len("\t".join(self.lArcVal).encode("utf-8")) ))
@@ -300,7 +555,7 @@ class DAWG:
     def _calcNumBytesNodeAddress (self):
         "how many bytes needed to store all nodes/arcs in the binary dictionary"
         self.nBytesNodeAddress = 1
-        while ((self.nBytesArc + self.nBytesNodeAddress) * self.nArc) > (2 ** (self.nBytesNodeAddress * 8)):
+        while ((self.nBytesArc + self.nBytesNodeAddress) * self.nArc + (self.nBytesWordCount + self.nBytesNodeHeader) * (self.nNode + 1)) > (2 ** (self.nBytesNodeAddress * 8)):
             self.nBytesNodeAddress += 1
 
     def _calcNodesAddress1 (self):
@@ -322,30 +577,106 @@ class DAWG:
                     #break
 
     def _calcNodesAddress3 (self):
+        """sizes of nodes depend on offsets to next nodes, which depend on sizes of nodes:
+        addresses are calculated from sizes, then sizes from addresses, until no size changes.
+        As a node is one byte long at least, an offset may only lead to one of the next nMaxOffset nodes:
+        when the size of a node changes, only the nMaxOffset nodes before it (and itself) are calculated again."""
         nBytesNode = self.nBytesArc + self.nBytesNodeAddress
+        nDiff = self.nBytesNodeAddress - self.nBytesOffset
+        nNode = len(self.sortedNodes)
         # theorical nodes size if only addresses and no offset
         self.root.size = len(self.root.arcs) * nBytesNode
-        for oNode in self.sortedNodes:
-            oNode.size = max(len(oNode.arcs), 1) * nBytesNode
-        # rewind and calculate dropdown from the end, several times
-        nDiff = self.nBytesNodeAddress - self.nBytesOffset
-        bEnd = False
-        while not bEnd:
-            bEnd = True
-            # recalculate addresses
-            iAddr = self.root.size
-            for oNode in self.sortedNodes:
+        lFullSize = [ max(len(oNode.arcs), 1) * nBytesNode  for oNode in self.sortedNodes ]
+        lSize = list(lFullSize)
+        # for each node, indexes of next nodes which may be reached with an offset (positions follow sortedNodes)
+        lNext = [ [ i + oNextNode.pos - oNode.pos  for oNextNode in oNode.arcs.values()  if 0 < oNextNode.pos - oNode.pos < self.nMaxOffset ]
+                  for i, oNode in enumerate(self.sortedNodes) ]
+        nPass = 0
+        nCalc = 0
+        lTodo = range(nNode)
+        while True:
+            # addresses (version 4: number of words before each node)
+            lAddr = list(itertools.accumulate([self.root.size + self.nBytesWordCount] + [ nSize + self.nBytesWordCount  for nSize in lSize[:-1] ]))
+            if not lTodo:
+                break
+            nPass += 1
+            nCalc += len(lTodo)
+            lChange = []
+            for i in lTodo:
+                nSize = lFullSize[i]
+                for j in lNext[i]:
+                    if 1 < (lAddr[j] - lAddr[i]) < self.nMaxOffset:
+                        nSize -= nDiff
+                if nSize != lSize[i]:
+                    lChange.append((i, nSize))
+            # nodes with an offset over a node whose size changes
+            lTodo = []
+            iNext = 0
+            for i, nSize in lChange:
+                lSize[i] = nSize
+                lTodo.extend(range(max(i - self.nMaxOffset + 1, iNext), i + 1))
+                iNext = i + 1
+        for oNode, iAddr, nSize in zip(self.sortedNodes, lAddr, lSize):
+            oNode.addr = iAddr
+            oNode.size = nSize
+        print("   Nodes addresses: {} passes, {:,} sizes calculated".format(nPass, nCalc))
+
+    def _calcNodesAddress6 (self):
+        """sizes of nodes depend on offsets to next nodes, which depend on sizes of nodes:
+        we begin with the shortest offsets everywhere, then offsets too short are enlarged until every offset fits.
+        As offsets never shrink, the solution found is the smallest one for this order of nodes.
+        An offset changes only when the size of a node between both nodes changes, and an address never becomes an offset again:
+        after the first pass, only nodes with an offset over a node whose size has changed are calculated again."""
+        lNode = [self.root] + self.sortedNodes
+        nNode = len(lNode)
+        for oNode in lNode:
+            oNode.size = max(len(oNode.arcs), 1) * (self.nBytesArc + 1)
+        # positions follow sortedNodes: the index of a node in lNode is its position minus nShift (the root is never a next node)
+        nShift = self.sortedNodes[0].pos - 1  if self.sortedNodes  else 0
+        # for each node, sizes of nodes from lFirst[i] to lLast[i] (excluded) change offsets to next nodes
+        lFirst = list(range(nNode))
+        lLast = list(range(nNode))
+        nPass = 0
+        nCalc = 0
+        lTodo = range(nNode)
+        while True:
+            iAddr = 0
+            for oNode in lNode:
                 oNode.addr = iAddr
                 iAddr += oNode.size
-            # rewind and calculate dropdown from the end, several times
-            for i in range(self.nNode-1, -1, -1):
-                nSize = max(len(self.sortedNodes[i].arcs), 1) * nBytesNode
-                for oNextNode in self.sortedNodes[i].arcs.values():
-                    if 1 < (oNextNode.addr - self.sortedNodes[i].addr) < self.nMaxOffset:
-                        nSize -= nDiff
-                if self.sortedNodes[i].size != nSize:
-                    self.sortedNodes[i].size = nSize
-                    bEnd = False
+            if not lTodo:
+                break
+            nPass += 1
+            nCalc += len(lTodo)
+            lChange = []
+            for i in lTodo:
+                oNode = lNode[i]
+                nSize, lOffsetNode = oNode.getSize6(self.nBytesArc, self.nBytesNodeAddress)
+                if nSize != oNode.size:
+                    lChange.append((i, nSize))
+                lIndex = [ oNextNode.pos - nShift  for oNextNode in lOffsetNode ]
+                lIndex.append(i)
+                lFirst[i] = min(lIndex)
+                lLast[i] = max(lIndex)
+            # nodes with an offset over a node whose size changes (lChanged[i]: number of nodes before i whose size changes)
+            lChanged = [0] * (nNode + 1)
+            for i, nSize in lChange:
+                lNode[i].size = nSize
+                lChanged[i+1] = 1
+            lChanged = list(itertools.accumulate(lChanged))
+            lTodo = [ i  for i, iFirst, iLast in zip(range(nNode), lFirst, lLast)  if lChanged[iLast] != lChanged[iFirst] ]
+        print("   Nodes addresses: {} passes, {:,} sizes calculated, {:,} bytes".format(nPass, nCalc, iAddr))
+
+    def _getMaxNumArcs (self):
+        "returns the greatest number of arcs of a node"
+        return max(len(self.root.arcs), max( len(oNode.arcs)  for oNode in self.minimizedNodes ))
+
+    def _calcNodesAddress5 (self):
+        nBytesNode = self.nBytesArc + self.nBytesNodeAddress
+        iAddr = self.nBytesNodeHeader + len(self.root.arcs) * nBytesNode
+        for oNode in self.sortedNodes:
+            oNode.addr = iAddr
+            iAddr += self.nBytesNodeHeader + len(oNode.arcs) * nBytesNode
 
     def _writeBinary (self, sPathFile, nMethod):
         """
@@ -370,6 +701,11 @@ class DAWG:
                 * "S" means stems are generated by /suffix_code/, "A" means they are generated by /affix_code/
                   See defineSuffixCode() and defineAffixCode() for details.
                   "N" means no stemming
+            /[number of words]
+            /[number of bytes for each word count]
+                * version 4 only
+            /[number of bytes for each node header]
+                * version 5 only
         
         - Section Values:
                 * a list of strings encoded in binary from utf-8, each value separated with a tabulation
@@ -387,6 +723,10 @@ class DAWG:
             # infos
             hDst.write("{}/{}/{}/{}/{}/{}/{}/{}/{}".format(self.sLang, self.nChar, self.nBytesArc, self.nBytesNodeAddress, \
                                                            self.nEntry, self.nNode, self.nArc, self.nAff, self.cStemming).encode("utf-8"))
+            if nMethod == 4:
+                hDst.write("/{}/{}".format(self.nWord, self.nBytesWordCount).encode("utf-8"))
+            elif nMethod == 5:
+                hDst.write("/{}".format(self.nBytesNodeHeader).encode("utf-8"))
             hDst.write(b"\0\0\0\0")
             # lArcVal
             hDst.write("\t".join(self.lArcVal).encode("utf-8"))
@@ -404,6 +744,18 @@ class DAWG:
                 hDst.write(self.root.convToBytes3(self.nBytesArc, self.nBytesNodeAddress, self.nBytesOffset))
                 for oNode in self.sortedNodes:
                     hDst.write(oNode.convToBytes3(self.nBytesArc, self.nBytesNodeAddress, self.nBytesOffset))
+            elif nMethod == 4:
+                hDst.write(self.root.convToBytes3(self.nBytesArc, self.nBytesNodeAddress, self.nBytesOffset))
+                for oNode in self.sortedNodes:
+                    hDst.write(oNode.convToBytes4(self.nBytesArc, self.nBytesNodeAddress, self.nBytesOffset, self.nBytesWordCount))
+            elif nMethod == 5:
+                hDst.write(self.root.convToBytes5(self.nBytesArc, self.nBytesNodeAddress, self.nBytesNodeHeader))
+                for oNode in self.sortedNodes:
+                    hDst.write(oNode.convToBytes5(self.nBytesArc, self.nBytesNodeAddress, self.nBytesNodeHeader))
+            elif nMethod == 6:
+                hDst.write(self.root.convToBytes6(self.nBytesArc, self.nBytesNodeAddress))
+                for oNode in self.sortedNodes:
+                    hDst.write(oNode.convToBytes6(self.nBytesArc, self.nBytesNodeAddress))
             hDst.close()
 
     def _writeNodes (self, sPathFile, nMethod):
@@ -419,11 +771,19 @@ class DAWG:
                 hDst.write(self.root.getTxtRepr2(self.nBytesArc, self.nBytesNodeAddress, self.lArcVal)+"\n")
                 for oNode in self.sortedNodes:
                     hDst.write(oNode.getTxtRepr2(self.nBytesArc, self.nBytesNodeAddress, self.lArcVal)+"\n")
-            if nMethod == 3:
+            if nMethod == 3 or nMethod == 4:
                 hDst.write(self.root.getTxtRepr3(self.nBytesArc, self.nBytesNodeAddress, self.nBytesOffset, self.lArcVal)+"\n")
                 #hDst.write( ''.join( [ "%02X " %  z  for z in self.root.convToBytes3(self.nBytesArc, self.nBytesNodeAddress, self.nBytesOffset) ] ).strip() )
                 for oNode in self.sortedNodes:
                     hDst.write(oNode.getTxtRepr3(self.nBytesArc, self.nBytesNodeAddress, self.nBytesOffset, self.lArcVal)+"\n")
+            if nMethod == 5:
+                hDst.write(self.root.getTxtRepr5(self.nBytesArc, self.nBytesNodeAddress, self.nBytesNodeHeader, self.lArcVal)+"\n")
+                for oNode in self.sortedNodes:
+                    hDst.write(oNode.getTxtRepr5(self.nBytesArc, self.nBytesNodeAddress, self.nBytesNodeHeader, self.lArcVal)+"\n")
+            if nMethod == 6:
+                hDst.write(self.root.getTxtRepr6(self.nBytesArc, self.nBytesNodeAddress, self.lArcVal)+"\n")
+                for oNode in self.sortedNodes:
+                    hDst.write(oNode.getTxtRepr6(self.nBytesArc, self.nBytesNodeAddress, self.lArcVal)+"\n")
             hDst.close()
     
     def writeResults (self, sPathFile):
@@ -440,9 +800,29 @@ class DAWG:
 
 
 
+def buildShard (lWord):
+    """builds the graph of lWord (sorted words, without the prefix of the shard), returns (number of words, final flag of root, nodes, arcs of root)
+    (see DAWG._mergeShard) nodes: list of (final flag, list of (arc value, index of next node)), in order of minimization (children first)"""
+    oDawg = DAWG.__new__(DAWG)
+    oDawg._initGraph()
+    for word in lWord:
+        oDawg.insert(word)
+    oDawg.finish()
+    dIndex = {}
+    lNode = []
+    for oNode in oDawg.minimizedNodes:
+        dIndex[oNode.i] = len(lNode)
+        lNode.append((oNode.final, [ (arc, dIndex[oNextNode.i])  for arc, oNextNode in oNode.arcs.items() ]))
+    return len(lWord), oDawg.root.final, lNode, [ (arc, dIndex[oNextNode.i])  for arc, oNextNode in oDawg.root.arcs.items() ]
+
+
+
 class DawgNode:
     NextId = 0
     NextPos = 1 # (version 2)
+
+    # no dictionary of attributes: there are millions of nodes while building
+    __slots__ = ("i", "final", "arcs", "addr", "pos", "size", "nWord", "sig", "nHash")
     
     def __init__ (self):
         self.i = DawgNode.NextId
@@ -452,6 +832,9 @@ class DawgNode:
         self.addr = 0           # address in the binary dictionary
         self.pos = 0            # position in the binary dictionary (version 2)
         self.size = 0           # size of node in bytes (version 3)
+        self.nWord = None       # number of words reachable from this node (version 4)
+        self.sig = None         # signature (final flag and arcs), set when the node is frozen (see freeze)
+        self.nHash = 0          # hash of signature
 
     @classmethod
     def resetNextId (cls):
@@ -461,29 +844,42 @@ class DawgNode:
         self.pos = DawgNode.NextPos
         DawgNode.NextPos += 1
 
-    def __str__ (self):
-        # Caution! this function is used for hashing and comparison!
-        l = []
-        if self.final: 
-            l.append("1")
-        else:
-            l.append("0")
+    def getSignature (self):
+        "returns a tuple: final flag, then arc value and id of next node of each arc"
+        if self.sig is not None:
+            return self.sig
+        l = [self.final]
         for (key, node) in self.arcs.items():
-            l.append(str(key))
-            l.append(str(node.i))
+            l.append(key)
+            l.append(node.i)
+        return tuple(l)
+
+    def freeze (self):
+        "computes the signature once for all: arcs of the node must not be modified anymore (see DAWG._minimize)"
+        self.sig = None
+        self.sig = self.getSignature()
+        self.nHash = hash(self.sig)
+
+    def __str__ (self):
+        l = [ "1"  if self.final  else "0" ]
+        l.extend( str(x)  for x in self.getSignature()[1:] )
         return "_".join(l)
 
     def __hash__ (self):
         # Used as a key in a python dictionary.
-        return self.__str__().__hash__()
+        if self.sig is not None:
+            return self.nHash
+        return hash(self.getSignature())
 
     def __eq__ (self, other):
         # Used as a key in a python dictionary.
         # Nodes are equivalent if they have identical arcs, and each identical arc leads to identical states.
-        return self.__str__() == other.__str__()
+        return self.getSignature() == other.getSignature()
 
     def sortArcs (self, dValOccur):
-        self.arcs = collections.OrderedDict(sorted(self.arcs.items(), key=lambda t: dValOccur[t[0]], reverse=True))
+        "sorts arcs by occurrences of values (descending; values missing in dValOccur last, in the same order)"
+        self.arcs = collections.OrderedDict(sorted(self.arcs.items(), key=lambda t: dValOccur.get(t[0], 0), reverse=True))
+        self.sig = None
 
     # VERSION 1 =====================================================================================================
     def convToBytes1 (self, nBytesArc, nBytesNodeAddress):
@@ -686,3 +1082,145 @@ class DawgNode:
             else:
                 s += "  {:<20}  {:0>16}  i{:_>10}   #{:_>10}\n".format(lVal[arc], bin(val)[2:], self.arcs[arc].i, self.arcs[arc].addr)
         return s
+
+    # VERSION 4 =====================================================================================================
+    def convToBytes4 (self, nBytesArc, nBytesNodeAddress, nBytesOffset, nBytesWordCount):
+        """
+        Node scheme: as version 3, but each node is preceded by the number of words reachable from this node.
+        - Word count length is defined by nBytesWordCount
+        - The address of a node is the address of its first arc, so the word count is just before it.
+        - The root has no word count (this is the number of words, see the section Informations).
+        """
+        return (self.nWord or 0).to_bytes(nBytesWordCount, byteorder='big') + self.convToBytes3(nBytesArc, nBytesNodeAddress, nBytesOffset)
+
+    # VERSION 5 =====================================================================================================
+    def convToBytes5 (self, nBytesArc, nBytesNodeAddress, nBytesNodeHeader):
+        """
+        Node scheme:
+        - Node header length is defined by nBytesNodeHeader
+        - Arc length is defined by nBytesArc
+        - Address length is defined by nBytesNodeAddress
+        Arcs are sorted by value and have all the same size: arcs can be searched by dichotomy.
+
+        |          Node header          |
+        |                               |
+         /---------------\ /---------------\
+         | | | | | | | | | | | | | | | | | |     Number of arcs (0 if no arc)
+         \---------------/ \---------------/
+          ^
+          |
+           \_____ if 1, this node is final
+
+        |                Arc                |                         Address of next node                          |
+        |                                   |                                                                       |
+         /---------------\ /---------------\ /---------------\ /---------------\ /---------------\ /---------------\
+         | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | |
+         \---------------/ \---------------/ \---------------/ \---------------/ \---------------/ \---------------/
+         [...]
+        """
+        nFinalNodeMask = 1 << ((nBytesNodeHeader*8)-1)
+        val = len(self.arcs) | nFinalNodeMask  if self.final  else len(self.arcs)
+        by = val.to_bytes(nBytesNodeHeader, byteorder='big')
+        for arc in sorted(self.arcs):
+            by += arc.to_bytes(nBytesArc, byteorder='big')
+            by += self.arcs[arc].addr.to_bytes(nBytesNodeAddress, byteorder='big')
+        return by
+
+    def getTxtRepr5 (self, nBytesArc, nBytesNodeAddress, nBytesNodeHeader, lVal):
+        s = "i{:_>10} -- #{:_>10}  ({} arcs{})\n".format(self.i, self.addr, len(self.arcs), ", final"  if self.final  else "")
+        for arc in sorted(self.arcs):
+            s += "  {:<20}  {:>6}  i{:_>10}   #{:_>10}\n".format(lVal[arc], arc, self.arcs[arc].i, self.arcs[arc].addr)
+        return s
+
+    # VERSION 6 =====================================================================================================
+    def getOffsetCode6 (self, oNextNode, nBytesNodeAddress):
+        """returns how to reach oNextNode from this node:
+        1: offset on 1 byte, 2: offset on 2 bytes, 3: negative offset on 2 bytes, 0: address (no offset shorter than an address)"""
+        nOffset = oNextNode.addr - self.addr
+        if 0 < nOffset < 0x100 and nBytesNodeAddress > 1:
+            return 1
+        if nBytesNodeAddress > 2:
+            if 0 < nOffset < 0x10000:
+                return 2
+            if -0x10000 < nOffset < 0:
+                return 3
+        return 0
+
+    def getSize6 (self, nBytesArc, nBytesNodeAddress):
+        "returns the size of the node in bytes and the list of next nodes reached with an offset, according to the current addresses of nodes"
+        if not self.arcs:
+            return nBytesArc + 1, []
+        lLinkSize = [nBytesNodeAddress, 1, 2, 2]
+        nSize = 0
+        lOffsetNode = []
+        for oNextNode in self.arcs.values():
+            nCode = self.getOffsetCode6(oNextNode, nBytesNodeAddress)
+            nSize += nBytesArc + lLinkSize[nCode]
+            if nCode:
+                lOffsetNode.append(oNextNode)
+        return nSize, lOffsetNode
+
+    def convToBytes6 (self, nBytesArc, nBytesNodeAddress):
+        """
+        Node scheme:
+        - Arc length is defined by nBytesArc
+        - Address length is defined by nBytesNodeAddress
+        - Offset length is 1 or 2 bytes, given by the arc (negative offsets: 2 bytes)
+                                       
+        |                Arc                |            Address of next node  or  offset to next node              |
+        |                                   |                                                                       |
+         /---------------\ /---------------\ /---------------\ /---------------\ /---------------\ /---------------\
+         |1|0|0|0| | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | |
+         \---------------/ \---------------/ \---------------/ \---------------/ \---------------/ \---------------/
+         [...]
+         /---------------\ /---------------\ /---------------\
+         |0|0|0|1| | | | | | | | | | | | | | | | | | | | | | |     offset on 1 byte
+         \---------------/ \---------------/ \---------------/ 
+         /---------------\ /---------------\ /---------------\ /---------------\
+         |0|1|1|0| | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | | |     offset on 2 bytes (3: negative offset on 2 bytes)
+         \---------------/ \---------------/ \---------------/ \---------------/
+
+          ^ ^ ^ ^
+          | | | |
+          | |  \_\_ how to reach next node: 0: address, 1 or 2: offset on 1 or 2 bytes, 3: negative offset on 2 bytes
+          | |       (offsets are counted from the beginning of this node)
+          |  \___ if 1, last arc of this node
+           \_____ if 1, this node is final (only on the first arc)
+        """
+        nArc = len(self.arcs)
+        nFinalNodeMask = 1 << ((nBytesArc*8)-1)
+        nFinalArcMask = 1 << ((nBytesArc*8)-2)
+        nOffsetCodeShift = (nBytesArc*8)-4
+        if nArc == 0:
+            val = nFinalNodeMask | nFinalArcMask | (1 << nOffsetCodeShift)
+            by = val.to_bytes(nBytesArc, byteorder='big')
+            by += (0).to_bytes(1, byteorder='big')
+            return by
+        by = b""
+        for i, arc in enumerate(self.arcs, 1):
+            val = arc
+            if i == 1 and self.final:
+                val = val | nFinalNodeMask
+            if i == nArc:
+                val = val | nFinalArcMask
+            nCode = self.getOffsetCode6(self.arcs[arc], nBytesNodeAddress)
+            if nCode:
+                val = val | (nCode << nOffsetCodeShift)
+                by += val.to_bytes(nBytesArc, byteorder='big')
+                by += abs(self.arcs[arc].addr-self.addr).to_bytes(1  if nCode == 1  else 2, byteorder='big')
+            else:
+                by += val.to_bytes(nBytesArc, byteorder='big')
+                by += self.arcs[arc].addr.to_bytes(nBytesNodeAddress, byteorder='big')
+        return by
+
+    def getTxtRepr6 (self, nBytesArc, nBytesNodeAddress, lVal):
+        s = "i{:_>10} -- #{:_>10}  ({})\n".format(self.i, self.addr, self.size)
+        if not self.arcs:
+            s += "  {:<20}  {:>6}\n".format("", "0")
+            return s
+        for arc, oNextNode in self.arcs.items():
+            if self.getOffsetCode6(oNextNode, nBytesNodeAddress):
+                s += "  {:<20}  {:>6}  i{:_>10}   {:+_>10}\n".format(lVal[arc], arc, oNextNode.i, oNextNode.addr - self.addr)
+            else:
+                s += "  {:<20}  {:>6}  i{:_>10}   #{:_>10}\n".format(lVal[arc], arc, oNextNode.i, oNextNode.addr)
+        return s
@@ -6,6 +6,7 @@ import os
 import traceback
 
 from ..ibdawg import IBDAWG
+from ..lexicon import checkBackend
 from ..echo import echo
 from . import gc_options
 
@@ -38,6 +39,9 @@ _dOptions = dict(gc_options.dOpt)       # duplication necessary, to be able to r
 _aIgnoredRules = set()
 _oDict = None
 _dAnalyses = {}                         # cache for data from dictionary
+_dMorphTuples = {}                      # cache: word -> tuples (lemma, tag) of the dictionary, same order as _dAnalyses
+_dTagGenderNumber = {}                  # cache: tag of the dictionary -> (gender, number) of nouns and adjectives
+_nDictGeneration = 0                    # generation of the dictionary when caches were emptied (see _checkDictGeneration)
 
 _GLOBALS = globals()
 
@@ -50,6 +54,7 @@ def parse (sText, sCountry="FR", bDebug=False, dOptions=None):
     sAlt = sText
     dDA = {}
     dOpt = _dOptions  if not dOptions  else dOptions
+    _checkDictGeneration()
 
     # parse paragraph
     try:
@@ -260,14 +265,31 @@ except ImportError:
     _createError = _createDictError
 
 
-def load ():
+def load (oDict=None):
+    "loads the dictionary: oDict may be any lexicon backend (see grammalecte/lexicon.py), default: IBDAWG of french.bdic"
     global _oDict
     try:
-        _oDict = IBDAWG("french.bdic")
+        _oDict = checkBackend(oDict)  if oDict is not None  else IBDAWG("french.bdic")
+        _clearDictCaches()
     except:
         traceback.print_exc()
 
 
+def _clearDictCaches ():
+    "empties caches of data from dictionary"
+    global _nDictGeneration
+    _dAnalyses.clear()
+    _dMorphTuples.clear()
+    _dTagGenderNumber.clear()
+    _nDictGeneration = _oDict.getGeneration()
+
+
+def _checkDictGeneration ():
+    "empties caches of data from dictionary if the dictionary has changed (e.g. overlays added or removed) since they were filled"
+    if _oDict.getGeneration() != _nDictGeneration:
+        _clearDictCaches()
+
+
 def setOptions (dOpt):
     _dOptions.update(dOpt)
 
@@ -342,12 +364,20 @@ def displayInfo (dDA, tWord):
 
 
 def _storeMorphFromFSA (sWord):
-    "retrieves morphologies list from _oDict -> _dAnalyses"
+    "retrieves morphologies list from _oDict -> _dAnalyses (and tuples -> _dMorphTuples)"
     global _dAnalyses
-    _dAnalyses[sWord] = _oDict.getMorph(sWord)
+    _dMorphTuples[sWord] = _oDict.getMorphTuples(sWord)
+    _dAnalyses[sWord] = [ ">" + sLemma + " " + _oDict.getTag(nTag)  for sLemma, nTag in _dMorphTuples[sWord] ]
     return True  if _dAnalyses[sWord]  else False
 
 
+def _getLemmasAndTags (sWord):
+    "returns a list of tuples (lemma, tags) of sWord, if sWord has been analysed in _dAnalyses"
+    if sWord not in _dAnalyses:
+        return []
+    return [ (sLemma, _oDict.getTag(nTag))  for sLemma, nTag in _dMorphTuples[sWord] ]
+
+
 def morph (dDA, tWord, sPattern, bStrict=True, bNoWord=False):
     "analyse a tuple (position, word), return True if sPattern in morphologies (disambiguation on)"
     if not tWord:
@@ -410,7 +440,7 @@ def stem (sWord):
         return []
     if sWord not in _dAnalyses and not _storeMorphFromFSA(sWord):
         return []
-    return [ s[1:s.find(" ")]  for s in _dAnalyses[sWord] ]
+    return [ sLemma  for sLemma, nTag in _dMorphTuples[sWord] ]
 
 
 ## functions to get text outside pattern scope
@@ -717,6 +747,8 @@ from . import phonet
 
 ## Verbs
 
+_zTense = re.compile(":(?:Y|I[pqsf]|S[pq]|K|P)")
+
 def suggVerb (sFlex, sWho, funcSugg2=None):
     aSugg = set()
     for sStem in stem(sFlex):
@@ -724,18 +756,19 @@ def suggVerb (sFlex, sWho, funcSugg2=None):
         if tTags:
             # we get the tense
             aTense = set()
-            for sMorph in _dAnalyses.get(sFlex, []): # we don’t check if word exists in _dAnalyses, for it is assumed it has been done before
-                for m in re.finditer(sStem+" .*?(:(?:Y|I[pqsf]|S[pq]|K|P))", sMorph):
-                    # stem must be used in regex to prevent confusion between different verbs (e.g. sauras has 2 stems: savoir and saurer)
+            for sLemma, nTag in _oDict.getMorphTuples(sFlex):
+                # only morphologies of this stem (e.g. sauras has 2 stems: savoir and saurer)
+                if sLemma == sStem:
+                    m = _zTense.search(_oDict.getTag(nTag))
                     if m:
-                        if m.group(1) == ":Y":
+                        if m.group(0) == ":Y":
                             aTense.add(":Ip")
                             aTense.add(":Iq")
                             aTense.add(":Is")
-                        elif m.group(1) == ":P":
+                        elif m.group(0) == ":P":
                             aTense.add(":Ip")
                         else:
-                            aTense.add(m.group(1))
+                            aTense.add(m.group(0))
             for sTense in aTense:
                 if sWho == u":1ś" and not conj._hasConjWithTags(tTags, sTense, u":1ś"):
                     sWho = ":1s"
@@ -848,6 +881,68 @@ def suggVerbMode (sFlex, cMode, sSuj):
 
 ## Nouns and adjectives
 
+def _getFormsOfLemma (sLemma, sGender, sNumber, sFlex):
+    """returns forms of sLemma (nouns and adjectives) of gender sGender and number sNumber (epicene and invariable forms fit), from the index of lemmas,
+    with the same prefix as sFlex (e.g. “kilocalorie” has the lemma “calorie”: forms of “kilocalories” begin with “kilo”)
+    returns None if sLemma is not in the index"""
+    tForm = _oDict.getForms(sLemma)
+    if not tForm:
+        return None
+    sPrefix = _getPrefixOfLemma(sFlex.lower(), sLemma)
+    aForm = set()
+    for sForm, xTag in tForm:
+        if xTag not in _dTagGenderNumber:
+            _dTagGenderNumber[xTag] = _getGenderNumber(_oDict.getTag(xTag))
+        tGenderNumber = _dTagGenderNumber[xTag]
+        if tGenderNumber and tGenderNumber[0] in (sGender, ":e") and tGenderNumber[1] in (sNumber, ":i") \
+                and _getPrefixOfLemma(sForm.lower(), sLemma) == sPrefix:
+            aForm.add(sForm)
+    return aForm
+
+
+def _getPrefixOfLemma (sWord, sLemma):
+    "returns the part of sWord before the first three letters of sLemma, or an empty string"
+    iPos = sWord.find(sLemma[:3].lower())
+    return sWord[:iPos]  if iPos > 0  else ""
+
+
+def _getGenderNumber (sTags):
+    "returns (gender, number) of tags of nouns and adjectives, else None"
+    if ":V" in sTags:
+        return None
+    mGender = cr.Gender.search(sTags)
+    mNumber = cr.Number.search(sTags)
+    if not mGender or not mNumber:
+        return None
+    return (mGender.group(0), mNumber.group(0))
+
+
+def _getFormsWithNumber (sFlex, sNumber):
+    """returns forms of the lemmas of sFlex (nouns and adjectives) of the same gender and of number sNumber, with the casing of sFlex (sFlex excluded)
+    returns None if these lemmas are not in the index"""
+    aForm = None
+    for sLemma, xTag in _oDict.getMorphTuples(sFlex):
+        sTags = _oDict.getTag(xTag)
+        if ":V" not in sTags:
+            m = cr.Gender.search(sTags)
+            if m:
+                aLemmaForm = _getFormsOfLemma(sLemma, m.group(0), sNumber, sFlex)
+                if aLemmaForm is not None:
+                    aForm = aLemmaForm  if aForm is None  else aForm | aLemmaForm
+    if aForm is None:
+        return None
+    return set( _matchCase(sFlex, sForm)  for sForm in aForm  if sForm.lower() != sFlex.lower() )
+
+
+def _matchCase (sWord, sForm):
+    "returns sForm with the casing of sWord (uppercase or capitalized)"
+    if sWord.isupper() and len(sWord) > 1:
+        return sForm.upper()
+    if sWord[0:1].isupper():
+        return sForm[0:1].upper() + sForm[1:]
+    return sForm
+
+
 def suggPlur (sFlex, sWordToAgree=None):
     "returns plural forms assuming sFlex is singular"
     if sWordToAgree:
@@ -858,17 +953,20 @@ def suggPlur (sFlex, sWordToAgree=None):
             return suggMasPlur(sFlex)
         elif sGender == ":f":
             return suggFemPlur(sFlex)
-    aSugg = set()
-    if "-" not in sFlex:
-        if sFlex.endswith("l"):
-            if sFlex.endswith("al") and len(sFlex) > 2 and _oDict.isValid(sFlex[:-1]+"ux"):
-                aSugg.add(sFlex[:-1]+"ux")
-            if sFlex.endswith("ail") and len(sFlex) > 3 and _oDict.isValid(sFlex[:-2]+"ux"):
-                aSugg.add(sFlex[:-2]+"ux")
-        if _oDict.isValid(sFlex+"s"):
-            aSugg.add(sFlex+"s")
-        if _oDict.isValid(sFlex+"x"):
-            aSugg.add(sFlex+"x")
+    aSugg = _getFormsWithNumber(sFlex, ":p")
+    if aSugg is None:
+        # not in the index of lemmas: forms are guessed
+        aSugg = set()
+        if "-" not in sFlex:
+            if sFlex.endswith("l"):
+                if sFlex.endswith("al") and len(sFlex) > 2 and _oDict.isValid(sFlex[:-1]+"ux"):
+                    aSugg.add(sFlex[:-1]+"ux")
+                if sFlex.endswith("ail") and len(sFlex) > 3 and _oDict.isValid(sFlex[:-2]+"ux"):
+                    aSugg.add(sFlex[:-2]+"ux")
+            if _oDict.isValid(sFlex+"s"):
+                aSugg.add(sFlex+"s")
+            if _oDict.isValid(sFlex+"x"):
+                aSugg.add(sFlex+"x")
     if mfsp.hasMiscPlural(sFlex):
         aSugg.update(mfsp.getMiscPlural(sFlex))
     if aSugg:
@@ -878,6 +976,10 @@ def suggPlur (sFlex, sWordToAgree=None):
 
 def suggSing (sFlex):
     "returns singular forms assuming sFlex is plural"
+    aSugg = _getFormsWithNumber(sFlex, ":s")
+    if aSugg is not None:
+        return u"|".join(aSugg)
+    # not in the index of lemmas: forms are guessed
     if "-" in sFlex:
         return ""
     aSugg = set()
@@ -897,20 +999,21 @@ def suggMasSing (sFlex):
     "returns masculine singular forms"
     # we don’t check if word exists in _dAnalyses, for it is assumed it has been done before
     aSugg = set()
-    for sMorph in _dAnalyses.get(sFlex, []):
-        if not ":V" in sMorph:
+    for sLemma, sTags in _getLemmasAndTags(sFlex):
+        if not ":V" in sTags:
             # not a verb
-            if ":m" in sMorph or ":e" in sMorph:
+            if ":m" in sTags or ":e" in sTags:
                 aSugg.add(suggSing(sFlex))
             else:
-                sStem = cr.getLemmaOfMorph(sMorph)
-                if mfsp.isFemForm(sStem):
-                    aSugg.update(mfsp.getMasForm(sStem, False))
+                aForm = _getFormsOfLemma(sLemma, ":m", ":s", sFlex)
+                if aForm:
+                    aSugg.update( _matchCase(sFlex, sForm)  for sForm in aForm )
+                elif mfsp.isFemForm(sLemma):
+                    aSugg.update(mfsp.getMasForm(sLemma, False))
         else:
             # a verb
-            sVerb = cr.getLemmaOfMorph(sMorph)
-            if conj.hasConj(sVerb, ":PQ", ":Q1"):
-                aSugg.add(conj.getConj(sVerb, ":PQ", ":Q1"))
+            if conj.hasConj(sLemma, ":PQ", ":Q1"):
+                aSugg.add(conj.getConj(sLemma, ":PQ", ":Q1"))
     if aSugg:
         return u"|".join(aSugg)
     return ""
@@ -920,22 +1023,23 @@ def suggMasPlur (sFlex):
     "returns masculine plural forms"
     # we don’t check if word exists in _dAnalyses, for it is assumed it has been done before
     aSugg = set()
-    for sMorph in _dAnalyses.get(sFlex, []):
-        if not ":V" in sMorph:
+    for sLemma, sTags in _getLemmasAndTags(sFlex):
+        if not ":V" in sTags:
             # not a verb
-            if ":m" in sMorph or ":e" in sMorph:
+            if ":m" in sTags or ":e" in sTags:
                 aSugg.add(suggPlur(sFlex))
             else:
-                sStem = cr.getLemmaOfMorph(sMorph)
-                if mfsp.isFemForm(sStem):
-                    aSugg.update(mfsp.getMasForm(sStem, True))
+                aForm = _getFormsOfLemma(sLemma, ":m", ":p", sFlex)
+                if aForm:
+                    aSugg.update( _matchCase(sFlex, sForm)  for sForm in aForm )
+                elif mfsp.isFemForm(sLemma):
+                    aSugg.update(mfsp.getMasForm(sLemma, True))
         else:
             # a verb
-            sVerb = cr.getLemmaOfMorph(sMorph)
-            if conj.hasConj(sVerb, ":PQ", ":Q2"):
-                aSugg.add(conj.getConj(sVerb, ":PQ", ":Q2"))
-            elif conj.hasConj(sVerb, ":PQ", ":Q1"):
-                aSugg.add(conj.getConj(sVerb, ":PQ", ":Q1"))
+            if conj.hasConj(sLemma, ":PQ", ":Q2"):
+                aSugg.add(conj.getConj(sLemma, ":PQ", ":Q2"))
+            elif conj.hasConj(sLemma, ":PQ", ":Q1"):
+                aSugg.add(conj.getConj(sLemma, ":PQ", ":Q1"))
     if aSugg:
         return u"|".join(aSugg)
     return ""
@@ -945,20 +1049,21 @@ def suggFemSing (sFlex):
     "returns feminine singular forms"
     # we don’t check if word exists in _dAnalyses, for it is assumed it has been done before
     aSugg = set()
-    for sMorph in _dAnalyses.get(sFlex, []):
-        if not ":V" in sMorph:
+    for sLemma, sTags in _getLemmasAndTags(sFlex):
+        if not ":V" in sTags:
             # not a verb
-            if ":f" in sMorph or ":e" in sMorph:
+            if ":f" in sTags or ":e" in sTags:
                 aSugg.add(suggSing(sFlex))
             else:
-                sStem = cr.getLemmaOfMorph(sMorph)
-                if mfsp.isFemForm(sStem):
-                    aSugg.add(sStem)
+                aForm = _getFormsOfLemma(sLemma, ":f", ":s", sFlex)
+                if aForm:
+                    aSugg.update( _matchCase(sFlex, sForm)  for sForm in aForm )
+                elif mfsp.isFemForm(sLemma):
+                    aSugg.add(sLemma)
         else:
             # a verb
-            sVerb = cr.getLemmaOfMorph(sMorph)
-            if conj.hasConj(sVerb, ":PQ", ":Q3"):
-                aSugg.add(conj.getConj(sVerb, ":PQ", ":Q3"))
+            if conj.hasConj(sLemma, ":PQ", ":Q3"):
+                aSugg.add(conj.getConj(sLemma, ":PQ", ":Q3"))
     if aSugg:
         return u"|".join(aSugg)
     return ""
@@ -968,20 +1073,21 @@ def suggFemPlur (sFlex):
     "returns feminine plural forms"
     # we don’t check if word exists in _dAnalyses, for it is assumed it has been done before
     aSugg = set()
-    for sMorph in _dAnalyses.get(sFlex, []):
-        if not ":V" in sMorph:
+    for sLemma, sTags in _getLemmasAndTags(sFlex):
+        if not ":V" in sTags:
             # not a verb
-            if ":f" in sMorph or ":e" in sMorph:
+            if ":f" in sTags or ":e" in sTags:
                 aSugg.add(suggPlur(sFlex))
             else:
-                sStem = cr.getLemmaOfMorph(sMorph)
-                if mfsp.isFemForm(sStem):
-                    aSugg.add(sStem+"s")
+                aForm = _getFormsOfLemma(sLemma, ":f", ":p", sFlex)
+                if aForm:
+                    aSugg.update( _matchCase(sFlex, sForm)  for sForm in aForm )
+                elif mfsp.isFemForm(sLemma):
+                    aSugg.add(sLemma+"s")
         else:
             # a verb
-            sVerb = cr.getLemmaOfMorph(sMorph)
-            if conj.hasConj(sVerb, ":PQ", ":Q4"):
-                aSugg.add(conj.getConj(sVerb, ":PQ", ":Q4"))
+            if conj.hasConj(sLemma, ":PQ", ":Q4"):
+                aSugg.add(conj.getConj(sLemma, ":PQ", ":Q4"))
     if aSugg:
         return u"|".join(aSugg)
     return ""
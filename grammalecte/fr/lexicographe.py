@@ -6,6 +6,8 @@
 import re
 import traceback
 
+from ..lexicon import checkBackend
+
 
 _dTAGS = {  
     ':G': "",
@@ -148,7 +150,7 @@ _dAD = {
 class Lexicographe:
 
     def __init__ (self, oDict):
-        self.oDict = oDict
+        self.oDict = checkBackend(oDict)
         self._zElidedPrefix = re.compile(u"(?i)^([dljmtsncç]|quoiqu|lorsqu|jusqu|puisqu|qu)['’](.+)")
         self._zCompoundWord = re.compile(u"(?i)(\\w+)-((?:les?|la)-(?:moi|toi|lui|[nv]ous|leur)|t-(?:il|elle|on)|y|en|[mts][’'](?:y|en)|les?|l[aà]|[mt]oi|leur|lui|je|tu|ils?|elles?|on|[nv]ous)$")
         self._zTag = re.compile(u"[:;]\\w[^:;]*")
@@ -173,32 +175,32 @@ class Lexicographe:
             if m2:
                 sWord = m2.group(1)
             # Morphologies
-            lMorph = self.oDict.getMorph(sWord)
+            lMorph = [ (sLemma, self.oDict.getTag(nTag))  for sLemma, nTag in self.oDict.getMorphTuples(sWord) ]
             if len(lMorph) > 1:
                 # sublist
-                aMorph.append( (sWord, [ self.formatTags(s)  for s in lMorph  if ":" in s ]) )
+                aMorph.append( (sWord, [ self.formatTags(sLemma, sTags)  for sLemma, sTags in lMorph  if ":" in sTags ]) )
             elif len(lMorph) == 1:
-                aMorph.append( u"{} : {}".format(sWord, self.formatTags(lMorph[0])) )
+                aMorph.append( u"{} : {}".format(sWord, self.formatTags(*lMorph[0])) )
             else:
                 aMorph.append( u"{} :  inconnu du dictionnaire".format(sWord) )
             # suffixe d’un mot composé
             if m2:
                 aMorph.append( u"-{} : {}".format(m2.group(2), self._formatSuffix(m2.group(2).lower())) )
             # Verbes
-            aVerb = set([ s[1:s.find(" ")]  for s in lMorph  if ":V" in s ])
+            aVerb = set([ sLemma  for sLemma, sTags in lMorph  if ":V" in sTags ])
             return (aMorph, aVerb)
         except:
             traceback.print_exc()
             return (["#erreur"], None)
 
-    def formatTags (self, sTags):
+    def formatTags (self, sLemma, sTags):
         sRes = ""
         sTags = re.sub("(?<=V[1-3])[itpqnmr_eaxz]+", "", sTags)
         sTags = re.sub("(?<=V0[ea])[itpqnmr_eaxz]+", "", sTags)
         for m in self._zTag.finditer(sTags):
             sRes += _dTAGS.get(m.group(0), " [{}]".format(m.group(0)))
         if sRes.startswith(" verbe") and not sRes.endswith("infinitif"):
-            sRes += " [{}]".format(sTags[1:sTags.find(" ")])
+            sRes += " [{}]".format(sLemma)
         return sRes.rstrip(",")
 
     def _formatSuffix (self, s):
@@ -2,38 +2,64 @@
 # -*- coding: UTF-8 -*-
 
 import os
+import sys
+import re
+import collections
+import itertools
+import heapq
 import traceback
 import pkgutil
+import mmap
+import time
+import hashlib
+import marshal
+from array import array
 
 from . import str_transform as st
 from .echo import echo
+from .lrucache import LRUCache
+from .bloomfilter import BloomFilter
 
 
 class IBDAWG:
-    """INDEXABLE BINARY DIRECT ACYCLIC WORD GRAPH"""
+    """INDEXABLE BINARY DIRECT ACYCLIC WORD GRAPH
+    sDicName: name of a binary dictionary in _dictionaries, or path of a binary dictionary"""
 
-    def __init__ (self, sDicName):
-        self.by = pkgutil.get_data(__package__, "_dictionaries/" + sDicName)
+    def __init__ (self, sDicName, bDecoded=False, nIndexMinArcs=0, bMmap=False, nCacheSize=0, fBloomFalsePositiveRate=0, bNumpy=False, bMaterialized=False,
+                  bLemmaIndex=False, spCache=""):
+        self.sName = sDicName
+        self.spCache = spCache      # directory where files built from the dictionary are saved (see _writeDataFile)
+        self.bMmap = False
+        if bMmap:
+            self.by = self._mapFile(sDicName)
+        if not self.bMmap:
+            if os.path.dirname(sDicName):
+                with open(sDicName, "rb") as hDic:
+                    self.by = hDic.read()
+            else:
+                self.by = pkgutil.get_data(__package__, "_dictionaries/" + sDicName)
         if not self.by:
             raise OSError("# Error. File not found or not loadable: "+sDicName)
 
         if self.by[0:7] != b"/pyfsa/":
             raise TypeError("# Error. Not a pyfsa binary dictionary. Header: {}".format(self.by[0:9]))
-        if not(self.by[7:8] == b"1" or self.by[7:8] == b"2" or self.by[7:8] == b"3"):
+        if not(self.by[7:8] == b"1" or self.by[7:8] == b"2" or self.by[7:8] == b"3" or self.by[7:8] == b"4" or self.by[7:8] == b"5" or self.by[7:8] == b"6"):
             raise ValueError("# Error. Unknown dictionary version: {}".format(self.by[7:8]))
         try:
-            header, info, values, bdic = self.by.split(b"\0\0\0\0", 3)
+            if self.bMmap:
+                header, info, values, bdic = self._splitSections(self.by)
+            else:
+                header, info, values, bdic = self.by.split(b"\0\0\0\0", 3)
         except Exception:
             raise Exception
 
-        self.sName = sDicName
-        self.nVersion = int(self.by[7:8].decode("utf-8"))
-        self.sHeader = header.decode("utf-8")
-        self.lArcVal = values.decode("utf-8").split("\t")
+        self.nVersion = int(str(self.by[7:8], "utf-8"))
+        self.sHeader = str(header, "utf-8")
+        self.lArcVal = str(values, "utf-8").split("\t")
         self.nArcVal = len(self.lArcVal)
         self.byDic = bdic
 
-        l = info.decode("utf-8").split("/")
+        l = str(info, "utf-8").split("/")
         self.sLang = l[0]
         self.nChar = int(l[1])
         self.nBytesArc = int(l[2])
@@ -43,6 +69,11 @@ class IBDAWG:
         self.nArc = int(l[6])
         self.nAff = int(l[7])
         self.cStemming = l[8]
+        if self.nVersion == 4:
+            self.nWords = int(l[9])
+            self.nBytesWordCount = int(l[10])
+        elif self.nVersion == 5:
+            self.nBytesNodeHeader = int(l[9])
         if self.cStemming == "S":
             self.funcStemming = st.getStemFromSuffixCode
         elif self.cStemming == "A":
@@ -65,29 +96,513 @@ class IBDAWG:
         if self.nVersion == 1:
             self.morph = self._morph1
             self.stem = self._stem1
+            self._morphAt = self._morphAt1
+            self._stemAt = self._stemAt1
             self._lookupArcNode = self._lookupArcNode1
+            self._getArcs = self._getArcs1
             self._writeNodes = self._writeNodes1
         elif self.nVersion == 2:
             self.morph = self._morph2
             self.stem = self._stem2
+            self._morphAt = self._morphAt2
+            self._stemAt = self._stemAt2
             self._lookupArcNode = self._lookupArcNode2
+            self._getArcs = self._getArcs2
             self._writeNodes = self._writeNodes2
-        elif self.nVersion == 3:
+        elif self.nVersion == 3 or self.nVersion == 4:
+            # version 4: as version 3, with the number of words before each node
             self.morph = self._morph3
             self.stem = self._stem3
+            self._morphAt = self._morphAt3
+            self._stemAt = self._stemAt3
             self._lookupArcNode = self._lookupArcNode3
+            self._getArcs = self._getArcs3
             self._writeNodes = self._writeNodes3
+        elif self.nVersion == 5:
+            self._finalNodeMask = 1 << ((self.nBytesNodeHeader * 8) - 1)
+            self._arcCountMask = self._finalNodeMask - 1
+            self._nBytesArcAddr = self.nBytesArc + self.nBytesNodeAddress
+            self.lookup = self._lookup5
+            self.morph = self._morph5
+            self.stem = self._stem5
+            self._morphAt = self._morphAt5
+            self._stemAt = self._stemAt5
+            self._isFinalNode = self._isFinalNode5
+            self._lookupArcNode = self._lookupArcNode5
+            self._getArcs = self._getArcs5
+            self._writeNodes = self._writeNodes5
+        elif self.nVersion == 6:
+            self._arcMask = (2 ** ((self.nBytesArc * 8) - 4)) - 1
+            self._offsetCodeShift = (self.nBytesArc * 8) - 4
+            self._lLinkSize = [self.nBytesNodeAddress, 1, 2, 2]     # size of address or offset, according to the code of the arc
+            self.morph = self._morph6
+            self.stem = self._stem6
+            self._morphAt = self._morphAt6
+            self._stemAt = self._stemAt6
+            self._lookupArcNode = self._lookupArcNode6
+            self._getArcs = self._getArcs6
+            self._writeNodes = self._writeNodes6
         else:
             raise ValueError("  # Error: unknown code: {}".format(self.nVersion))
+        self._lookupArcNodeScan = self._lookupArcNode
+        # word counts (word numbering): stored in the dictionary (version 4) or counted when needed
+        self._dWordCount = None
+        self._getWordCount = self._getWordCount4  if self.nVersion == 4  else self._getWordCountL
+
+        # Decoded arcs: the binary graph is decoded once into arrays, whatever the version
+        self.bDecoded = bDecoded
+        if bDecoded:
+            self._decodeArcs()
+            self.lookup = self._lookupD
+            self.morph = self._morphD
+            self.stem = self._stemD
+            self._morphAt = self._morphAtD
+            self._stemAt = self._stemAtD
+            self._isFinalNode = self._isFinalNodeD
+            self._lookupArcNode = self._lookupArcNodeD
+            self._getArcs = self._getArcsD
+            if self.nVersion == 4:
+                self._getWordCount = self._getWordCountD
+
+        # Materialized dictionary: all words in a hash map {word: morphologies}, loaded from a snapshot if it is up to date
+        # (a directory spCache is required, so that the hash map is built only once)
+        self._dWord = None
+        if bMaterialized:
+            if not spCache:
+                raise ValueError("# Error. Materialized dictionary: a directory is required to save its snapshot (spCache).")
+            self._dWord = self._loadSnapshot(".mdic", self._expandWords)
+            self.lookup = self._lookupM
+            self.morph = self._morphM
+            self.stem = self._stemM
+            self.isValid = self._isValidM
+            self.getMorph = self._getMorphM
+            self.getMorphTuples = self._getMorphTuplesM
+            self.lookupBatch = self._lookupBatchM
+            self.getMorphBatch = self._getMorphBatchM
+
+        # Transition index: direct access to next node for nodes with many arcs
+        self._dTransitionIndex = {}
+        self.nIndexMinArcs = 0
+        if nIndexMinArcs:
+            self.buildTransitionIndex(nIndexMinArcs)
 
         self.bOptNumSigle = False
         self.bOptNumAtLast = False
 
+        self._dSimilarCharValues = {}    # for lookupFolded
+
+        # Bloom filter of lowercase words, to reject unknown words without walking the graph
+        self.oBloomFilter = None
+        if fBloomFalsePositiveRate:
+            self.setBloomFilter(fBloomFalsePositiveRate)
+
+        # NumPy arrays of the word graph, for batch lookups (optional)
+        self.oNumpyDawg = None
+        if bNumpy:
+            self.setNumpyBackend()
+
+        # Overlays: lexicons added at runtime, consulted with the word graph
+        self._lOverlay = []
+        self._dNoOverlayFunc = {}
+        self.nGeneration = 0    # incremented each time overlays change (see getGeneration)
+        self._dTagId = None
+
+        self._dLemma = None     # index of forms of lemmas (see getForms)
+        if bLemmaIndex:
+            self.setLemmaIndex()
+
+        self._dProfile = None   # transitions recorded while profiling (see startProfile)
+
+        # LRU caches for isValid, isValidToken, getMorph, stem and getMorphTuples
+        self.nCacheSize = 0
+        self._dCache = {}
+        self._dUncachedFunc = {}
+        if nCacheSize:
+            self.setCacheSize(nCacheSize)
+
+    def _mapFile (self, sDicName):
+        """maps the dictionary file in memory (read only), so that processes share the same pages
+        returns None if the file is not a regular file (e.g. in a zipped package): pkgutil will be used instead"""
+        spfDic = sDicName  if os.path.dirname(sDicName)  else os.path.join(os.path.dirname(os.path.abspath(__file__)), "_dictionaries", sDicName)
+        if not os.path.isfile(spfDic):
+            return None
+        with open(spfDic, "rb") as hDic:
+            self._oMmap = mmap.mmap(hDic.fileno(), 0, access=mmap.ACCESS_READ)
+        self.bMmap = True
+        return memoryview(self._oMmap)
+
+    def _splitSections (self, by):
+        "returns header, informations, values and word graph as memoryviews of <by> (no copy)"
+        lSection = []
+        iStart = 0
+        for i in range(3):
+            iEnd = self._oMmap.find(b"\0\0\0\0", iStart)
+            if iEnd < 0:
+                raise ValueError("# Error. Missing section in dictionary: " + self.sName)
+            lSection.append(by[iStart:iEnd])
+            iStart = iEnd + 4
+        lSection.append(by[iStart:])
+        return lSection
+
+    def _getHash (self):
+        "returns a hash of the binary dictionary, so that files built from it (Bloom filter, snapshot) can be checked"
+        return hashlib.blake2b(self.by, digest_size=16).hexdigest()
+
+    # Files built from the dictionary (Bloom filter, snapshots) are read in the directory self.spCache, else in _dictionaries
+    # (files shipped with the dictionary). They are written only in self.spCache: nothing is written if it is empty.
+
+    def _getDataFileName (self, sExtension):
+        "returns name of file <sExtension> built from this dictionary"
+        sName = os.path.basename(self.sName)
+        return (sName[:-5]  if sName.endswith(".bdic")  else sName) + sExtension
+
+    def _readDataFile (self, sFileName):
+        "returns content of <sFileName> in self.spCache or in _dictionaries, or None"
+        if self.spCache:
+            try:
+                with open(os.path.join(self.spCache, sFileName), "rb") as hSrc:
+                    return hSrc.read()
+            except OSError:
+                pass
+        try:
+            return pkgutil.get_data(__package__, "_dictionaries/" + sFileName)
+        except OSError:
+            return None
+
+    def _writeDataFile (self, sFileName, by):
+        "writes by in <self.spCache>/<sFileName> (if there is such a directory)"
+        if not self.spCache:
+            return
+        try:
+            os.makedirs(self.spCache, exist_ok=True)
+            with open(os.path.join(self.spCache, sFileName), "wb") as hDst:
+                hDst.write(by)
+        except OSError:
+            echo("# Warning. File not saved: " + sFileName)
+
     def getInfo (self):
         return  "  Language: {0.sLang:>10}      Version: {0.nVersion:>2}      Stemming: {0.cStemming}FX\n" \
                 "  Arcs values:  {0.nArcVal:>10,} = {0.nChar:>5,} characters,  {0.nAff:>6,} affixes,  {0.nTag:>6,} tags\n" \
                 "  Dictionary: {0.nEntries:>12,} entries,    {0.nNode:>11,} nodes,   {0.nArc:>11,} arcs\n" \
-                "  Address size: {0.nBytesNodeAddress:>1} bytes,  Arc size: {0.nBytesArc:>1} bytes\n".format(self)
+                "  Address size: {0.nBytesNodeAddress:>1} bytes,  Arc size: {0.nBytesArc:>1} bytes\n".format(self) \
+                + ("  Words: {0.nWords:>15,},    word count size: {0.nBytesWordCount:>1} bytes\n".format(self)  if self.nVersion == 4  else "")
+
+    def buildTransitionIndex (self, nMinArcs=16):
+        """builds a table (char value -> next node address) for each node with at least <nMinArcs> arcs for chars,
+        so that _lookupArcNode gets the next node of these nodes without scanning arcs (nMinArcs = 0: no index)"""
+        self._dTransitionIndex = {}
+        self.nIndexMinArcs = nMinArcs
+        if nMinArcs:
+            lStack = [0]
+            aSeen = { 0 }
+            while lStack:
+                iAddr = lStack.pop()
+                lArc = [ (nVal, iNextAddr)  for nVal, iNextAddr in self._getArcs(iAddr)  if nVal < self.nChar ]
+                if len(lArc) >= nMinArcs:
+                    lNextAddr = [None] * self.nChar
+                    for nVal, iNextAddr in lArc:
+                        lNextAddr[nVal] = iNextAddr
+                    self._dTransitionIndex[iAddr] = lNextAddr
+                for nVal, iNextAddr in lArc:
+                    if iNextAddr not in aSeen:
+                        aSeen.add(iNextAddr)
+                        lStack.append(iNextAddr)
+        # Configuring _lookupArcNode
+        if self.bDecoded:
+            self._lookupArcNodeScan = self._lookupArcNodeD
+            self._lookupArcNode = self._lookupArcNodeDI  if self._dTransitionIndex  else self._lookupArcNodeD
+        else:
+            self._lookupArcNode = self._lookupArcNodeIndexed  if self._dTransitionIndex  else self._lookupArcNodeScan
+
+    def getTransitionIndexInfo (self):
+        "returns number of nodes indexed and memory used by the transition index"
+        nBytes = sys.getsizeof(self._dTransitionIndex) + sum( sys.getsizeof(lNextAddr)  for lNextAddr in self._dTransitionIndex.values() )
+        return "  Transition index: {:>8,} nodes (at least {} arcs),  {:>10,} bytes\n".format(len(self._dTransitionIndex), self.nIndexMinArcs, nBytes)
+
+    # CACHE
+    _lCachedFunc = ["isValid", "isValidToken", "getMorph", "stem", "getMorphTuples"]
+
+    def setCacheSize (self, nMaxSize):
+        """enables LRU caches (at most <nMaxSize> words for each of isValid, isValidToken, getMorph, stem and getMorphTuples)
+        or disables them if nMaxSize is 0"""
+        self.nCacheSize = nMaxSize
+        # restore uncached functions
+        for sFuncName, func in self._dUncachedFunc.items():
+            setattr(self, sFuncName, func)
+        self._dUncachedFunc = {}
+        self._dCache = {}
+        if nMaxSize:
+            for sFuncName in self._lCachedFunc:
+                self._dCache[sFuncName] = LRUCache(nMaxSize)
+                self._dUncachedFunc[sFuncName] = getattr(self, sFuncName)
+                setattr(self, sFuncName, self._createCachedFunc(self._dCache[sFuncName], self._dUncachedFunc[sFuncName]))
+
+    def _createCachedFunc (self, oCache, func):
+        "returns a function which returns the result of func(sWord) stored in oCache, or calls func and stores its result"
+        def funcCached (sWord):
+            try:
+                result = oCache[sWord]
+            except KeyError:
+                result = func(sWord)
+                oCache[sWord] = result
+            # lists are copied, as callers may modify them
+            return list(result)  if type(result) is list  else result
+        return funcCached
+
+    def clearCache (self):
+        "removes all words from caches (must be called if the dictionary content changes)"
+        for oCache in self._dCache.values():
+            oCache.clear()
+
+    def getCacheInfo (self):
+        "returns statistics about caches (size, hits, misses, evictions)"
+        if not self._dCache:
+            return "  Cache: disabled\n"
+        s = ""
+        for sFuncName, oCache in self._dCache.items():
+            s += "  Cache {0:<14} {nSize:>8,} / {nMaxSize:<8,}  hits: {nHit:>10,}   misses: {nMiss:>10,}   evictions: {nEviction:>10,}\n".format(sFuncName+":", **oCache.getStats())
+        return s
+
+    # BLOOM FILTER
+    # All casing variants of a word have the same lowercase form: if it is not in the filter, no variant is in the dictionary.
+
+    def setBloomFilter (self, fFalsePositiveRate=0.01, nMaxBytes=0):
+        """enables a Bloom filter of words in lowercase (at most <nMaxBytes> bytes if not 0), used by isValid and getMorph
+        to reject unknown words; or disables it if fFalsePositiveRate is 0.
+        The filter is loaded from “<name>.bloom” if it was built with this dictionary and these parameters,
+        else it is built, then saved in this file (see _writeDataFile)."""
+        self.oBloomFilter = None
+        if not fFalsePositiveRate:
+            return
+        sTag = "{}:{}:{}".format(self._getHash(), fFalsePositiveRate, nMaxBytes)
+        sBloomFileName = self._getDataFileName(".bloom")
+        by = self._readDataFile(sBloomFileName)
+        if by:
+            try:
+                oBloomFilter, sFileTag = BloomFilter.fromBytes(by)
+                if sFileTag == sTag:
+                    self.oBloomFilter = oBloomFilter
+                    return
+            except ValueError:
+                pass
+        self.oBloomFilter = self.buildBloomFilter(fFalsePositiveRate, nMaxBytes)
+        self._writeDataFile(sBloomFileName, self.oBloomFilter.toBytes(sTag))
+
+    def buildBloomFilter (self, fFalsePositiveRate=0.01, nMaxBytes=0):
+        "returns a Bloom filter of words of the dictionary in lowercase"
+        aWord = set( sFlex.lower()  for sFlex, _, _ in self.iterEntries() )
+        oBloomFilter = BloomFilter(len(aWord), fFalsePositiveRate, nMaxBytes)
+        for sWord in aWord:
+            oBloomFilter.add(sWord)
+        return oBloomFilter
+
+    # NUMPY BACKEND
+    # Optional: requires NumPy. Batch lookups (lookupBatch, isValidBatch, isValidTokenBatch) walk all words together.
+
+    def setNumpyBackend (self, bEnable=True):
+        "enables (or disables) NumPy arrays of the word graph for batch lookups, returns True if enabled"
+        self.oNumpyDawg = None
+        if not bEnable:
+            return False
+        try:
+            from .numpydawg import NumpyDawg
+        except ImportError:
+            echo("# Warning. NumPy not available: batch lookups walk the word graph.")
+            return False
+        self.oNumpyDawg = NumpyDawg(self)
+        return True
+
+    # OVERLAYS
+    # Lexicons added at runtime (e.g. proper nouns and jargon of users), without rebuilding the word graph.
+    # Each overlay is a dictionary {flexion: tuple of (lemma, tag id)} (empty tuple: word without morphologies),
+    # with its reverse dictionary {lemma: tuple of (flexion, tag id)} (see getForms).
+    # While there are overlays, the functions of _lOverlayFunc are replaced by functions which consult the word graph then the overlays.
+    # Tags unknown in the dictionary get new tag ids (appended to self.lArcVal, after arcs values).
+
+    _lOverlayFunc = ["lookup", "isValid", "lookupBatch", "morph", "stem", "getMorph", "getMorphTuples", "getMorphBatch"]
+
+    def addOverlay (self, sName, lEntry):
+        """adds (or replaces) the overlay <sName>, made of entries of lEntry: flexions (strings) or tuples (flexion, lemma, tags)
+        (overlays are consulted in the order they were added)"""
+        if self._dTagId is None:
+            self._dTagId = { self.lArcVal[nTag]: nTag  for nTag in range(self.nChar + self.nAff, self.nArcVal) }
+        dWord = {}
+        for xEntry in lEntry:
+            if type(xEntry) is str:
+                dWord.setdefault(xEntry, ())
+                continue
+            sFlex, sLemma, sTags = xEntry
+            if sTags not in self._dTagId:
+                self._dTagId[sTags] = len(self.lArcVal)
+                self.lArcVal.append(sTags)
+            dWord[sFlex] = dWord.get(sFlex, ()) + ((sys.intern(sLemma), self._dTagId[sTags]),)
+        dLemma = {}
+        for sFlex, tMorph in dWord.items():
+            for sLemma, nTag in tMorph:
+                dLemma[sLemma] = dLemma.get(sLemma, ()) + ((sFlex, nTag),)
+        self._lOverlay = [ tOverlay  for tOverlay in self._lOverlay  if tOverlay[0] != sName ] + [ (sName, dWord, dLemma) ]
+        self._setOverlayFunctions()
+        return len(dWord)
+
+    def loadOverlay (self, sName, spfLexicon):
+        """adds (or replaces) the overlay <sName> from the lexicon file spfLexicon (UTF-8): one entry per line,
+        a flexion, or a flexion, a lemma and tags separated by tabulations (as written by export-lexicon.py); “#”: comment"""
+        lEntry = []
+        with open(spfLexicon, "r", encoding="utf-8") as hSrc:
+            for sLine in hSrc:
+                sLine = sLine.strip()
+                if sLine and not sLine.startswith("#"):
+                    lField = sLine.split("\t")
+                    lEntry.append(lField[0]  if len(lField) < 3  else tuple(lField[0:3]))
+        return self.addOverlay(sName, lEntry)
+
+    def removeOverlay (self, sName):
+        "removes the overlay <sName>, returns False if there is no such overlay"
+        nOverlay = len(self._lOverlay)
+        self._lOverlay = [ tOverlay  for tOverlay in self._lOverlay  if tOverlay[0] != sName ]
+        self._setOverlayFunctions()
+        return len(self._lOverlay) < nOverlay
+
+    def getOverlays (self):
+        "returns the list of overlays as tuples (name, number of flexions)"
+        return [ (sName, len(dOverlay))  for sName, dOverlay, _ in self._lOverlay ]
+
+    def _setOverlayFunctions (self):
+        "replaces functions of _lOverlayFunc according to overlays, caches are emptied (as cached functions call these functions)"
+        nCacheSize = self.nCacheSize
+        self.setCacheSize(0)        # restores uncached functions, empties caches
+        for sFuncName, func in self._dNoOverlayFunc.items():
+            setattr(self, sFuncName, func)
+        self._dNoOverlayFunc = {}
+        if self._lOverlay:
+            for sFuncName in self._lOverlayFunc:
+                self._dNoOverlayFunc[sFuncName] = getattr(self, sFuncName)
+                setattr(self, sFuncName, getattr(self, "_" + sFuncName + "O"))
+        if nCacheSize:
+            self.setCacheSize(nCacheSize)
+        self.nGeneration += 1
+
+    def getGeneration (self):
+        "returns a number incremented each time overlays are added or removed: results of lookups got before are outdated"
+        return self.nGeneration
+
+    def _isInOverlays (self, sWord):
+        "returns True if sWord is in an overlay"
+        for _, dOverlay, _ in self._lOverlay:
+            if sWord in dOverlay:
+                return True
+        return False
+
+    def _morphTuplesInOverlays (self, lForm):
+        "returns list of tuples (lemma, tag id) of forms of lForm in overlays"
+        return [ tMorph  for sForm in lForm  for _, dOverlay, _ in self._lOverlay  for tMorph in dOverlay.get(sForm, ()) ]
+
+    def _lookupO (self, sWord):
+        "returns True if sWord in dictionary or in overlays (strict verification)"
+        return self._dNoOverlayFunc["lookup"](sWord) or self._isInOverlays(sWord)
+
+    def _isValidO (self, sWord):
+        "checks if sWord is valid, in dictionary or in overlays (different casing tested if the first letter is a capital)"
+        bValid = self._dNoOverlayFunc["isValid"](sWord)
+        if bValid or not sWord:
+            return bValid
+        sWord = sWord.replace("’", "'")
+        return self._isInOverlays(sWord) or any( self._isInOverlays(sVariant)  for sVariant in self._getCaseVariants(sWord) )
+
+    def _lookupBatchO (self, lWord):
+        "returns a dictionary {word: True or False} for all words in lWord (strict verification, dictionary and overlays)"
+        dFound = self._dNoOverlayFunc["lookupBatch"](lWord)
+        for sWord, bFound in dFound.items():
+            if not bFound and self._isInOverlays(sWord):
+                dFound[sWord] = True
+        return dFound
+
+    def _morphO (self, sWord):
+        "returns morphologies of sWord (dictionary and overlays)"
+        return self._dNoOverlayFunc["morph"](sWord) + [ self.getMorphFromTuple(tMorph)  for tMorph in self._morphTuplesInOverlays([sWord]) ]
+
+    def _stemO (self, sWord):
+        "returns stems list of sWord (dictionary and overlays)"
+        l = self._dNoOverlayFunc["stem"](sWord)
+        for sLemma, _ in self._morphTuplesInOverlays([sWord]):
+            if sLemma not in l:
+                l.append(sLemma)
+        return l
+
+    def _getMorphO (self, sWord):
+        "retrieves morphologies list, different casing allowed (dictionary and overlays)"
+        lForm = self._getMorphCaseForms(sWord)  if sWord[0:1].isupper()  else [sWord]
+        return self._dNoOverlayFunc["getMorph"](sWord) + [ self.getMorphFromTuple(tMorph)  for tMorph in self._morphTuplesInOverlays(lForm) ]
+
+    def _getMorphTuplesO (self, sWord):
+        "retrieves morphologies as a tuple of tuples (lemma, tag id), different casing allowed (dictionary and overlays)"
+        lForm = self._getMorphCaseForms(sWord)  if sWord[0:1].isupper()  else [sWord]
+        return self._dNoOverlayFunc["getMorphTuples"](sWord) + tuple(self._morphTuplesInOverlays(lForm))
+
+    def _getMorphBatchO (self, lWord):
+        "returns a list of results of getMorph for each word of lWord (same order, dictionary and overlays)"
+        return [ lMorph + [ self.getMorphFromTuple(tMorph)  for tMorph in self._morphTuplesInOverlays(self._getMorphCaseForms(sWord)  if sWord[0:1].isupper()  else [sWord]) ]
+                 for sWord, lMorph in zip(lWord, self._dNoOverlayFunc["getMorphBatch"](lWord)) ]
+
+    # PROFILE
+    # Instrumentation mode: while profiling, each transition (node, arc value) requested by a walk of the word graph is counted.
+    # Saved profiles are given to the builder (DAWG), which puts the most used arcs first and hot nodes together.
+    # Only walks of the word graph are recorded: use no cache, no Bloom filter, no NumPy backend and no materialized mode.
+
+    def startProfile (self):
+        "starts (or resumes) recording transitions of the word graph"
+        if self._dProfile is None:
+            self._dProfile = {}
+        if self._lookupArcNode != self._lookupArcNodeP:
+            self._lookupArcNodeUnprofiled = self._lookupArcNode
+            self._lookupArcNode = self._lookupArcNodeP
+
+    def stopProfile (self):
+        "stops recording transitions (recorded transitions are kept until saveProfile or clearProfile)"
+        if self._lookupArcNode == self._lookupArcNodeP:
+            self._lookupArcNode = self._lookupArcNodeUnprofiled
+
+    def clearProfile (self):
+        "forgets recorded transitions"
+        if self._dProfile is not None:
+            self._dProfile.clear()
+
+    def _lookupArcNodeP (self, nVal, iAddr):
+        "counts transition (iAddr, nVal), then looks up the next node (see startProfile)"
+        tTransition = (iAddr, nVal)
+        self._dProfile[tTransition] = self._dProfile.get(tTransition, 0) + 1
+        return self._lookupArcNodeUnprofiled(nVal, iAddr)
+
+    def saveProfile (self, spfDest):
+        """writes recorded transitions in spfDest, returns number of transitions written
+        Format: one transition per line, chars from the root to the node, char of the arc, count (separated by tabulations);
+        as the word graph is minimal, any path to a node leads to the same node when the dictionary is built again."""
+        dTransition = {}    # {node: {value: count}}
+        for (iAddr, nVal), nCount in (self._dProfile or {}).items():
+            if nVal < self.nChar:
+                dTransition.setdefault(iAddr, {})[nVal] = nCount
+        # shortest paths of chars to nodes (breadth first)
+        dPath = { 0: "" }
+        lNode = [0]
+        nNodeLeft = len(dTransition) - (0 in dTransition)
+        for iAddr in lNode:
+            if not nNodeLeft:
+                break
+            for nVal, iNextAddr in self._getArcs(iAddr):
+                if nVal < self.nChar and iNextAddr not in dPath:
+                    dPath[iNextAddr] = dPath[iAddr] + self.lArcVal[nVal]
+                    lNode.append(iNextAddr)
+                    if iNextAddr in dTransition:
+                        nNodeLeft -= 1
+        nTransition = 0
+        with open(spfDest, "w", encoding="utf-8", newline="\n") as hDst:
+            hDst.write("# Profile of lookups in {}: path to node, char, count\n".format(self.sName))
+            for iAddr, dCount in sorted(dTransition.items(), key=lambda t: dPath.get(t[0], "")):
+                if iAddr in dPath:
+                    for nVal, nCount in sorted(dCount.items(), key=lambda t: t[1], reverse=True):
+                        hDst.write("{}\t{}\t{}\n".format(dPath[iAddr], self.lArcVal[nVal], nCount))
+                        nTransition += 1
+        return nTransition
 
     def writeAsJSObject (self, spfDest):
         "write IBDAWG as a JavaScript object in a JavaScript module"
@@ -136,20 +651,131 @@ class IBDAWG:
             return None
         if "’" in sWord: # ugly hack
             sWord = sWord.replace("’", "'")
-        if self.lookup(sWord):
+        if self.oBloomFilter and sWord.lower() not in self.oBloomFilter:
+            return bool(self.bOptNumSigle and self._isSigle(sWord))
+        lVariant = self._getCaseVariants(sWord)
+        if not lVariant:
+            return bool(self.lookup(sWord))
+        # the word and its casing variants are looked up together
+        if any( iAddr is not None and self._isFinalNode(iAddr)  for iAddr in self._walkCaseVariants([sWord] + lVariant) ):
             return True
+        return bool(self.bOptNumSigle and self._isSigle(sWord))
+
+    def _walkCaseVariants (self, lForm):
+        """generator: for each form of lForm (casing variants of a word), yields the address of the node reached with it, or None
+        Forms are walked one after another (lazily: callers can stop at the first form found),
+        and forms beginning with the same char (e.g. “PARIS” and “Paris”) share the first arc."""
+        dFirstNode = {}
+        for sForm in lForm:
+            c = sForm[0:1]
+            if c not in dFirstNode:
+                dFirstNode[c] = self._lookupArcNode(self.dChar[c], 0)  if c in self.dChar  else None
+            iAddr = dFirstNode[c]
+            if iAddr is not None:
+                for c in sForm[1:]:
+                    if c not in self.dChar:
+                        iAddr = None
+                        break
+                    iAddr = self._lookupArcNode(self.dChar[c], iAddr)
+                    if iAddr == None:
+                        break
+            yield iAddr
+
+    def _getCaseVariants (self, sWord):
+        "returns the list of casing variants to check when sWord is not found (the first letter must be a capital)"
         if sWord[0:1].isupper():
             if len(sWord) > 1:
                 if sWord.istitle():
-                    return bool(self.lookup(sWord.lower()))
+                    return [sWord.lower()]
                 if sWord.isupper():
-                    if self.bOptNumSigle:
-                        return True
-                    return bool(self.lookup(sWord.lower()) or self.lookup(sWord.capitalize()))
-                return bool(self.lookup(sWord[:1].lower() + sWord[1:]))
+                    return [sWord.lower(), sWord.capitalize()]
+                return [sWord[:1].lower() + sWord[1:]]
             else:
-                return bool(self.lookup(sWord.lower()))
-        return False
+                return [sWord.lower()]
+        return []
+
+    def _isSigle (self, sWord):
+        "returns True if sWord is written in capitals only (option: bOptNumSigle)"
+        return sWord[0:1].isupper() and len(sWord) > 1 and not sWord.istitle() and sWord.isupper()
+
+    # BATCH LOOKUPS
+    # Words are sorted, so that each word resumes the walk in the graph from the deepest node shared with the previous word.
+
+    def _walkSortedWords (self, lWord):
+        "generator: for each word of the sorted list lWord, yields (sWord, iAddr), iAddr being the node reached with sWord or None"
+        lAddr = [0]     # lAddr[i]: address of the node reached with the first i chars of the previous word
+        sPrevWord = ""
+        for sWord in lWord:
+            # common prefix with previous word, as far as the previous walk went
+            n = 0
+            nMax = min(len(sWord), len(lAddr)-1)
+            while n < nMax and sWord[n] == sPrevWord[n]:
+                n += 1
+            del lAddr[n+1:]
+            iAddr = lAddr[n]
+            for c in sWord[n:]:
+                if c not in self.dChar:
+                    break
+                iAddr = self._lookupArcNode(self.dChar[c], iAddr)
+                if iAddr == None:
+                    break
+                lAddr.append(iAddr)
+            sPrevWord = sWord
+            yield (sWord, iAddr  if len(lAddr) == len(sWord)+1  else None)
+
+    def lookupBatch (self, lWord):
+        "returns a dictionary {word: True or False} for all words in lWord (strict verification)"
+        if self.oNumpyDawg:
+            return self.oNumpyDawg.lookupBatch(lWord)
+        return { sWord: iAddr is not None and bool(self._isFinalNode(iAddr))  for sWord, iAddr in self._walkSortedWords(sorted(set(lWord))) }
+
+    def isValidBatch (self, lWord):
+        "returns a list of results of isValid for each word of lWord (same order)"
+        lWord = [ sWord.replace("’", "'")  if "’" in sWord  else sWord  for sWord in lWord ]
+        dFound = self.lookupBatch([ sWord  for sWord in lWord  if sWord ])
+        # casing variants of words not found
+        dVariants = {}
+        for sWord, bFound in dFound.items():
+            if not bFound and not (self.bOptNumSigle and self._isSigle(sWord)):
+                dVariants[sWord] = self._getCaseVariants(sWord)
+        dFoundVariant = self.lookupBatch([ sVariant  for lVariant in dVariants.values()  for sVariant in lVariant ])
+        lResult = []
+        for sWord in lWord:
+            if not sWord:
+                lResult.append(None)
+            elif sWord in dVariants:
+                lResult.append(any(dFoundVariant[sVariant]  for sVariant in dVariants[sWord]))
+            else:
+                lResult.append(True)
+        return lResult
+
+    def isValidTokenBatch (self, lToken):
+        "returns a list of results of isValidToken for each token of lToken (same order)"
+        lWord = list(lToken)
+        for sToken in lToken:
+            if "-" in sToken and sToken.count("-") <= 4:
+                lWord.extend(sToken.split("-"))
+        dValid = dict(zip(lWord, self.isValidBatch(lWord)))
+        lResult = []
+        for sToken in lToken:
+            if dValid[sToken]:
+                lResult.append(True)
+            elif "-" in sToken:
+                lResult.append(sToken.count("-") > 4 or all(dValid[sWord]  for sWord in sToken.split("-")))
+            else:
+                lResult.append(False)
+        return lResult
+
+    def getMorphBatch (self, lWord):
+        "returns a list of results of getMorph for each word of lWord (same order)"
+        dForms = {}
+        for sWord in lWord:
+            if sWord not in dForms:
+                dForms[sWord] = self._getMorphCaseForms(sWord)  if sWord[0:1].isupper()  else [sWord]
+        dMorph = {}
+        for sForm, iAddr in self._walkSortedWords(sorted(set( sForm  for lForm in dForms.values()  for sForm in lForm ))):
+            dMorph[sForm] = self._morphAt(sForm, iAddr)  if iAddr is not None  else []
+        return [ [ sMorph  for sForm in dForms[sWord]  for sMorph in dMorph[sForm] ]  for sWord in lWord ]
 
     def lookup (self, sWord):
         "returns True if sWord in dictionary (strict verification)"
@@ -162,39 +788,397 @@ class IBDAWG:
                 return False
         return int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesArc], byteorder='big') & self._finalNodeMask
 
-    def getSugg (self, sWord, iAddr=0, sNewWord=""):
-        "not finished"
-        # RECURSIVE FUNCTION
+    def _isFinalNode (self, iAddr):
+        "returns True if node at iAddr is final"
+        return int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesArc], byteorder='big') & self._finalNodeMask
+
+    def _lookupArcNodeIndexed (self, nVal, iAddr):
+        "looks if nVal is an arc at the node at iAddr, if yes, returns address of next node else None (with transition index)"
+        lNextAddr = self._dTransitionIndex.get(iAddr)
+        if lNextAddr is None:
+            return self._lookupArcNodeScan(nVal, iAddr)
+        return lNextAddr[nVal]
+
+    # WORD NUMBERING
+    # Each word (flexion) of the dictionary gets an index from 0 to countWords()-1, according to the order of arcs in the graph.
+    # The index is computed with the number of words reachable from each node: a word ending at a node comes before
+    # words going further, and words reached with previous arcs of a node come before words reached with the next arcs.
+
+    def countWords (self):
+        "returns the number of words (flexions) of the dictionary"
+        return self._getWordCount(0)
+
+    def wordIndex (self, sWord):
+        "returns the index of sWord (from 0 to countWords()-1) or None if sWord is not in dictionary (strict verification)"
+        iAddr = 0
+        nIndex = 0
+        for c in sWord:
+            if c not in self.dChar:
+                return None
+            nVal = self.dChar[c]
+            if self._isFinalNode(iAddr):
+                nIndex += 1
+            for nArc, iNextAddr in self._getArcs(iAddr):
+                if nArc == nVal:
+                    break
+                if nArc < self.nChar:
+                    nIndex += self._getWordCount(iNextAddr)
+            else:
+                return None
+            iAddr = iNextAddr
+        return nIndex  if self._isFinalNode(iAddr)  else None
+
+    def wordAt (self, nIndex):
+        "returns the word at index nIndex (see wordIndex)"
+        if not 0 <= nIndex < self._getWordCount(0):
+            raise IndexError("# Error. Word index out of range: {}".format(nIndex))
+        iAddr = 0
+        sWord = ""
+        while True:
+            if self._isFinalNode(iAddr):
+                if nIndex == 0:
+                    return sWord
+                nIndex -= 1
+            for nArc, iNextAddr in self._getArcs(iAddr):
+                if nArc < self.nChar:
+                    nWord = self._getWordCount(iNextAddr)
+                    if nIndex < nWord:
+                        break
+                    nIndex -= nWord
+            else:
+                raise ValueError("# Error. Word counts are inconsistent in dictionary: " + self.sName)
+            sWord += self.lArcVal[nArc]
+            iAddr = iNextAddr
+
+    def _getWordCount4 (self, iAddr):
+        "returns the number of words reachable from node at iAddr (stored before the node, version 4)"
+        if iAddr == 0:
+            return self.nWords
+        return int.from_bytes(self.byDic[iAddr-self.nBytesWordCount:iAddr], byteorder='big')
+
+    def _getWordCountL (self, iAddr):
+        "returns the number of words reachable from node at iAddr (counted for the whole graph at the first call)"
+        if self._dWordCount is None:
+            self._countWords()
+        return self._dWordCount[iAddr]
+
+    def _countWords (self):
+        "counts words reachable from each node (dictionaries without word counts): self._dWordCount"
+        dWordCount = {}
+        lStack = [0]
+        while lStack:
+            iAddr = lStack[-1]
+            if iAddr in dWordCount:
+                lStack.pop()
+                continue
+            lNextAddr = [ iNextAddr  for nVal, iNextAddr in self._getArcs(iAddr)  if nVal < self.nChar ]
+            lTodo = [ iNextAddr  for iNextAddr in lNextAddr  if iNextAddr not in dWordCount ]
+            if lTodo:
+                lStack.extend(lTodo)
+                continue
+            lStack.pop()
+            dWordCount[iAddr] = (1  if self._isFinalNode(iAddr)  else 0) + sum( dWordCount[iNextAddr]  for iNextAddr in lNextAddr )
+        self._dWordCount = dWordCount
+
+    # ACCENT-INSENSITIVE LOOKUP
+    # At each char of the word, all similar chars (see str_transform.dSimilarChars) are followed: branches stop where the graph has no arc.
+
+    def lookupFolded (self, sWord, nMaxWord=10):
+        """returns the list of words of the dictionary equal to sWord (or to its casing variants) when accents are ignored
+        (e.g. “ecole” -> [“école”], “deja” -> [“déjà”]), at most nMaxWord words, words with the chars as typed first"""
         if not sWord:
-            if int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesArc], byteorder='big') & self._finalNodeMask:
-                return [sNewWord]
             return []
-        lSugg = []
-        lArc = self._getSimilarArcs(sWord[0:1], iAddr)
-        if lArc:
-            for t in lArc:
-                lSugg.extend(self._lookupAndSuggest(sWord[1:], t[1], sNewWord+t[0]))
-        else:
-            pass
-        return lSugg
+        if "’" in sWord:
+            sWord = sWord.replace("’", "'")
+        lWord = []
+        for sForm in [sWord] + self._getCaseVariants(sWord):
+            for sFound in self._lookupFolded(sForm):
+                if sFound not in lWord:
+                    lWord.append(sFound)
+                    if len(lWord) >= nMaxWord:
+                        return lWord
+        return lWord
 
-    def _getSimilarArcs (self, cChar, iAddr):
-        lArc = []
-        for c in st.dSimilarChars.get(cChar, cChar):
-            jAddr = self._lookupArcNode(self.dChar[c], iAddr)
-            if jAddr:
-                lArc.append((c, iAddr))
-        return lArc
+    def _lookupFolded (self, sWord):
+        "generator: yields words of the dictionary equal to sWord when accents are ignored"
+        lSimilarVal = [ self._getSimilarCharValues(c)  for c in sWord ]
+        if not all(lSimilarVal):
+            return
+        nLen = len(sWord)
+        lStack = [ (0, 0, "") ]
+        while lStack:
+            iAddr, i, sPrefix = lStack.pop()
+            if i == nLen:
+                if self._isFinalNode(iAddr):
+                    yield sPrefix
+                continue
+            for nVal in reversed(lSimilarVal[i]):
+                iNextAddr = self._lookupArcNode(nVal, iAddr)
+                if iNextAddr is not None:
+                    lStack.append((iNextAddr, i+1, sPrefix + self.lArcVal[nVal]))
+
+    def _getSimilarCharValues (self, c):
+        "returns the list of arc values of c and of chars similar to c (c first)"
+        if c not in self._dSimilarCharValues:
+            sSimilar = st.dSimilarChars.get(c, "")
+            if not sSimilar and c != c.lower() and c.lower() in st.dSimilarChars:
+                # capitals
+                sSimilar = st.dSimilarChars[c.lower()].upper()
+            self._dSimilarCharValues[c] = [ self.dChar[c2]  for c2 in c + sSimilar.replace(c, "")  if c2 in self.dChar ]
+        return self._dSimilarCharValues[c]
+
+    # SUGGESTIONS
+    # Search in the graph of words within an edit distance of the input (Levenshtein automaton, with transpositions):
+    # each node reached with a prefix gets a row of distances between this prefix and the prefixes of the input.
+    # Branches are abandoned as soon as all distances of the row exceed the maximum distance.
+    # Substitutions between similar chars (accents: see str_transform.dSimilarChars) cost half an edit.
+
+    def getSugg (self, sWord, nMaxDist=2, nMaxSugg=10, fMaxTime=0.05):
+        """returns a list of at most <nMaxSugg> words of the dictionary within <nMaxDist> edits of sWord, nearest first
+        the search stops after <fMaxTime> seconds: the nearest words found so far are returned"""
+        if not sWord:
+            return []
+        if "’" in sWord:
+            sWord = sWord.replace("’", "'")
+        fEndTime = time.perf_counter() + fMaxTime
+        lForm = [ (sWord, None) ]
+        if sWord[0:1].isupper():
+            # search with lowercase too, then restore casing
+            if sWord.isupper() and len(sWord) > 1:
+                lForm.append((sWord.lower(), str.upper))
+            else:
+                lForm.append((sWord[:1].lower() + sWord[1:], lambda s: s[:1].upper() + s[1:]))
+        dSugg = {}
+        fLastDist = 0
+        # words are found nearest first: the search stops after the words as near as the last suggestion kept
+        for funcCase, (sSugg, fDist) in heapq.merge(*[ zip(itertools.repeat(funcCase), self._suggest(sForm, nMaxDist, fEndTime))  for sForm, funcCase in lForm ],
+                                                    key=lambda t: t[1][1]):
+            if len(dSugg) >= nMaxSugg and fDist > fLastDist:
+                break
+            if funcCase:
+                sSugg = funcCase(sSugg)
+            if sSugg != sWord and sSugg not in dSugg:
+                dSugg[sSugg] = fDist
+                fLastDist = fDist
+        return [ sSugg  for sSugg, fDist in sorted(dSugg.items(), key=lambda t: (t[1], t[0]))[:nMaxSugg] ]
+
+    def _suggest (self, sWord, nMaxDist, fEndTime):
+        """generator: yields (sSugg, fDist) for each word sSugg of the dictionary within nMaxDist edits of sWord, nearest first
+        (best-first search: the node with the lowest distance of its row is explored first)"""
+        nLen = len(sWord)
+        nBand = int(nMaxDist)
+        nTooFar = nBand + 1
+        dSubCost = {}   # key: char; value: list of substitution costs for each char of sWord
+        # heap items: (minimal distance, item number, address of node, prefix, distances row, previous row, last char)
+        # address None: prefix is a word of the dictionary, at the distance of the item
+        lHeap = [ (0, 0, 0, "", [ j  if j <= nBand  else nTooFar  for j in range(nLen+1) ], None, "") ]
+        nItem = 1
+        nNode = 0
+        while lHeap:
+            fMinDist, _, iAddr, sPrefix, lRow, lPrevRow, cPrev = heapq.heappop(lHeap)
+            if iAddr is None:
+                yield (sPrefix, fMinDist)
+                continue
+            i = len(sPrefix) + 1
+            nNode += 1
+            if not (nNode & 0xFF) and time.perf_counter() > fEndTime:
+                return
+            for nVal, iNextAddr in self._getArcs(iAddr):
+                if nVal >= self.nChar:
+                    continue
+                c = self.lArcVal[nVal]
+                if c not in dSubCost:
+                    dSubCost[c] = [ 0  if c == cw  else (0.5  if c in st.dSimilarChars.get(cw, "")  else 1)  for cw in sWord ]
+                lSubCost = dSubCost[c]
+                # only distances between prefixes whose lengths differ by at most nMaxDist are computed (others are too far)
+                lNewRow = [nTooFar] * (nLen+1)
+                if i <= nBand:
+                    lNewRow[0] = i
+                fMin = nTooFar
+                for j in range(max(1, i-nBand), min(nLen, i+nBand)+1):
+                    fDist = min(lRow[j] + 1, lNewRow[j-1] + 1, lRow[j-1] + lSubCost[j-1])
+                    if j > 1 and lPrevRow and c == sWord[j-2] and cPrev == sWord[j-1] and lPrevRow[j-2] + 1 < fDist:
+                        # transposition
+                        fDist = lPrevRow[j-2] + 1
+                    lNewRow[j] = fDist
+                    if fDist < fMin:
+                        fMin = fDist
+                if fMin <= nMaxDist:
+                    # the distances of a row never decrease in the rows of longer prefixes: fMin is a lower bound
+                    sNewPrefix = sPrefix + c
+                    if lNewRow[nLen] <= nMaxDist and self._isFinalNode(iNextAddr):
+                        heapq.heappush(lHeap, (lNewRow[nLen], nItem, None, sNewPrefix, None, None, ""))
+                        nItem += 1
+                    heapq.heappush(lHeap, (fMin, nItem, iNextAddr, sNewPrefix, lNewRow, lRow, c))
+                    nItem += 1
+
+    # ENUMERATION
+
+    def iterEntries (self, sPrefix=""):
+        "generator: yields all entries of the dictionary as tuples (flexion, stem, tags), only flexions beginning with sPrefix"
+        iAddr = 0
+        for c in sPrefix:
+            if c not in self.dChar:
+                return
+            iAddr = self._lookupArcNode(self.dChar[c], iAddr)
+            if iAddr == None:
+                return
+        lStack = [ (iAddr, sPrefix) ]
+        while lStack:
+            iAddr, sFlex = lStack.pop()
+            lNext = []
+            for nVal, iNextAddr in self._getArcs(iAddr):
+                if nVal < self.nChar:
+                    lNext.append((iNextAddr, sFlex + self.lArcVal[nVal]))
+                else:
+                    # stemming code, then tags in the next node
+                    sStem = self.funcStemming(sFlex, self.lArcVal[nVal])
+                    for nTag, _ in self._getArcs(iNextAddr):
+                        yield (sFlex, sStem, self.lArcVal[nTag])
+            lNext.reverse()
+            lStack.extend(lNext)
+
+    # COMPLETION
+
+    def complete (self, sPrefix, nLimit=20, bMorph=False, sTagPattern=None, nMaxNode=20000):
+        """generator: yields at most <nLimit> words of the dictionary beginning with sPrefix (shortest first)
+        if bMorph is True, yields tuples (word, list of morphologies)
+        if sTagPattern is a regex, only words with a morphology matching sTagPattern are yielded (and only these morphologies)
+        the walk stops after <nMaxNode> nodes visited"""
+        iAddr = 0
+        for c in sPrefix:
+            if c not in self.dChar:
+                return
+            iAddr = self._lookupArcNode(self.dChar[c], iAddr)
+            if iAddr == None:
+                return
+        zTag = re.compile(sTagPattern)  if sTagPattern  else None
+        nFound = 0
+        nNode = 0
+        # iterative deepening: each pass is a depth-first walk which yields words of <nLen> chars,
+        # so that memory is bounded by the length of words (not by the number of words of a length)
+        nLen = len(sPrefix)
+        bLonger = True
+        while bLonger:
+            bLonger = False
+            lStack = [ (iAddr, sPrefix) ]
+            while lStack:
+                iNodeAddr, sWord = lStack.pop()
+                nNode += 1
+                if nNode > nMaxNode:
+                    return
+                lNext = [ (iNextAddr, sWord + self.lArcVal[nVal])  for nVal, iNextAddr in self._getArcs(iNodeAddr)  if nVal < self.nChar ]
+                if len(sWord) < nLen:
+                    lStack.extend(reversed(lNext))
+                    continue
+                if lNext:
+                    bLonger = True
+                if self._isFinalNode(iNodeAddr):
+                    if bMorph or zTag:
+                        lMorph = self._morphAt(sWord, iNodeAddr)
+                        if zTag:
+                            lMorph = [ sMorph  for sMorph in lMorph  if zTag.search(sMorph) ]
+                        if not lMorph:
+                            continue
+                        yield (sWord, lMorph)  if bMorph  else sWord
+                    else:
+                        yield sWord
+                    nFound += 1
+                    if nFound >= nLimit:
+                        return
+            nLen += 1
 
     def getMorph (self, sWord):
         "retrieves morphologies list, different casing allowed"
-        l = self.morph(sWord)
+        if self.oBloomFilter and sWord.lower() not in self.oBloomFilter:
+            return []
+        # the word graph is walked here, not with self.morph (replaced by _morphO while there are overlays)
+        lForm = self._getMorphCaseForms(sWord)  if sWord[0:1].isupper()  else [sWord]
+        l = []
+        for sForm, iAddr in zip(lForm, self._walkCaseVariants(lForm)):
+            if iAddr is not None:
+                l.extend(self._morphAt(sForm, iAddr))
+        return l
+
+    def _getMorphCaseForms (self, sWord):
+        "returns sWord and its casing variants for getMorph (the first letter must be a capital)"
+        if sWord.isupper() and len(sWord) > 1:
+            return [sWord, sWord.lower(), sWord.capitalize()]
+        return [sWord, sWord.lower()]
+
+    def getMorphTuples (self, sWord):
+        """retrieves morphologies as a tuple of tuples (lemma, tag id), different casing allowed
+        tag ids are indexes in self.lArcVal (see getTag)"""
+        if self.oBloomFilter and sWord.lower() not in self.oBloomFilter:
+            return ()
         if sWord[0:1].isupper():
-            l.extend(self.morph(sWord.lower()))
-            if sWord.isupper() and len(sWord) > 1:
-                l.extend(self.morph(sWord.capitalize()))
+            lForm = self._getMorphCaseForms(sWord)
+            l = []
+            for sForm, iAddr in zip(lForm, self._walkCaseVariants(lForm)):
+                if iAddr is not None:
+                    l.extend(self._morphTuplesAt(sForm, iAddr))
+        else:
+            l = self._morphTuples(sWord)
+        return tuple(l)
+
+    def _morphTuples (self, sWord):
+        "returns list of tuples (lemma, tag id) of sWord"
+        iAddr = 0
+        for c in sWord:
+            if c not in self.dChar:
+                return []
+            iAddr = self._lookupArcNode(self.dChar[c], iAddr)
+            if iAddr == None:
+                return []
+        return self._morphTuplesAt(sWord, iAddr)
+
+    def _morphTuplesAt (self, sWord, iAddr):
+        "returns list of tuples (lemma, tag id) of sWord, iAddr being the address of the node reached with sWord"
+        if not self._isFinalNode(iAddr):
+            return []
+        l = []
+        for nVal, iNextAddr in self._getArcs(iAddr):
+            if nVal >= self.nChar:
+                # stemming code, then tags in the next node
+                sLemma = sys.intern(self.funcStemming(sWord, self.lArcVal[nVal]))
+                for nTag, _ in self._getArcs(iNextAddr):
+                    l.append((sLemma, nTag))
         return l
 
+    def getTag (self, nTag):
+        "returns tags (string) of tag id nTag"
+        return self.lArcVal[nTag]
+
+    def getMorphFromTuple (self, tMorph):
+        "returns morphology string (“>lemma tags”) of tuple (lemma, tag id)"
+        return ">" + tMorph[0] + " " + self.lArcVal[tMorph[1]]
+
+    # FORMS OF LEMMAS
+    # Optional index {lemma: tuple of (flexion, tag id)}, built from the expanded word graph (several seconds),
+    # or loaded from the snapshot “<name>.lemmas” (see _loadSnapshot).
+
+    def setLemmaIndex (self, bEnable=True):
+        "enables (or disables) the index of forms of lemmas used by getForms"
+        self._dLemma = self._loadSnapshot(".lemmas", self._buildLemmaIndex)  if bEnable  else None
+
+    def getForms (self, sLemma):
+        "returns all forms of sLemma as a tuple of tuples (flexion, tag id) (see getTag), overlays included; empty tuple: no index of lemmas"
+        if self._dLemma is None:
+            return ()
+        tForm = self._dLemma.get(sLemma, ())
+        for _, _, dLemma in self._lOverlay:
+            if sLemma in dLemma:
+                tForm += dLemma[sLemma]
+        return tForm
+
+    def _buildLemmaIndex (self):
+        "returns a dictionary {lemma: tuple of tuples (flexion, tag id)}"
+        dLemma = {}
+        for sFlex, tMorph in (self._dWord  if self._dWord is not None  else self._expandWords()).items():
+            for sLemma, nTag in tMorph:
+                dLemma.setdefault(sLemma, []).append((sFlex, nTag))
+        return { sLemma: tuple(lForm)  for sLemma, lForm in dLemma.items() }
+
     # def morph (self, sWord):
     #     is defined in __init__
 
@@ -208,6 +1192,10 @@ class IBDAWG:
             iAddr = self._lookupArcNode(self.dChar[c], iAddr)
             if iAddr == None:
                 return []
+        return self._morphAt1(sWord, iAddr)
+
+    def _morphAt1 (self, sWord, iAddr):
+        "returns morphologies of sWord, iAddr being the address of the node reached with sWord"
         if (int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesArc], byteorder='big') & self._finalNodeMask):
             l = []
             nRawArc = 0
@@ -239,6 +1227,10 @@ class IBDAWG:
             iAddr = self._lookupArcNode(self.dChar[c], iAddr)
             if iAddr == None:
                 return []
+        return self._stemAt1(sWord, iAddr)
+
+    def _stemAt1 (self, sWord, iAddr):
+        "returns stems list of sWord, iAddr being the address of the node reached with sWord"
         if (int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesArc], byteorder='big') & self._finalNodeMask):
             l = []
             nRawArc = 0
@@ -268,6 +1260,17 @@ class IBDAWG:
                     return None
                 iAddr = iEndArcAddr+self.nBytesNodeAddress
 
+    def _getArcs1 (self, iAddr):
+        "generator: returns all arcs at iAddr as tuples (nVal, iNextAddr)"
+        while True:
+            iEndArcAddr = iAddr+self.nBytesArc
+            nRawArc = int.from_bytes(self.byDic[iAddr:iEndArcAddr], byteorder='big')
+            if nRawArc & self._arcMask:
+                yield (nRawArc & self._arcMask, int.from_bytes(self.byDic[iEndArcAddr:iEndArcAddr+self.nBytesNodeAddress], byteorder='big'))
+            if (nRawArc & self._lastArcMask):
+                break
+            iAddr = iEndArcAddr+self.nBytesNodeAddress
+
     def _writeNodes1 (self, spfDest):
         "for debugging only"
         print(" > Write binary nodes")
@@ -296,6 +1299,10 @@ class IBDAWG:
             iAddr = self._lookupArcNode(self.dChar[c], iAddr)
             if iAddr == None:
                 return []
+        return self._morphAt2(sWord, iAddr)
+
+    def _morphAt2 (self, sWord, iAddr):
+        "returns morphologies of sWord, iAddr being the address of the node reached with sWord"
         if (int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesArc], byteorder='big') & self._finalNodeMask):
             l = []
             nRawArc = 0
@@ -312,9 +1319,10 @@ class IBDAWG:
                     else:
                         # we go to the end of the node
                         iAddr2 = iEndArcAddr
-                        while not (nRawArc & self._lastArcMask):
-                            nRawArc = int.from_bytes(self.byDic[iAddr2:iAddr2+self.nBytesArc], byteorder='big')
-                            iAddr2 += self.nBytesArc + self.nBytesNodeAddress
+                        nRawArc3 = nRawArc
+                        while not (nRawArc3 & self._lastArcMask):
+                            nRawArc3 = int.from_bytes(self.byDic[iAddr2:iAddr2+self.nBytesArc], byteorder='big')
+                            iAddr2 += self.nBytesArc + self.nBytesNodeAddress  if not (nRawArc3 & self._addrBitMask)  else self.nBytesArc
                     nRawArc2 = 0
                     while not (nRawArc2 & self._lastArcMask):
                         iEndArcAddr2 = iAddr2 + self.nBytesArc
@@ -334,6 +1342,10 @@ class IBDAWG:
             iAddr = self._lookupArcNode(self.dChar[c], iAddr)
             if iAddr == None:
                 return []
+        return self._stemAt2(sWord, iAddr)
+
+    def _stemAt2 (self, sWord, iAddr):
+        "returns stems list of sWord, iAddr being the address of the node reached with sWord"
         if (int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesArc], byteorder='big') & self._finalNodeMask):
             l = []
             nRawArc = 0
@@ -350,9 +1362,10 @@ class IBDAWG:
                     else:
                         # we go to the end of the node
                         iAddr2 = iEndArcAddr
-                        while not (nRawArc & self._lastArcMask):
-                            nRawArc = int.from_bytes(self.byDic[iAddr2:iAddr2+self.nBytesArc], byteorder='big')
-                            iAddr2 += self.nBytesArc + self.nBytesNodeAddress
+                        nRawArc3 = nRawArc
+                        while not (nRawArc3 & self._lastArcMask):
+                            nRawArc3 = int.from_bytes(self.byDic[iAddr2:iAddr2+self.nBytesArc], byteorder='big')
+                            iAddr2 += self.nBytesArc + self.nBytesNodeAddress  if not (nRawArc3 & self._addrBitMask)  else self.nBytesArc
                 iAddr = iEndArcAddr+self.nBytesNodeAddress  if not (nRawArc & self._addrBitMask)  else iEndArcAddr
             return l
         return []
@@ -380,6 +1393,25 @@ class IBDAWG:
                     return None
                 iAddr = iEndArcAddr+self.nBytesNodeAddress  if not (nRawArc & self._addrBitMask)  else iEndArcAddr
 
+    def _getArcs2 (self, iAddr):
+        "generator: returns all arcs at iAddr as tuples (nVal, iNextAddr)"
+        lArc = []
+        while True:
+            iEndArcAddr = iAddr+self.nBytesArc
+            nRawArc = int.from_bytes(self.byDic[iAddr:iEndArcAddr], byteorder='big')
+            if not (nRawArc & self._addrBitMask):
+                lArc.append((nRawArc & self._arcMask, int.from_bytes(self.byDic[iEndArcAddr:iEndArcAddr+self.nBytesNodeAddress], byteorder='big')))
+                iAddr = iEndArcAddr+self.nBytesNodeAddress
+            else:
+                # next node is the following node: we’ll know its address at the end of this node
+                lArc.append((nRawArc & self._arcMask, None))
+                iAddr = iEndArcAddr
+            if (nRawArc & self._lastArcMask):
+                break
+        for nVal, iNextAddr in lArc:
+            if nVal:
+                yield (nVal, iNextAddr  if iNextAddr is not None  else iAddr)
+
     def _writeNodes2 (self, spfDest):
         "for debugging only"
         print(" > Write binary nodes")
@@ -411,6 +1443,10 @@ class IBDAWG:
             iAddr = self._lookupArcNode(self.dChar[c], iAddr)
             if iAddr == None:
                 return []
+        return self._morphAt3(sWord, iAddr)
+
+    def _morphAt3 (self, sWord, iAddr):
+        "returns morphologies of sWord, iAddr being the address of the node reached with sWord"
         if (int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesArc], byteorder='big') & self._finalNodeMask):
             l = []
             nRawArc = 0
@@ -446,6 +1482,10 @@ class IBDAWG:
             iAddr = self._lookupArcNode(self.dChar[c], iAddr)
             if iAddr == None:
                 return []
+        return self._stemAt3(sWord, iAddr)
+
+    def _stemAt3 (self, sWord, iAddr):
+        "returns stems list of sWord, iAddr being the address of the node reached with sWord"
         if (int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesArc], byteorder='big') & self._finalNodeMask):
             l = []
             nRawArc = 0
@@ -479,6 +1519,23 @@ class IBDAWG:
                     return None
                 iAddr = iEndArcAddr+self.nBytesNodeAddress  if not (nRawArc & self._addrBitMask)  else iEndArcAddr+self.nBytesOffset
 
+    def _getArcs3 (self, iAddr):
+        "generator: returns all arcs at iAddr as tuples (nVal, iNextAddr)"
+        iAddrNode = iAddr
+        while True:
+            iEndArcAddr = iAddr+self.nBytesArc
+            nRawArc = int.from_bytes(self.byDic[iAddr:iEndArcAddr], byteorder='big')
+            if not (nRawArc & self._addrBitMask):
+                iNextAddr = int.from_bytes(self.byDic[iEndArcAddr:iEndArcAddr+self.nBytesNodeAddress], byteorder='big')
+                iAddr = iEndArcAddr+self.nBytesNodeAddress
+            else:
+                iNextAddr = iAddrNode + int.from_bytes(self.byDic[iEndArcAddr:iEndArcAddr+self.nBytesOffset], byteorder='big')
+                iAddr = iEndArcAddr+self.nBytesOffset
+            if nRawArc & self._arcMask:
+                yield (nRawArc & self._arcMask, iNextAddr)
+            if (nRawArc & self._lastArcMask):
+                break
+
     def _writeNodes3 (self, spfDest):
         "for debugging only"
         print(" > Write binary nodes")
@@ -500,3 +1557,499 @@ class IBDAWG:
                 if (nRawArc & self._lastArcMask):
                     hDst.write("\ni{:_>10} -- #{:_>10}\n".format("?", iAddr))
             hDst.close()
+
+    # VERSION 5
+    def _lookup5 (self, sWord):
+        "returns True if sWord in dictionary (strict verification)"
+        iAddr = 0
+        for c in sWord:
+            if c not in self.dChar:
+                return False
+            iAddr = self._lookupArcNode(self.dChar[c], iAddr)
+            if iAddr == None:
+                return False
+        return int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesNodeHeader], byteorder='big') & self._finalNodeMask
+
+    def _isFinalNode5 (self, iAddr):
+        "returns True if node at iAddr is final"
+        return int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesNodeHeader], byteorder='big') & self._finalNodeMask
+
+    def _morph5 (self, sWord):
+        "returns morphologies of sWord"
+        iAddr = 0
+        for c in sWord:
+            if c not in self.dChar:
+                return []
+            iAddr = self._lookupArcNode(self.dChar[c], iAddr)
+            if iAddr == None:
+                return []
+        return self._morphAt5(sWord, iAddr)
+
+    def _morphAt5 (self, sWord, iAddr):
+        "returns morphologies of sWord, iAddr being the address of the node reached with sWord"
+        nHeader = int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesNodeHeader], byteorder='big')
+        if nHeader & self._finalNodeMask:
+            l = []
+            for iArcAddr in range(self._findFirstNonCharArc5(iAddr, nHeader), iAddr + self.nBytesNodeHeader + (nHeader & self._arcCountMask) * self._nBytesArcAddr, self._nBytesArcAddr):
+                nArc = int.from_bytes(self.byDic[iArcAddr:iArcAddr+self.nBytesArc], byteorder='big')
+                # This value is not a char, this is a stemming code
+                sStem = ">" + self.funcStemming(sWord, self.lArcVal[nArc])
+                # Now , we go to the next node and retrieve all following arcs values, all of them are tags
+                iAddr2 = int.from_bytes(self.byDic[iArcAddr+self.nBytesArc:iArcAddr+self._nBytesArcAddr], byteorder='big')
+                nArc2 = int.from_bytes(self.byDic[iAddr2:iAddr2+self.nBytesNodeHeader], byteorder='big') & self._arcCountMask
+                iAddr2 += self.nBytesNodeHeader
+                for iArcAddr2 in range(iAddr2, iAddr2 + nArc2 * self._nBytesArcAddr, self._nBytesArcAddr):
+                    l.append(sStem + " " + self.lArcVal[int.from_bytes(self.byDic[iArcAddr2:iArcAddr2+self.nBytesArc], byteorder='big')])
+            return l
+        return []
+
+    def _stem5 (self, sWord):
+        "returns stems list of sWord"
+        iAddr = 0
+        for c in sWord:
+            if c not in self.dChar:
+                return []
+            iAddr = self._lookupArcNode(self.dChar[c], iAddr)
+            if iAddr == None:
+                return []
+        return self._stemAt5(sWord, iAddr)
+
+    def _stemAt5 (self, sWord, iAddr):
+        "returns stems list of sWord, iAddr being the address of the node reached with sWord"
+        nHeader = int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesNodeHeader], byteorder='big')
+        if nHeader & self._finalNodeMask:
+            l = []
+            for iArcAddr in range(self._findFirstNonCharArc5(iAddr, nHeader), iAddr + self.nBytesNodeHeader + (nHeader & self._arcCountMask) * self._nBytesArcAddr, self._nBytesArcAddr):
+                nArc = int.from_bytes(self.byDic[iArcAddr:iArcAddr+self.nBytesArc], byteorder='big')
+                # This value is not a char, this is a stemming code
+                l.append(self.funcStemming(sWord, self.lArcVal[nArc]))
+            return l
+        return []
+
+    def _findFirstNonCharArc5 (self, iAddr, nHeader):
+        "returns the address of the first arc which is not a char at the node at iAddr (arcs are sorted: chars first, then stemming codes or tags)"
+        iFirstAddr = iAddr + self.nBytesNodeHeader
+        iArcAddr = iFirstAddr + (nHeader & self._arcCountMask) * self._nBytesArcAddr
+        while iArcAddr > iFirstAddr and int.from_bytes(self.byDic[iArcAddr-self._nBytesArcAddr:iArcAddr-self.nBytesNodeAddress], byteorder='big') >= self.nChar:
+            iArcAddr -= self._nBytesArcAddr
+        return iArcAddr
+
+    def _lookupArcNode5 (self, nVal, iAddr):
+        "looks if nVal is an arc at the node at iAddr, if yes, returns address of next node else None (dichotomy)"
+        iLow = 0
+        iHigh = int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesNodeHeader], byteorder='big') & self._arcCountMask
+        iAddr += self.nBytesNodeHeader
+        while iLow < iHigh:
+            iMid = (iLow + iHigh) >> 1
+            iArcAddr = iAddr + iMid * self._nBytesArcAddr
+            nArc = int.from_bytes(self.byDic[iArcAddr:iArcAddr+self.nBytesArc], byteorder='big')
+            if nArc < nVal:
+                iLow = iMid + 1
+            elif nArc > nVal:
+                iHigh = iMid
+            else:
+                return int.from_bytes(self.byDic[iArcAddr+self.nBytesArc:iArcAddr+self._nBytesArcAddr], byteorder='big')
+        return None
+
+    def _getArcs5 (self, iAddr):
+        "generator: returns all arcs at iAddr as tuples (nVal, iNextAddr)"
+        nArc = int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesNodeHeader], byteorder='big') & self._arcCountMask
+        iAddr += self.nBytesNodeHeader
+        for iArcAddr in range(iAddr, iAddr + nArc * self._nBytesArcAddr, self._nBytesArcAddr):
+            iEndArcAddr = iArcAddr + self.nBytesArc
+            yield (int.from_bytes(self.byDic[iArcAddr:iEndArcAddr], byteorder='big'), int.from_bytes(self.byDic[iEndArcAddr:iArcAddr+self._nBytesArcAddr], byteorder='big'))
+
+    def _writeNodes5 (self, spfDest):
+        "for debugging only"
+        print(" > Write binary nodes")
+        with open(spfDest, 'w', encoding='utf-8') as hDst:
+            iAddr = 0
+            while iAddr < len(self.byDic):
+                nHeader = int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesNodeHeader], byteorder='big')
+                hDst.write("i{:_>10} -- #{:_>10}  ({} arcs{})\n".format("?", iAddr, nHeader & self._arcCountMask, ", final"  if nHeader & self._finalNodeMask  else ""))
+                for nArc, iNextNodeAddr in self._getArcs5(iAddr):
+                    hDst.write("  {:<20}  {:>6}  i{:>10}   #{:_>10}\n".format(self.lArcVal[nArc], nArc, "?", iNextNodeAddr))
+                iAddr += self.nBytesNodeHeader + (nHeader & self._arcCountMask) * self._nBytesArcAddr
+            hDst.close()
+
+    # VERSION 6
+    # Like version 3, but 2 bits of each arc tell how to reach the next node:
+    # 0: address, 1 or 2: offset on 1 or 2 bytes, 3: negative offset on 2 bytes (offsets are counted from the beginning of the node)
+
+    def _morph6 (self, sWord):
+        "returns morphologies of sWord"
+        iAddr = 0
+        for c in sWord:
+            if c not in self.dChar:
+                return []
+            iAddr = self._lookupArcNode(self.dChar[c], iAddr)
+            if iAddr == None:
+                return []
+        return self._morphAt6(sWord, iAddr)
+
+    def _morphAt6 (self, sWord, iAddr):
+        "returns morphologies of sWord, iAddr being the address of the node reached with sWord"
+        if (int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesArc], byteorder='big') & self._finalNodeMask):
+            l = []
+            nRawArc = 0
+            iAddrNode = iAddr
+            while not (nRawArc & self._lastArcMask):
+                iEndArcAddr = iAddr + self.nBytesArc
+                nRawArc = int.from_bytes(self.byDic[iAddr:iEndArcAddr], byteorder='big')
+                nArc = nRawArc & self._arcMask
+                nCode = (nRawArc >> self._offsetCodeShift) & 3
+                if nArc >= self.nChar:
+                    # This value is not a char, this is a stemming code 
+                    sStem = ">" + self.funcStemming(sWord, self.lArcVal[nArc])
+                    # Now , we go to the next node and retrieve all following arcs values, all of them are tags
+                    iAddr2 = self._getNextNodeAddr6(nCode, iAddrNode, iEndArcAddr)
+                    nRawArc2 = 0
+                    while not (nRawArc2 & self._lastArcMask):
+                        iEndArcAddr2 = iAddr2 + self.nBytesArc
+                        nRawArc2 = int.from_bytes(self.byDic[iAddr2:iEndArcAddr2], byteorder='big')
+                        l.append(sStem + " " + self.lArcVal[nRawArc2 & self._arcMask])
+                        iAddr2 = iEndArcAddr2 + self._lLinkSize[(nRawArc2 >> self._offsetCodeShift) & 3]
+                iAddr = iEndArcAddr + self._lLinkSize[nCode]
+            return l
+        return []
+
+    def _stem6 (self, sWord):
+        "returns stems list of sWord"
+        iAddr = 0
+        for c in sWord:
+            if c not in self.dChar:
+                return []
+            iAddr = self._lookupArcNode(self.dChar[c], iAddr)
+            if iAddr == None:
+                return []
+        return self._stemAt6(sWord, iAddr)
+
+    def _stemAt6 (self, sWord, iAddr):
+        "returns stems list of sWord, iAddr being the address of the node reached with sWord"
+        if (int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesArc], byteorder='big') & self._finalNodeMask):
+            l = []
+            nRawArc = 0
+            while not (nRawArc & self._lastArcMask):
+                iEndArcAddr = iAddr + self.nBytesArc
+                nRawArc = int.from_bytes(self.byDic[iAddr:iEndArcAddr], byteorder='big')
+                nArc = nRawArc & self._arcMask
+                if nArc >= self.nChar:
+                    # This value is not a char, this is a stemming code 
+                    l.append(self.funcStemming(sWord, self.lArcVal[nArc]))
+                iAddr = iEndArcAddr + self._lLinkSize[(nRawArc >> self._offsetCodeShift) & 3]
+            return l
+        return []
+
+    def _lookupArcNode6 (self, nVal, iAddr):
+        "looks if nVal is an arc at the node at iAddr, if yes, returns address of next node else None"
+        iAddrNode = iAddr
+        while True:
+            iEndArcAddr = iAddr+self.nBytesArc
+            nRawArc = int.from_bytes(self.byDic[iAddr:iEndArcAddr], byteorder='big')
+            nCode = (nRawArc >> self._offsetCodeShift) & 3
+            if nVal == (nRawArc & self._arcMask):
+                # the value we are looking for 
+                if not nCode:
+                    return int.from_bytes(self.byDic[iEndArcAddr:iEndArcAddr+self.nBytesNodeAddress], byteorder='big')
+                return self._getNextNodeAddr6(nCode, iAddrNode, iEndArcAddr)
+            # value not found
+            if (nRawArc & self._lastArcMask):
+                return None
+            iAddr = iEndArcAddr + self._lLinkSize[nCode]
+
+    def _getArcs6 (self, iAddr):
+        "generator: returns all arcs at iAddr as tuples (nVal, iNextAddr)"
+        iAddrNode = iAddr
+        while True:
+            iEndArcAddr = iAddr+self.nBytesArc
+            nRawArc = int.from_bytes(self.byDic[iAddr:iEndArcAddr], byteorder='big')
+            nCode = (nRawArc >> self._offsetCodeShift) & 3
+            iNextAddr = self._getNextNodeAddr6(nCode, iAddrNode, iEndArcAddr)
+            iAddr = iEndArcAddr + self._lLinkSize[nCode]
+            if nRawArc & self._arcMask:
+                yield (nRawArc & self._arcMask, iNextAddr)
+            if (nRawArc & self._lastArcMask):
+                break
+
+    def _getNextNodeAddr6 (self, nCode, iAddrNode, iLinkAddr):
+        "returns the address of the next node, from the link at iLinkAddr of an arc of the node at iAddrNode"
+        if nCode == 0:
+            return int.from_bytes(self.byDic[iLinkAddr:iLinkAddr+self.nBytesNodeAddress], byteorder='big')
+        if nCode == 3:
+            return iAddrNode - int.from_bytes(self.byDic[iLinkAddr:iLinkAddr+2], byteorder='big')
+        return iAddrNode + int.from_bytes(self.byDic[iLinkAddr:iLinkAddr+nCode], byteorder='big')
+
+    def _writeNodes6 (self, spfDest):
+        "for debugging only"
+        print(" > Write binary nodes")
+        with open(spfDest, 'w', encoding='utf-8') as hDst:
+            iAddr = 0
+            hDst.write("i{:_>10} -- #{:_>10}\n".format("0", iAddr))
+            while iAddr < len(self.byDic):
+                iEndArcAddr = iAddr+self.nBytesArc
+                nRawArc = int.from_bytes(self.byDic[iAddr:iEndArcAddr], byteorder='big')
+                nArc = nRawArc & self._arcMask
+                nCode = (nRawArc >> self._offsetCodeShift) & 3
+                iNextNodeAddr = int.from_bytes(self.byDic[iEndArcAddr:iEndArcAddr+self._lLinkSize[nCode]], byteorder='big')
+                hDst.write("  {:<20}  {:0>16}  i{:>10}   {}{:_>10}\n".format(self.lArcVal[nArc], bin(nRawArc)[2:], "?", "#++-"[nCode], iNextNodeAddr))
+                iAddr = iEndArcAddr + self._lLinkSize[nCode]
+                if (nRawArc & self._lastArcMask):
+                    hDst.write("\ni{:_>10} -- #{:_>10}\n".format("?", iAddr))
+            hDst.close()
+
+    # DECODED ARCS (any version)
+    def _decodeArcs (self):
+        """decodes self.byDic into arrays, once:
+            - self._lNodeArc:   index of the first arc of each node (with a sentinel at the end: arcs of node i are in [lNodeArc[i], lNodeArc[i+1]))
+            - self._lNodeFinal: 1 if node is final, else 0
+            - self._lArcVal:    value of each arc
+            - self._lArcNext:   index of the node targeted by each arc
+            - self._sArcVal:    values of arcs as a string (each value as a code point), so that we can search arcs with str.find
+            - self._lNodeWordCount: number of words reachable from each node (version 4)
+        With decoded arcs, addresses are node indexes (the root is the node 0)."""
+        lNodeArc = array("L")
+        lNodeFinal = bytearray()
+        lArcVal = array("L")
+        lArcNext = []
+        dNodeIndex = {}         # key: address in byDic; value: node index
+        lFollowingNode = []     # arcs to the following node (version 2)
+        lNodeWordCount = array("L")
+        iAddr = 0
+        iAddrNode = 0
+        nRawArc = self._lastArcMask
+        while iAddr < len(self.byDic) and self.nVersion == 5:
+            # nodes with a header and fixed size arcs
+            dNodeIndex[iAddr] = len(lNodeArc)
+            lNodeArc.append(len(lArcVal))
+            lNodeFinal.append(1  if self._isFinalNode5(iAddr)  else 0)
+            for nArc, iNextAddr in self._getArcs5(iAddr):
+                lArcVal.append(nArc)
+                lArcNext.append(iNextAddr)
+            iAddr += self.nBytesNodeHeader + (len(lArcVal) - lNodeArc[-1]) * self._nBytesArcAddr
+        while iAddr < len(self.byDic) and self.nVersion != 5:
+            if nRawArc & self._lastArcMask:
+                # new node
+                if self.nVersion == 4:
+                    if iAddr == 0:
+                        lNodeWordCount.append(self.nWords)
+                    else:
+                        lNodeWordCount.append(int.from_bytes(self.byDic[iAddr:iAddr+self.nBytesWordCount], byteorder='big'))
+                        iAddr += self.nBytesWordCount
+                iEndArcAddr = iAddr + self.nBytesArc
+                iAddrNode = iAddr
+                dNodeIndex[iAddr] = len(lNodeArc)
+                lNodeArc.append(len(lArcVal))
+                nRawArc = int.from_bytes(self.byDic[iAddr:iEndArcAddr], byteorder='big')
+                lNodeFinal.append(1  if nRawArc & self._finalNodeMask  else 0)
+            else:
+                iEndArcAddr = iAddr + self.nBytesArc
+                nRawArc = int.from_bytes(self.byDic[iAddr:iEndArcAddr], byteorder='big')
+            nArc = nRawArc & self._arcMask
+            if self.nVersion == 6:
+                nCode = (nRawArc >> self._offsetCodeShift) & 3
+                iNextAddr = self._getNextNodeAddr6(nCode, iAddrNode, iEndArcAddr)
+                iAddr = iEndArcAddr + self._lLinkSize[nCode]
+            elif self.nVersion == 1 or not (nRawArc & self._addrBitMask):
+                iNextAddr = int.from_bytes(self.byDic[iEndArcAddr:iEndArcAddr+self.nBytesNodeAddress], byteorder='big')
+                iAddr = iEndArcAddr + self.nBytesNodeAddress
+            elif self.nVersion == 2:
+                # next node is the following node, its address is known at the end of this node
+                iNextAddr = None
+                lFollowingNode.append(len(lArcNext))
+                iAddr = iEndArcAddr
+            else:
+                iNextAddr = iAddrNode + int.from_bytes(self.byDic[iEndArcAddr:iEndArcAddr+self.nBytesOffset], byteorder='big')
+                iAddr = iEndArcAddr + self.nBytesOffset
+            if nArc:
+                lArcVal.append(nArc)
+                lArcNext.append(iNextAddr)
+            # else: the value 0 is only used by nodes without arcs
+            if (nRawArc & self._lastArcMask) and lFollowingNode:
+                for iArc in lFollowingNode:
+                    lArcNext[iArc] = iAddr
+                lFollowingNode.clear()
+        lNodeArc.append(len(lArcVal))
+        self._lNodeArc = lNodeArc
+        self._lNodeFinal = lNodeFinal
+        self._lArcVal = lArcVal
+        self._lArcNext = array("L", [ dNodeIndex[iNextAddr]  for iNextAddr in lArcNext ])
+        self._sArcVal = "".join(map(chr, lArcVal))
+        self._lNodeWordCount = lNodeWordCount
+
+    def _lookupD (self, sWord):
+        "returns True if sWord in dictionary (strict verification)"
+        iNode = 0
+        for c in sWord:
+            if c not in self.dChar:
+                return False
+            iNode = self._lookupArcNode(self.dChar[c], iNode)
+            if iNode == None:
+                return False
+        return self._lNodeFinal[iNode]
+
+    def _morphD (self, sWord):
+        "returns morphologies of sWord"
+        iNode = 0
+        for c in sWord:
+            if c not in self.dChar:
+                return []
+            iNode = self._lookupArcNode(self.dChar[c], iNode)
+            if iNode == None:
+                return []
+        return self._morphAtD(sWord, iNode)
+
+    def _morphAtD (self, sWord, iNode):
+        "returns morphologies of sWord, iNode being the node reached with sWord"
+        if self._lNodeFinal[iNode]:
+            l = []
+            for iArc in range(self._lNodeArc[iNode], self._lNodeArc[iNode+1]):
+                nArc = self._lArcVal[iArc]
+                if nArc >= self.nChar:
+                    # This value is not a char, this is a stemming code
+                    sStem = ">" + self.funcStemming(sWord, self.lArcVal[nArc])
+                    # Now , we go to the next node and retrieve all following arcs values, all of them are tags
+                    iNode2 = self._lArcNext[iArc]
+                    for iArc2 in range(self._lNodeArc[iNode2], self._lNodeArc[iNode2+1]):
+                        l.append(sStem + " " + self.lArcVal[self._lArcVal[iArc2]])
+            return l
+        return []
+
+    def _stemD (self, sWord):
+        "returns stems list of sWord"
+        iNode = 0
+        for c in sWord:
+            if c not in self.dChar:
+                return []
+            iNode = self._lookupArcNode(self.dChar[c], iNode)
+            if iNode == None:
+                return []
+        return self._stemAtD(sWord, iNode)
+
+    def _stemAtD (self, sWord, iNode):
+        "returns stems list of sWord, iNode being the node reached with sWord"
+        if self._lNodeFinal[iNode]:
+            return [ self.funcStemming(sWord, self.lArcVal[nArc])  for nArc in self._lArcVal[self._lNodeArc[iNode]:self._lNodeArc[iNode+1]]  if nArc >= self.nChar ]
+        return []
+
+    def _isFinalNodeD (self, iNode):
+        "returns True if node iNode is final"
+        return self._lNodeFinal[iNode]
+
+    def _lookupArcNodeD (self, nVal, iNode):
+        "looks if nVal is an arc at the node iNode, if yes, returns index of next node else None"
+        iArc = self._sArcVal.find(chr(nVal), self._lNodeArc[iNode], self._lNodeArc[iNode+1])
+        if iArc < 0:
+            return None
+        return self._lArcNext[iArc]
+
+    def _getArcsD (self, iNode):
+        "returns all arcs of node iNode as tuples (nVal, iNextNode)"
+        return zip(self._lArcVal[self._lNodeArc[iNode]:self._lNodeArc[iNode+1]], self._lArcNext[self._lNodeArc[iNode]:self._lNodeArc[iNode+1]])
+
+    def _getWordCountD (self, iNode):
+        "returns the number of words reachable from node iNode (version 4)"
+        return self._lNodeWordCount[iNode]
+
+    def _lookupArcNodeDI (self, nVal, iNode):
+        "looks if nVal is an arc at the node iNode, if yes, returns index of next node else None (with transition index)"
+        lNextNode = self._dTransitionIndex.get(iNode)
+        if lNextNode is not None:
+            return lNextNode[nVal]
+        iArc = self._sArcVal.find(chr(nVal), self._lNodeArc[iNode], self._lNodeArc[iNode+1])
+        if iArc < 0:
+            return None
+        return self._lArcNext[iArc]
+
+    # SNAPSHOTS
+    # Data computed from the word graph, saved with marshal in “<name><extension>” (see _writeDataFile).
+    # Format: /py[extension]/1/[hash of the binary dictionary]:[marshal version] + 4 bytes of \0 + marshal data
+
+    def _loadSnapshot (self, sExtension, funcBuild):
+        "returns data of the snapshot <sExtension> if it was built from this dictionary, else returns funcBuild() and saves it as snapshot"
+        sTag = "{}:{}".format(self._getHash(), marshal.version)
+        sSnapshotFileName = self._getDataFileName(sExtension)
+        byHeader = "/py{}/1/".format(sExtension[1:]).encode("utf-8")
+        by = self._readDataFile(sSnapshotFileName)
+        if by and by.startswith(byHeader):
+            try:
+                iEnd = by.find(b"\0\0\0\0")
+                if str(by[len(byHeader):iEnd], "utf-8") == sTag:
+                    return marshal.loads(memoryview(by)[iEnd+4:])
+            except (ValueError, EOFError, TypeError):
+                pass
+        data = funcBuild()
+        self._writeDataFile(sSnapshotFileName, byHeader + sTag.encode("utf-8") + b"\0\0\0\0" + marshal.dumps(data))
+        return data
+
+    # MATERIALIZED DICTIONARY (any version)
+    # Snapshot: “<name>.mdic”
+
+    def _expandWords (self):
+        "returns a dictionary {flexion: tuple of tuples (lemma, tag id)}; identical tuples are shared"
+        dWord = {}
+        dTuple = {}
+        lStack = [ (0, "") ]
+        while lStack:
+            iAddr, sFlex = lStack.pop()
+            lMorph = []
+            for nVal, iNextAddr in self._getArcs(iAddr):
+                if nVal < self.nChar:
+                    lStack.append((iNextAddr, sFlex + self.lArcVal[nVal]))
+                else:
+                    # stemming code, then tags in the next node
+                    sLemma = sys.intern(self.funcStemming(sFlex, self.lArcVal[nVal]))
+                    for nTag, _ in self._getArcs(iNextAddr):
+                        tMorph = (sLemma, nTag)
+                        lMorph.append(dTuple.setdefault(tMorph, tMorph))
+            if self._isFinalNode(iAddr):
+                tMorph = tuple(lMorph)
+                dWord[sFlex] = dTuple.setdefault(tMorph, tMorph)
+        return dWord
+
+    def _lookupM (self, sWord):
+        "returns True if sWord in dictionary (strict verification)"
+        return sWord in self._dWord
+
+    def _morphM (self, sWord):
+        "returns morphologies of sWord"
+        return [ ">" + sLemma + " " + self.lArcVal[nTag]  for sLemma, nTag in self._dWord.get(sWord, ()) ]
+
+    def _stemM (self, sWord):
+        "returns stems list of sWord (as the word graph: one stem for each stemming code, i.e. for each run of tuples with the same lemma)"
+        l = []
+        for sLemma, _ in self._dWord.get(sWord, ()):
+            if not l or l[-1] != sLemma:
+                l.append(sLemma)
+        return l
+
+    def _getMorphTuplesM (self, sWord):
+        "retrieves morphologies as a tuple of tuples (lemma, tag id), different casing allowed (shared tuples: don’t modify them)"
+        if not sWord[0:1].isupper():
+            return self._dWord.get(sWord, ())
+        return tuple( tMorph  for sForm in self._getMorphCaseForms(sWord)  for tMorph in self._dWord.get(sForm, ()) )
+
+    def _isValidM (self, sWord):
+        "checks if sWord is valid (different casing tested if the first letter is a capital)"
+        if not sWord:
+            return None
+        if "’" in sWord: # ugly hack
+            sWord = sWord.replace("’", "'")
+        if sWord in self._dWord:
+            return True
+        if any( sVariant in self._dWord  for sVariant in self._getCaseVariants(sWord) ):
+            return True
+        return bool(self.bOptNumSigle and self._isSigle(sWord))
+
+    def _getMorphM (self, sWord):
+        "retrieves morphologies list, different casing allowed"
+        if not sWord[0:1].isupper():
+            return self._morphM(sWord)
+        return [ sMorph  for sForm in self._getMorphCaseForms(sWord)  for sMorph in self._morphM(sForm) ]
+
+    def _lookupBatchM (self, lWord):
+        "returns a dictionary {word: True or False} for all words in lWord (strict verification)"
+        return { sWord: sWord in self._dWord  for sWord in lWord }
+
+    def _getMorphBatchM (self, lWord):
+        "returns a list of results of getMorph for each word of lWord (same order)"
+        return [ self._getMorphM(sWord)  for sWord in lWord ]
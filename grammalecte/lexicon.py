@@ -0,0 +1,54 @@
+# Lexicon backends
+# License: MPL 2
+
+# The grammar checker, the lexicographe and scripts request spelling and morphologies through this small interface,
+# so that they work with any lexicon backend. IBDAWG implements it, whatever its mode (see createBackend).
+
+import os
+
+from .ibdawg import IBDAWG
+
+
+# Functions of the interface, required by checkBackend:
+# Morphologies are strings “>lemma tags”; tuples of getMorphTuples and getForms hold a tag (any value) to give to getTag.
+#   isValid(sWord)              -> True if sWord is valid (different casing tested if the first letter is a capital)
+#   isValidToken(sToken)        -> True if sToken is valid (if there are hyphens in sToken, each part is checked)
+#   getMorph(sWord)             -> list of morphologies, different casing allowed
+#   stem(sWord)                 -> list of stems of sWord
+#   getMorphTuples(sWord)       -> tuple of tuples (lemma, tag), different casing allowed, same order as getMorph
+#   getTag(xTag)                -> tags (string) of a tag of getMorphTuples or getForms
+#   getGeneration()             -> number changed each time the lexicon changes: results got before are outdated (caches must be emptied)
+#   getForms(sLemma)            -> tuple of tuples (flexion, tag) of all forms of sLemma; empty tuple: no index of lemmas
+#   isValidBatch(lWord), isValidTokenBatch(lToken), getMorphBatch(lWord)
+#                               -> list of results of isValid, isValidToken, getMorph for each item (same order)
+
+lBackendFunc = ["isValid", "isValidToken", "getMorph", "stem", "getMorphTuples", "getTag", "getGeneration", "getForms", "isValidBatch", "isValidTokenBatch", "getMorphBatch"]
+
+
+def checkBackend (oDict):
+    "returns oDict, raises TypeError if oDict lacks functions of the interface (see lBackendFunc)"
+    lMissing = [ sFuncName  for sFuncName in lBackendFunc  if not callable(getattr(oDict, sFuncName, None)) ]
+    if lMissing:
+        raise TypeError("# Error. Not a lexicon backend: {} (missing: {})".format(type(oDict).__name__, ", ".join(lMissing)))
+    return oDict
+
+
+# User directory where files built from dictionaries are saved to be reused (snapshots, Bloom filters, index of lemmas)
+spUserCache = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "grammalecte")
+
+# Backends of binary dictionaries: memory-lean to latency-optimised
+dBackend = {
+    "packed":       {},                                     # binary dictionary, read as bytes
+    "mmap":         { "bMmap": True },                      # binary dictionary, memory-mapped (shared by processes)
+    "decoded":      { "bDecoded": True },                   # arcs decoded into arrays
+    "indexed":      { "bDecoded": True, "nIndexMinArcs": 16 },  # decoded arcs and transition index
+    "materialized": { "bMaterialized": True, "spCache": spUserCache },  # all words in a hash map (snapshot saved in the user cache)
+    "numpy":        { "bNumpy": True },                     # binary dictionary, NumPy arrays for batch lookups
+}
+
+
+def createBackend (sBackend="packed", sDicName="french.bdic", **kwargs):
+    "returns the lexicon backend sBackend (see dBackend) of the binary dictionary sDicName; kwargs: other parameters of IBDAWG"
+    if sBackend not in dBackend:
+        raise ValueError("# Error. Unknown lexicon backend: {} (known: {})".format(sBackend, ", ".join(dBackend)))
+    return IBDAWG(sDicName, **dict(dBackend[sBackend], **kwargs))
@@ -0,0 +1,53 @@
+# Least recently used cache
+# License: MPL 2
+
+import collections
+
+
+class LRUCache:
+    "Cache with a maximum number of items: when full, the least recently used item is removed"
+
+    def __init__ (self, nMaxSize=10000):
+        if nMaxSize < 1:
+            raise ValueError("# Error. LRU cache size must be at least 1: {}".format(nMaxSize))
+        self.nMaxSize = nMaxSize
+        self.dItem = collections.OrderedDict()
+        self.nHit = 0
+        self.nMiss = 0
+        self.nEviction = 0
+
+    def __len__ (self):
+        return len(self.dItem)
+
+    def __contains__ (self, key):
+        return key in self.dItem
+
+    def __getitem__ (self, key):
+        "returns value of key (raises KeyError if not found), key becomes the most recently used"
+        try:
+            value = self.dItem[key]
+        except KeyError:
+            self.nMiss += 1
+            raise
+        self.dItem.move_to_end(key)
+        self.nHit += 1
+        return value
+
+    def __setitem__ (self, key, value):
+        if key in self.dItem:
+            self.dItem.move_to_end(key)
+        elif len(self.dItem) >= self.nMaxSize:
+            self.dItem.popitem(last=False)
+            self.nEviction += 1
+        self.dItem[key] = value
+
+    def clear (self):
+        "removes all items and resets counters"
+        self.dItem.clear()
+        self.nHit = 0
+        self.nMiss = 0
+        self.nEviction = 0
+
+    def getStats (self):
+        "returns a dictionary with size, maximum size, hits, misses and evictions"
+        return { "nSize": len(self.dItem), "nMaxSize": self.nMaxSize, "nHit": self.nHit, "nMiss": self.nMiss, "nEviction": self.nEviction }
@@ -0,0 +1,89 @@
+# Word graph as NumPy arrays, for batch lookups
+# License: MPL 2
+
+# This module requires NumPy (optional dependency): see IBDAWG.setNumpyBackend().
+# Only arcs of chars are converted (stemming codes and tags are not needed to check words).
+# Words are looked up all together: at each step, all words go one char further with vectorised operations.
+
+import numpy as np
+
+
+class NumpyDawg:
+    """Arcs of chars of an IBDAWG as arrays (CSR):
+        - aNodeArc:   index of the first arc of each node (arcs of node i are in [aNodeArc[i], aNodeArc[i+1]))
+        - aArcVal:    value of each arc (arcs of each node sorted by value)
+        - aArcNext:   index of the node targeted by each arc
+        - aArcKey:    key of each arc, node * nChar + value (sorted: arcs are found with a binary search)
+        - aNodeFinal: True if node is final
+    The root is the node 0."""
+
+    def __init__ (self, oDict, nChunkSize=200000):
+        self.nChar = oDict.nChar
+        self.nChunkSize = nChunkSize
+        # nodes reached with chars, breadth first
+        dNodeIndex = { 0: 0 }
+        lNodeAddr = [0]
+        lArc = []      # (node index, value, address of next node)
+        for iNode, iAddr in enumerate(lNodeAddr):
+            for nVal, iNextAddr in oDict._getArcs(iAddr):
+                if nVal < self.nChar:
+                    if iNextAddr not in dNodeIndex:
+                        dNodeIndex[iNextAddr] = len(lNodeAddr)
+                        lNodeAddr.append(iNextAddr)
+                    lArc.append((iNode, nVal, iNextAddr))
+        lArc.sort()
+        self.nNode = len(lNodeAddr)
+        self.aNodeFinal = np.array([ bool(oDict._isFinalNode(iAddr))  for iAddr in lNodeAddr ], dtype=np.bool_)
+        aArcNode = np.array([ t[0]  for t in lArc ], dtype=np.int64)
+        self.aArcVal = np.array([ t[1]  for t in lArc ], dtype=np.int64)
+        self.aArcNext = np.array([ dNodeIndex[t[2]]  for t in lArc ], dtype=np.int64)
+        self.aNodeArc = np.searchsorted(aArcNode, np.arange(self.nNode + 1))
+        self.aArcKey = aArcNode * self.nChar + self.aArcVal
+        # char (code point) -> value (-1: unknown char)
+        nMaxCodePoint = max( ord(c)  for c in oDict.dChar )
+        self.aCharVal = np.full(nMaxCodePoint + 1, -1, dtype=np.int64)
+        for c, nVal in oDict.dChar.items():
+            self.aCharVal[ord(c)] = nVal
+
+    def getInfo (self):
+        nBytes = sum( a.nbytes  for a in (self.aNodeArc, self.aArcVal, self.aArcNext, self.aArcKey, self.aNodeFinal, self.aCharVal) )
+        return "  NumPy arrays: {:>10,} nodes,  {:>10,} arcs,  {:>12,} bytes\n".format(self.nNode, len(self.aArcKey), nBytes)
+
+    def lookupArray (self, lWord):
+        "returns an array of booleans: True for words of lWord in dictionary (strict verification)"
+        if not lWord:
+            return np.zeros(0, dtype=np.bool_)
+        return np.concatenate([ self._lookupChunk(lWord[i:i+self.nChunkSize])  for i in range(0, len(lWord), self.nChunkSize) ])
+
+    def lookupBatch (self, lWord):
+        "returns a dictionary {word: True or False} for all words in lWord (strict verification)"
+        lWord = list(set(lWord))
+        return dict(zip(lWord, self.lookupArray(lWord).tolist()))
+
+    def _lookupChunk (self, lWord):
+        # chars of all words -> values, in a matrix (one line per word)
+        aLen = np.fromiter(map(len, lWord), dtype=np.int64, count=len(lWord))
+        aCodePoint = np.frombuffer("".join(lWord).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+        aVal = np.full(len(aCodePoint), -1, dtype=np.int64)
+        bKnown = aCodePoint < len(self.aCharVal)
+        aVal[bKnown] = self.aCharVal[aCodePoint[bKnown]]
+        nMaxLen = int(aLen.max())
+        aStart = np.cumsum(aLen) - aLen
+        aMatrix = np.zeros((len(lWord), max(nMaxLen, 1)), dtype=np.int64)
+        aRow = np.repeat(np.arange(len(lWord)), aLen)
+        aMatrix[aRow, np.arange(len(aVal)) - aStart[aRow]] = aVal
+        # walk: all words still in the graph go one char further at each step
+        aNode = np.zeros(len(lWord), dtype=np.int64)
+        aAlive = np.ones(len(lWord), dtype=np.bool_)
+        for i in range(nMaxLen):
+            aIndex = np.nonzero(aAlive & (aLen > i))[0]
+            if len(aIndex) == 0:
+                break
+            aWordVal = aMatrix[aIndex, i]
+            aKey = aNode[aIndex] * self.nChar + aWordVal
+            aArc = np.searchsorted(self.aArcKey, aKey)
+            aArc[aArc == len(self.aArcKey)] = 0
+            bFound = (self.aArcKey[aArc] == aKey) & (aWordVal > 0)
+            aNode[aIndex] = np.where(bFound, self.aArcNext[aArc], 0)
+            aAlive[aIndex] = bFound
+        return aAlive & self.aNodeFinal[aNode]
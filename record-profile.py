@@ -0,0 +1,46 @@
+#!python3
+
+# Record a profile of lookups: words of a text file go through the dictionary (or paragraphs through the grammar checker)
+# while the dictionary counts transitions of its word graph (see IBDAWG.startProfile).
+# The profile is given to the builder (build-dictionary.py --profile) to sort arcs and nodes.
+
+import argparse
+
+import grammalecte.tokenizer as tkz
+import grammalecte.text as txt
+from grammalecte.ibdawg import IBDAWG
+from grammalecte.echo import echo
+
+
+def main ():
+    xParser = argparse.ArgumentParser()
+    xParser.add_argument("file", help="text file (UTF-8)", type=str)
+    xParser.add_argument("dictionary", help="name of the binary dictionary in grammalecte/_dictionaries (default: french.bdic)", type=str, nargs="?", default="french.bdic")
+    xParser.add_argument("-o", "--output", help="profile to write (default: <dictionary>.profile.txt)", type=str)
+    xParser.add_argument("-g", "--grammar", help="check paragraphs with the grammar checker (default: spelling and morphologies of words)", action="store_true")
+    xArgs = xParser.parse_args()
+
+    oDict = IBDAWG(xArgs.dictionary)
+    echo(oDict.getInfo())
+    with open(xArgs.file, "r", encoding="utf-8") as hSrc:
+        sText = hSrc.read()
+    if xArgs.grammar:
+        import grammalecte.fr as gce
+        gce.load(oDict)
+        oDict.startProfile()
+        for sParagraph in txt.getParagraph(sText):
+            gce.parse(sParagraph)
+    else:
+        oTokenizer = tkz.Tokenizer("fr")
+        oDict.startProfile()
+        for dToken in oTokenizer.genTokens(sText):
+            if dToken["sType"] == "WORD":
+                oDict.isValidToken(dToken["sValue"])
+                oDict.getMorph(dToken["sValue"])
+    oDict.stopProfile()
+    spfDest = xArgs.output or xArgs.dictionary[:xArgs.dictionary.rfind(".")] + ".profile.txt"
+    echo("{:,} transitions written in {}".format(oDict.saveProfile(spfDest), spfDest))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!python3
+
+# Builds of the word graph: whatever the size of sorted runs (streaming) and the number of processes (shards),
+# binary dictionaries must be identical to the ones of the serial build, in memory.
+
+import os
+import tempfile
+import unittest
+
+from grammalecte.dawg import DAWG
+
+from test_ibdawg import writeLexicon, buildDawg, writeBinary
+
+
+class TestBuild (unittest.TestCase):
+
+    @classmethod
+    def setUpClass (cls):
+        cls.oTempDir = tempfile.TemporaryDirectory()
+        cls.spfLexicon = os.path.join(cls.oTempDir.name, "test.lex")
+        writeLexicon(cls.spfLexicon)
+        cls.dBinary = cls._getBinaries(buildDawg(cls.spfLexicon, nRunSize=0, nProcess=1))
+
+    @classmethod
+    def tearDownClass (cls):
+        cls.oTempDir.cleanup()
+
+    @classmethod
+    def _getBinaries (cls, oDawg):
+        "returns {version: binary dictionary (bytes)} of oDawg"
+        dBinary = {}
+        spfDic = os.path.join(cls.oTempDir.name, "test.bdic")
+        for nVersion in range(1, 7):
+            writeBinary(oDawg, spfDic, nVersion)
+            with open(spfDic, "rb") as hSrc:
+                dBinary[nVersion] = hSrc.read()
+        return dBinary
+
+    def _checkBuild (self, **kwargs):
+        dBinary = self._getBinaries(buildDawg(self.spfLexicon, **kwargs))
+        for nVersion in range(1, 7):
+            with self.subTest(version=nVersion):
+                self.assertEqual(dBinary[nVersion], self.dBinary[nVersion])
+
+    def test_streamed (self):
+        # several runs, files of runs made of several blocks
+        nBlockSize = DAWG.nBlockSize
+        DAWG.nBlockSize = 30
+        try:
+            self._checkBuild(nRunSize=100, nProcess=1)
+        finally:
+            DAWG.nBlockSize = nBlockSize
+
+    def test_sharded (self):
+        self._checkBuild(nRunSize=0, nProcess=2)
+
+    def test_streamed_sharded (self):
+        self._checkBuild(nRunSize=100, nProcess=3)
+
+    def test_small_shards (self):
+        # groups of words with the same first char are split by longer prefixes, down to whole words
+        nShardSize = DAWG.nShardSize
+        for DAWG.nShardSize in (1, 3, 20):
+            with self.subTest(nShardSize=DAWG.nShardSize):
+                try:
+                    self._checkBuild(nRunSize=100, nProcess=2)
+                finally:
+                    DAWG.nShardSize = nShardSize
+
+    def test_addresses6 (self):
+        # sizes of nodes calculated again only when offsets may change: every node must fit its offsets
+        oDawg = buildDawg(self.spfLexicon)
+        writeBinary(oDawg, os.path.join(self.oTempDir.name, "test.bdic"), 6)
+        iAddr = 0
+        for oNode in [oDawg.root] + oDawg.sortedNodes:
+            self.assertEqual(oNode.addr, iAddr)
+            self.assertEqual(oNode.getSize6(oDawg.nBytesArc, oDawg.nBytesNodeAddress)[0], oNode.size)
+            iAddr += oNode.size
+
+    def test_gen_shards (self):
+        oDawg = DAWG.__new__(DAWG)
+        oDawg.nShardSize = 4
+        lWord = [ [1, 5, 9], [1, 5, 9], [2, 3, 5, 9], [2, 3, 6, 9], [2, 3, 7, 9], [2, 3, 8, 9], [2, 4, 5, 9], [2, 4, 6, 9], [3, 1, 5, 9] ] \
+                + [ [4, 1, 5, 9] ] * 6
+        lShard = list(oDawg._genShards(iter(lWord)))
+        self.assertEqual([ tPrefix  for tPrefix, _ in lShard ], [ (1,), (2, 3), (2, 4), (3,), (4, 1, 5, 9) ])
+        self.assertEqual([ word  for _, lShardWord in lShard  for word in lShardWord ], lWord)
+        for tPrefix, lShardWord in lShard:
+            self.assertTrue(all( tuple(word[:len(tPrefix)]) == tPrefix  for word in lShardWord ))
+
+
+if __name__ == '__main__':
+    unittest.main()
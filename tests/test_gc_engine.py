@@ -0,0 +1,153 @@
+#!python3
+
+# Suggestions of gender and number of the grammar checker, with the dictionary without index of lemmas
+# (forms are guessed, then checked in the dictionary), and caches of analyses when the dictionary changes.
+
+import unittest
+
+from grammalecte.ibdawg import IBDAWG
+import grammalecte.fr.gc_engine as gce
+
+
+class TestSuggestions (unittest.TestCase):
+
+    lFunc = ["suggPlur", "suggSing", "suggMasSing", "suggMasPlur", "suggFemSing", "suggFemPlur", "switchGender"]
+
+    # word: suggestions of each function of lFunc (sorted, as they are given in any order), as before the index of lemmas
+    dExpected = {
+        "chevals":       ("", "cheval", "", "", "", "", ""),
+        "cheval":        ("chevaux", "", "", "chevaux", "", "", ""),
+        "chevaux":       ("", "cheval", "cheval", "", "", "", ""),
+        "beau":          ("beaux", "", "", "beaux", "belle", "belles", "belle"),
+        "belle":         ("belles", "", "beau|bel", "beaux|bels", "", "belles", "beau|bel"),
+        "beaux":         ("", "beau", "beau", "", "belle", "belles", "belles"),
+        "belles":        ("", "belle", "beau|bel", "beaux|bels", "belle", "", "beaux|bels"),
+        "bel":           ("bels", "be", "be", "bels", "belle", "belles", "belle"),
+        "travail":       ("travaux", "", "", "travaux", "", "", ""),
+        "travails":      ("", "travail", "", "", "", "", ""),
+        "journal":       ("journaux", "", "", "journaux", "", "", ""),
+        "heureux":       ("", "", "", "", "heureuse", "heureuses", "heureuse|heureuses"),
+        "heureuse":      ("heureuses", "", "heureux", "heureux", "", "heureuses", "heureux"),
+        "nouveau":       ("nouveaux", "", "", "nouveaux", "nouvelle", "nouvelles", "nouvelle"),
+        "nouvelle":      ("nouvelles", "", "nouveau|nouvel", "nouveaux|nouvels", "", "nouvelles", "nouveau|nouvel"),
+        "acteur":        ("acteurs", "", "", "acteurs", "actrice", "actrices", "actrice"),
+        "actrice":       ("actrices", "", "acteur", "acteurs", "", "actrices", "acteur"),
+        "actrices":      ("", "actrice", "acteur", "acteurs", "actrice", "", "acteurs"),
+        "directeur":     ("directeurs", "", "", "directeurs", "directrice", "directrices", "directrice"),
+        "directrice":    ("directrices", "", "directeur", "directeurs", "", "directrices", "directeur"),
+        "chanteur":      ("chanteurs", "", "", "chanteurs", "chanteuse", "chanteuses", "chanteuse"),
+        "chanteuse":     ("chanteuses", "", "chanteur", "chanteurs", "", "chanteuses", "chanteur"),
+        "lion":          ("lions", "", "", "lions", "lionne", "lionnes", "lionne"),
+        "lionne":        ("lionnes", "", "lion", "lions", "", "lionnes", "lion"),
+        "neveu":         ("neveux", "", "", "neveux", "", "", ""),
+        "nièce":         ("nièces", "", "", "", "", "nièces", ""),
+        "fou":           ("fous", "", "", "fous", "folle", "folles", "folle"),
+        "folle":         ("folles", "", "fol|fou", "fols|fous", "", "folles", "fol|fou"),
+        "vieux":         ("", "vieil", "vieil", "", "vieille", "vieilles", "vieille|vieilles"),
+        "vieille":       ("vieilles", "", "vieil|vieux", "vieil|vieux", "", "vieilles", "vieil|vieux"),
+        "blanc":         ("blancs", "", "", "blancs", "blanche", "blanches", "blanche"),
+        "blanche":       ("blanches", "", "blanc", "blancs", "", "blanches", "blanc"),
+        "doux":          ("", "dol", "dol", "", "douce", "douces", "douce|douces"),
+        "douce":         ("douces", "", "doux", "doux", "", "douces", "doux"),
+        "long":          ("longs", "", "", "longs", "longue", "longues", "longue"),
+        "longue":        ("longues", "", "long", "longs", "", "longues", "long"),
+        "pommes":        ("", "pomme", "pommé", "pommé", "pomme", "", "pommé"),
+        "pomme":         ("pommes", "", "pommé", "pommé", "", "pommes", "pommé"),
+        "écoles":        ("", "école", "", "", "école", "", ""),
+        "mangeurs":      ("", "mangeur", "mangeur", "", "mangeuse", "mangeuses", "mangeuses"),
+        "mangeuse":      ("mangeuses", "", "mangeur", "mangeurs", "", "mangeuses", "mangeur"),
+        "Cheval":        ("Chevaux", "", "", "Chevaux", "", "", ""),
+        "CHEVAUX":       ("", "", "", "", "", "", ""),
+        "Belles":        ("", "Belle", "beau|bel", "beaux|bels", "Belle", "", "beaux|bels"),
+        "bijou":         ("bijoux", "", "", "bijoux", "", "", ""),
+        "bijoux":        ("", "bijou", "bijou", "", "", "", ""),
+        "hibou":         ("hiboux", "", "", "hiboux", "", "", ""),
+        "genou":         ("genoux", "", "", "genoux", "", "", ""),
+        "oeil":          ("", "", "", "", "", "", ""),
+        "ciel":          ("ciels", "", "", "ciels", "", "", ""),
+        "yeux":          ("", "", "", "", "", "", ""),
+        "festival":      ("festivals", "", "", "festivals", "", "", ""),
+        "bal":           ("bals|baux", "ba", "ba", "bals|baux", "", "", ""),
+        "chacal":        ("chacals", "", "", "chacals", "", "", ""),
+        "gallo-roman":   ("", "", "", "", "gallo-romane", "gallo-romanes", "gallo-romane"),
+        "kilocalories":  ("", "kilocalorie", "", "", "kilocalorie", "", ""),
+        "radar":         ("radars", "rada", "rada", "radars", "", "", ""),
+        "lien":          ("liens", "lie", "lie", "liens", "", "", ""),
+        "aviso":         ("avisos", "avis", "avis", "avisos", "", "", ""),
+        "mangeait":      ("", "mangeai", "mangé", "mangés", "mangée", "mangées", ""),
+        "est":           ("", "es", "es|été", "|été", "", "", ""),
+        "porte-avions":  ("", "", "", "", "", "", ""),
+        "grand-mère":    ("", "", "", "", "", "", ""),
+        "sans-abri":     ("", "", "", "", "", "", ""),
+        "abri":          ("abris", "", "", "abris", "", "", ""),
+        "chef":          ("chefs", "", "", "chefs", "", "chefs", ""),
+        "cheffe":        ("cheffes", "", "", "", "", "cheffes", ""),
+        "docteur":       ("docteurs", "", "", "docteurs", "", "docteurs", ""),
+        "docteure":      ("docteures", "docteur", "", "", "docteur", "docteures", ""),
+        "copain":        ("copains", "", "", "copains", "", "", ""),
+        "copine":        ("copines", "", "copiné", "copiné", "", "copines", "copiné"),
+        "loup":          ("loups", "", "", "loups", "", "", ""),
+        "louve":         ("louves", "", "louvé", "louvés", "|louvée", "louves|louvées", "louvé"),
+        "roi":           ("rois", "", "", "rois", "", "", ""),
+        "reine":         ("reines", "rein", "", "", "rein", "reines", ""),
+    }
+
+    @classmethod
+    def setUpClass (cls):
+        gce.load()
+
+    def test_without_lemma_index (self):
+        self.assertEqual(gce._oDict.getForms("cheval"), ())
+        for sWord, tExpected in self.dExpected.items():
+            gce._storeMorphFromFSA(sWord)
+            for sFuncName, sExpected in zip(self.lFunc, tExpected):
+                with self.subTest(word=sWord, function=sFuncName):
+                    sSugg = getattr(gce, sFuncName)(sWord)
+                    self.assertEqual("|".join(sorted(sSugg.split("|"))), sExpected)
+
+
+class TestDictionaryCaches (unittest.TestCase):
+
+    def setUp (self):
+        self.oDict = IBDAWG("french.bdic")
+        gce.load(self.oDict)
+
+    def tearDown (self):
+        gce.load()
+
+    def test_overlays (self):
+        self.assertFalse(gce._storeMorphFromFSA("zorglub"))
+        self.assertIn("zorglub", gce._dAnalyses)
+        self.assertIn("zorglub", gce._dMorphTuples)
+        # caches are kept while the dictionary does not change
+        gce._checkDictGeneration()
+        self.assertIn("zorglub", gce._dAnalyses)
+        # an overlay is added: caches are emptied, the word is analysed again
+        self.oDict._dLemma = {}     # empty index of lemmas: forms of lemmas are those of overlays
+        self.oDict.addOverlay("test", [("zorglub", "zorglub", ":N:m:s"), ("zorglubs", "zorglub", ":N:m:p")])
+        gce._checkDictGeneration()
+        self.assertEqual(gce._dAnalyses, {})
+        self.assertEqual(gce._dMorphTuples, {})
+        self.assertEqual(gce._dTagGenderNumber, {})
+        self.assertTrue(gce._storeMorphFromFSA("zorglub"))
+        self.assertEqual(gce._dAnalyses["zorglub"], [">zorglub :N:m:s"])
+        self.assertEqual(gce.stem("zorglub"), ["zorglub"])
+        self.assertEqual(gce.suggPlur("zorglub"), "zorglubs")
+        self.assertTrue(gce._dTagGenderNumber)
+        # the overlay is removed: parse() empties caches
+        self.oDict.removeOverlay("test")
+        list(gce.parse("Le cheval mange."))
+        self.assertNotIn("zorglub", gce._dAnalyses)
+        self.assertEqual(gce._dTagGenderNumber, {})
+        self.assertFalse(gce._storeMorphFromFSA("zorglub"))
+        self.assertEqual(gce.stem("zorglub"), [])
+
+    def test_load (self):
+        gce._storeMorphFromFSA("cheval")
+        gce.load(IBDAWG("french.bdic"))
+        self.assertEqual(gce._dAnalyses, {})
+        self.assertEqual(gce._dMorphTuples, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
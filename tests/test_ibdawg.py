@@ -0,0 +1,494 @@
+#!python3
+
+# Round trip of binary dictionaries: a small lexicon is built in memory (DAWG), written in each binary format,
+# then read (IBDAWG): spelling, morphologies and word numbering must match the graph built in memory.
+
+import os
+import sys
+import io
+import re
+import contextlib
+import tempfile
+import shutil
+import itertools
+import unittest
+from unittest import mock
+
+from grammalecte.dawg import DAWG
+from grammalecte.ibdawg import IBDAWG
+from grammalecte import str_transform as st
+
+
+lPrefix = ["cheva", "mang", "écol", "bea", "bel", "pomme", "kilocal", "entr'", "Par"]
+
+
+def writeLexicon (spfLexicon):
+    "writes a lexicon of entries of the French dictionary beginning with prefixes of lPrefix, returns the list of entries"
+    oDict = IBDAWG("french.bdic")
+    lEntry = [ tEntry  for sPrefix in lPrefix  for tEntry in oDict.iterEntries(sPrefix) ]
+    with open(spfLexicon, "w", encoding="utf-8") as hDst:
+        for tEntry in lEntry:
+            hDst.write("\t".join(tEntry) + "\n")
+    return lEntry
+
+
+def buildDawg (spfLexicon, **kwargs):
+    "returns the DAWG of spfLexicon (messages of the builder are discarded)"
+    with contextlib.redirect_stdout(io.StringIO()):
+        return DAWG(spfLexicon, "French", "S", **kwargs)
+
+
+def writeBinary (oDawg, spfDest, nVersion):
+    "writes oDawg as binary dictionary of version nVersion (messages of the builder are discarded)"
+    with contextlib.redirect_stdout(io.StringIO()):
+        oDawg.createBinary(spfDest, nVersion)
+
+
+def getMorphFromGraph (oDawg, sWord):
+    "returns sorted morphologies of sWord in the graph built in memory"
+    oNode = oDawg.root
+    for c in sWord:
+        oNode = oNode.arcs[oDawg.dChar[c]]
+    return sorted( ">" + oDawg.funcStemming(sWord, oDawg.lArcVal[nAff]) + " " + oDawg.lArcVal[nTag]
+                   for nAff, oAffNode in oNode.arcs.items()  if nAff >= oDawg.nChar
+                   for nTag in oAffNode.arcs )
+
+
+# Lexicon, graph and binary dictionaries shared by tests (see setUpModule)
+oTempDir = None
+lEntry = []             # entries of the lexicon (flexion, lemma, tags)
+lFlex = []              # flexions, sorted
+lNotFlex = []           # words not in the lexicon: flexions with a char replaced, removed or added
+oDawg = None            # graph built in memory
+dSpfDic = {}            # {version: path of binary dictionary}
+
+
+def setUpModule ():
+    global oTempDir, lEntry, lFlex, lNotFlex, oDawg
+    oTempDir = tempfile.TemporaryDirectory()
+    spfLexicon = os.path.join(oTempDir.name, "test.lex")
+    lEntry = writeLexicon(spfLexicon)
+    lFlex = sorted(set( sFlex  for sFlex, _, _ in lEntry ))
+    aFlex = set(lFlex)
+    lNotFlex = sorted(set( sWord  for sFlex in lFlex  for sWord in (sFlex[:-1], sFlex + "x", "z" + sFlex[1:])  if sWord not in aFlex ))
+    oDawg = buildDawg(spfLexicon)
+    for nVersion in range(1, 7):
+        dSpfDic[nVersion] = os.path.join(oTempDir.name, "test{}.bdic".format(nVersion))
+        writeBinary(oDawg, dSpfDic[nVersion], nVersion)
+
+
+def tearDownModule ():
+    oTempDir.cleanup()
+
+
+class TestRoundTrip (unittest.TestCase):
+
+    @classmethod
+    def setUpClass (cls):
+        cls.lEntry = lEntry
+        cls.lFlex = lFlex
+        cls.lNotFlex = lNotFlex
+        cls.oDawg = oDawg
+        cls.dSpfDic = dSpfDic
+
+    def _genDictionaries (self):
+        "yields (version, mode, IBDAWG) for each binary format, read as bytes and decoded"
+        for nVersion, spfDic in sorted(self.dSpfDic.items()):
+            for sMode, dParam in (("packed", {}), ("decoded", { "bDecoded": True })):
+                yield nVersion, sMode, IBDAWG(spfDic, **dParam)
+
+    def test_lookup (self):
+        for nVersion, sMode, oDict in self._genDictionaries():
+            with self.subTest(version=nVersion, mode=sMode):
+                self.assertEqual(oDict.nVersion, nVersion)
+                for sWord in self.lFlex + self.lNotFlex:
+                    self.assertEqual(bool(oDict.lookup(sWord)), self.oDawg.lookup(sWord), sWord)
+                for sWord in self.lFlex:
+                    self.assertTrue(oDict.isValid(sWord), sWord)
+
+    def test_morph (self):
+        for nVersion, sMode, oDict in self._genDictionaries():
+            with self.subTest(version=nVersion, mode=sMode):
+                for sWord in self.lFlex:
+                    lMorph = getMorphFromGraph(self.oDawg, sWord)
+                    self.assertEqual(sorted(oDict.morph(sWord)), lMorph, sWord)
+                    self.assertEqual(sorted( oDict.getMorphFromTuple(tMorph)  for tMorph in oDict.getMorphTuples(sWord.lower()) ),
+                                     sorted(oDict.getMorph(sWord.lower())), sWord)
+                    self.assertEqual(sorted(oDict.stem(sWord)), sorted(set( sMorph[1:sMorph.find(" ")]  for sMorph in lMorph )), sWord)
+                for sWord in self.lNotFlex:
+                    self.assertEqual(oDict.morph(sWord), [], sWord)
+
+    def test_entries (self):
+        lEntry = sorted(self.lEntry)
+        for nVersion, sMode, oDict in self._genDictionaries():
+            with self.subTest(version=nVersion, mode=sMode):
+                self.assertEqual(sorted(oDict.iterEntries()), lEntry)
+
+    def test_word_numbering (self):
+        for nVersion, sMode, oDict in self._genDictionaries():
+            with self.subTest(version=nVersion, mode=sMode):
+                self.assertEqual(oDict.countWords(), len(self.lFlex))
+                self.assertEqual(oDict.countWords(), self.oDawg.nWord)
+                lWord = [ oDict.wordAt(i)  for i in range(oDict.countWords()) ]
+                self.assertEqual(sorted(lWord), self.lFlex)
+                for i, sWord in enumerate(lWord):
+                    self.assertEqual(oDict.wordIndex(sWord), i)
+                for sWord in self.lNotFlex:
+                    self.assertIsNone(oDict.wordIndex(sWord))
+                self.assertRaises(IndexError, oDict.wordAt, len(self.lFlex))
+
+
+class TestComplete (unittest.TestCase):
+
+    def _genDictionaries (self):
+        for nVersion in (1, 5):
+            for dParam in ({}, { "bDecoded": True }):
+                yield IBDAWG(dSpfDic[nVersion], **dParam)
+
+    def test_prefix (self):
+        for oDict in self._genDictionaries():
+            for sPrefix in ["", "m", "mang", "écol", "Par", "entr'", "mangeassions", "xyz", "mangx"]:
+                with self.subTest(version=oDict.nVersion, prefix=sPrefix):
+                    lWord = list(oDict.complete(sPrefix, nLimit=len(lFlex), nMaxNode=10**6))
+                    self.assertEqual(sorted(lWord), [ sFlex  for sFlex in lFlex  if sFlex.startswith(sPrefix) ])
+                    # shortest first
+                    self.assertEqual([ len(sWord)  for sWord in lWord ], sorted( len(sWord)  for sWord in lWord ))
+
+    def test_limit (self):
+        for oDict in self._genDictionaries():
+            with self.subTest(version=oDict.nVersion):
+                lAll = list(oDict.complete("m", nLimit=len(lFlex)))
+                for nLimit in (1, 7, 50):
+                    self.assertEqual(list(oDict.complete("m", nLimit=nLimit)), lAll[:nLimit])
+                # lazy: words are yielded one by one
+                iWord = oDict.complete("m", nLimit=len(lFlex))
+                self.assertEqual(next(iWord), lAll[0])
+
+    def test_tags (self):
+        for oDict in self._genDictionaries():
+            for sPattern in [":V", ":N:f:p", ":Ip:3p", ":nothing"]:
+                with self.subTest(version=oDict.nVersion, pattern=sPattern):
+                    zTag = re.compile(sPattern)
+                    dMorph = {}
+                    for sFlex, sLemma, sTags in lEntry:
+                        if sFlex.startswith("m") and zTag.search(sTags):
+                            dMorph.setdefault(sFlex, []).append(">" + sLemma + " " + sTags)
+                    lResult = list(oDict.complete("m", nLimit=len(lFlex), bMorph=True, sTagPattern=sPattern, nMaxNode=10**6))
+                    self.assertEqual(sorted( (sWord, sorted(lMorph))  for sWord, lMorph in lResult ), sorted( (sFlex, sorted(lMorph))  for sFlex, lMorph in dMorph.items() ))
+                    self.assertEqual(list(oDict.complete("m", nLimit=len(lFlex), sTagPattern=sPattern, nMaxNode=10**6)), [ sWord  for sWord, _ in lResult ])
+
+    def test_node_budget (self):
+        oDict = IBDAWG(dSpfDic[1])
+        # no word is found: the walk stops after nMaxNode nodes
+        with mock.patch.object(oDict, "_getArcs", wraps=oDict._getArcs) as xGetArcs:
+            self.assertEqual(list(oDict.complete("", nLimit=10, sTagPattern=":nothing", nMaxNode=100)), [])
+        self.assertEqual(xGetArcs.call_count, 100)
+        self.assertLess(len(list(oDict.complete("", nLimit=len(lFlex), nMaxNode=100))), 100)
+
+
+def getDistance (sWord, sSugg):
+    "returns the edit distance between sWord and sSugg, as getSugg: substitution of similar chars 0.5, transposition 1"
+    d = [ [ i + j  if i == 0 or j == 0  else 0  for j in range(len(sWord)+1) ]  for i in range(len(sSugg)+1) ]
+    for i in range(1, len(sSugg)+1):
+        for j in range(1, len(sWord)+1):
+            c, cw = sSugg[i-1], sWord[j-1]
+            fSubCost = 0  if c == cw  else (0.5  if c in st.dSimilarChars.get(cw, "")  else 1)
+            d[i][j] = min(d[i-1][j] + 1, d[i][j-1] + 1, d[i-1][j-1] + fSubCost)
+            if i > 1 and j > 1 and c == sWord[j-2] and sSugg[i-2] == cw:
+                d[i][j] = min(d[i][j], d[i-2][j-2] + 1)
+    return d[len(sSugg)][len(sWord)]
+
+
+class TestSuggest (unittest.TestCase):
+
+    lWord = ["chevals", "mangait", "mnager", "ecole", "pome", "beaucou", "kilocalorie", "belle", "xyzt", "Paris"]
+
+    @classmethod
+    def setUpClass (cls):
+        cls.oDict = IBDAWG(dSpfDic[5])
+
+    def test_nearest_first (self):
+        for sWord in self.lWord:
+            for nMaxDist in (1, 2):
+                with self.subTest(word=sWord, dist=nMaxDist):
+                    lSugg = self.oDict.getSugg(sWord, nMaxDist=nMaxDist, nMaxSugg=len(lFlex), fMaxTime=100)
+                    # all words within nMaxDist edits, sorted by distance then alphabetically
+                    lExpected = sorted( (getDistance(sWord, sFlex), sFlex)  for sFlex in lFlex  if sFlex != sWord )
+                    self.assertEqual(lSugg, [ sFlex  for fDist, sFlex in lExpected  if fDist <= nMaxDist ])
+
+    def test_max_sugg (self):
+        for sWord in self.lWord:
+            with self.subTest(word=sWord):
+                lSugg = self.oDict.getSugg(sWord, nMaxSugg=len(lFlex), fMaxTime=100)
+                for nMaxSugg in (1, 3, 10):
+                    self.assertEqual(self.oDict.getSugg(sWord, nMaxSugg=nMaxSugg, fMaxTime=100), lSugg[:nMaxSugg])
+
+    def test_transposition (self):
+        self.assertEqual(self.oDict.getSugg("mnager", nMaxDist=1, fMaxTime=100), ["manger"])
+        self.assertEqual(self.oDict.getSugg("mangaeit", nMaxDist=1, fMaxTime=100)[0], "mangeait")
+
+    def test_case (self):
+        self.assertIn("Chevaux", self.oDict.getSugg("Chevaus", fMaxTime=100))
+        self.assertIn("CHEVAUX", self.oDict.getSugg("CHEVAUS", fMaxTime=100))
+        self.assertNotIn("Paris", self.oDict.getSugg("Paris", fMaxTime=100))
+
+    def test_timeout (self):
+        # the search stops after a few checks of time: words found are the nearest ones
+        oDict = IBDAWG("french.bdic")
+        for sWord in ["chevals", "mangait", "ecole"]:
+            with self.subTest(word=sWord):
+                lSugg = oDict.getSugg(sWord, nMaxSugg=1000, fMaxTime=100)
+                with mock.patch("grammalecte.ibdawg.time.perf_counter", side_effect=itertools.count()):
+                    lSuggTimeout = oDict.getSugg(sWord, nMaxSugg=1000, fMaxTime=3)
+                self.assertTrue(lSuggTimeout)
+                self.assertLess(len(lSuggTimeout), len(lSugg))
+                fMaxDist = max( getDistance(sWord, sSugg)  for sSugg in lSuggTimeout )
+                self.assertEqual(sorted(lSuggTimeout), sorted(set(lSuggTimeout) | { sSugg  for sSugg in lSugg  if getDistance(sWord, sSugg) < fMaxDist }))
+                self.assertLessEqual(set(lSuggTimeout), set(lSugg))
+
+
+class TestCache (unittest.TestCase):
+
+    def test_disabled (self):
+        oDict = IBDAWG(dSpfDic[5])
+        self.assertEqual(oDict._dCache, {})
+        with mock.patch.object(oDict, "_morphTuples", wraps=oDict._morphTuples) as xMorphTuples:
+            for _ in range(2):
+                oDict.getMorphTuples("mangeait")
+        self.assertEqual(xMorphTuples.call_count, 2)
+
+    def test_enabled (self):
+        oGraph = IBDAWG(dSpfDic[5])
+        oDict = IBDAWG(dSpfDic[5], nCacheSize=100)
+        self.assertEqual(sorted(oDict._dCache), sorted(IBDAWG._lCachedFunc))
+        for sWord in lFlex + lNotFlex:
+            for sFuncName in IBDAWG._lCachedFunc:
+                self.assertEqual(getattr(oDict, sFuncName)(sWord), getattr(oGraph, sFuncName)(sWord), sWord)
+        with mock.patch.object(oDict, "_morphTuples", wraps=oDict._morphTuples) as xMorphTuples:
+            for _ in range(2):
+                oDict.getMorphTuples("mangeait")
+        self.assertEqual(xMorphTuples.call_count, 1)
+        self.assertLessEqual(len(oDict._dCache["getMorphTuples"]), 100)
+        # disabled again
+        oDict.setCacheSize(0)
+        self.assertEqual(oDict._dCache, {})
+        self.assertEqual(oDict.getMorphTuples("mangeait"), oGraph.getMorphTuples("mangeait"))
+
+
+class TestOverlay (unittest.TestCase):
+
+    lEntry = [ ("zorglub", "zorglub", ":N:m:s"), ("zorglubs", "zorglub", ":N:m:p"), ("Zorglub", "Zorglub", ":M1:m:i"),
+               ("mangeait", "mangeoter", ":V1_i:Iimp:3s"), "blorf" ]
+
+    def _genDictionaries (self):
+        for dParam in ({}, { "bDecoded": True }, { "nCacheSize": 100 }):
+            yield IBDAWG(dSpfDic[5], **dParam)
+
+    def test_add_remove (self):
+        for oDict in self._genDictionaries():
+            with self.subTest(cache=oDict.nCacheSize, version=oDict.nVersion):
+                oGraph = IBDAWG(dSpfDic[5])
+                lWord = ["zorglub", "zorglubs", "Zorglub", "ZORGLUB", "blorf", "mangeait", "Mangeait", "manger"]
+                dBefore = { sWord: (oDict.isValid(sWord), oDict.getMorph(sWord), oDict.getMorphTuples(sWord), oDict.stem(sWord))  for sWord in lWord }
+                nGeneration = oDict.getGeneration()
+                self.assertEqual(oDict.addOverlay("test", self.lEntry), 5)
+                self.assertGreater(oDict.getGeneration(), nGeneration)
+                self.assertEqual(oDict.getOverlays(), [("test", 5)])
+                # new words
+                for sWord in ["zorglub", "zorglubs", "Zorglub", "ZORGLUB", "blorf"]:
+                    self.assertTrue(oDict.isValid(sWord), sWord)
+                self.assertTrue(oDict.lookup("blorf"))
+                self.assertFalse(oDict.lookup("ZORGLUB"))
+                self.assertEqual(oDict.morph("zorglubs"), [">zorglub :N:m:p"])
+                self.assertEqual(oDict.getMorph("ZORGLUB"), [">zorglub :N:m:s", ">Zorglub :M1:m:i"])
+                self.assertEqual(oDict.getMorph("Zorglub"), [">Zorglub :M1:m:i", ">zorglub :N:m:s"])
+                self.assertEqual(oDict.getMorph("blorf"), [])
+                self.assertEqual(oDict.stem("zorglubs"), ["zorglub"])
+                self.assertEqual([ oDict.getMorphFromTuple(tMorph)  for tMorph in oDict.getMorphTuples("Zorglub") ], oDict.getMorph("Zorglub"))
+                # morphologies added to a word of the dictionary, once
+                lMorph = oGraph.getMorph("mangeait")
+                self.assertEqual(oDict.getMorph("mangeait"), lMorph + [">mangeoter :V1_i:Iimp:3s"])
+                self.assertEqual(oDict.morph("mangeait"), oGraph.morph("mangeait") + [">mangeoter :V1_i:Iimp:3s"])
+                self.assertEqual(oDict.getMorph("Mangeait"), lMorph + [">mangeoter :V1_i:Iimp:3s"])
+                self.assertEqual(oDict.getMorphTuples("mangeait")[-1], ("mangeoter", oDict.lArcVal.index(":V1_i:Iimp:3s")))
+                self.assertEqual(oDict.stem("mangeait"), oGraph.stem("mangeait") + ["mangeoter"])
+                self.assertEqual(oDict.getMorphBatch(["mangeait", "zorglub", "xyz"]), [ oDict.getMorph(sWord)  for sWord in ["mangeait", "zorglub", "xyz"] ])
+                self.assertEqual(oDict.lookupBatch(["blorf", "mangeait", "xyz"]), { "blorf": True, "mangeait": True, "xyz": False })
+                # words of overlays removed: same results as before
+                nGeneration = oDict.getGeneration()
+                self.assertTrue(oDict.removeOverlay("test"))
+                self.assertFalse(oDict.removeOverlay("test"))
+                self.assertGreater(oDict.getGeneration(), nGeneration)
+                self.assertEqual(oDict.getOverlays(), [])
+                for sWord in lWord:
+                    self.assertEqual((oDict.isValid(sWord), oDict.getMorph(sWord), oDict.getMorphTuples(sWord), oDict.stem(sWord)), dBefore[sWord], sWord)
+
+    def test_replace (self):
+        oDict = IBDAWG(dSpfDic[5], nCacheSize=100)
+        oDict.addOverlay("test", self.lEntry)
+        self.assertEqual(oDict.addOverlay("test", ["blorf"]), 1)
+        self.assertEqual(oDict.getOverlays(), [("test", 1)])
+        self.assertFalse(oDict.isValid("zorglub"))
+        self.assertTrue(oDict.isValid("blorf"))
+
+    def test_caches (self):
+        # cached results got before overlays change are not returned after
+        oDict = IBDAWG(dSpfDic[5], nCacheSize=100)
+        self.assertFalse(oDict.isValid("zorglub"))
+        self.assertEqual(oDict.getMorphTuples("zorglub"), ())
+        oDict.addOverlay("test", self.lEntry)
+        self.assertTrue(oDict.isValid("zorglub"))
+        self.assertEqual(oDict.getMorph("zorglub"), [">zorglub :N:m:s"])
+        self.assertEqual(len(oDict.getMorphTuples("zorglub")), 1)
+        oDict.removeOverlay("test")
+        self.assertFalse(oDict.isValid("zorglub"))
+        self.assertEqual(oDict.getMorph("zorglub"), [])
+        self.assertEqual(oDict.getMorphTuples("zorglub"), ())
+
+
+def isNumpyAvailable ():
+    "returns True if NumPy can be imported"
+    try:
+        import numpy
+    except ImportError:
+        return False
+    return True
+
+
+class TestBatch (unittest.TestCase):
+
+    @classmethod
+    def setUpClass (cls):
+        # words, casing variants, unknown chars, apostrophes, hyphens, empty string and duplicates
+        cls.lWord = lFlex + lNotFlex + [ sFlex.upper()  for sFlex in lFlex[::7] ] + [ sFlex.capitalize()  for sFlex in lFlex[::5] ] \
+                    + ["mang€", "日本", "écoĺe", "entr’aimer", "", "PARIS", "Paris", "paris", "É", "ÉCOLE", "mange", "mange"]
+        cls.lToken = cls.lWord + ["mange-t-il", "cheval-vapeur", "beau-frère", "pomme-de-terre-x-y-z", "mange-xyz", "-", "bel-"]
+
+    def _genDictionaries (self):
+        "yields (mode, IBDAWG) for binary formats 1 and 5: word graph read as bytes, decoded, and NumPy arrays if NumPy is available"
+        for nVersion in (1, 5):
+            yield "packed", IBDAWG(dSpfDic[nVersion])
+            yield "decoded", IBDAWG(dSpfDic[nVersion], bDecoded=True)
+            if isNumpyAvailable():
+                oDict = IBDAWG(dSpfDic[nVersion], bNumpy=True)
+                self.assertIsNotNone(oDict.oNumpyDawg)
+                yield "numpy", oDict
+                oDict = IBDAWG(dSpfDic[nVersion], bNumpy=True)
+                oDict.oNumpyDawg.nChunkSize = 50
+                yield "numpy (chunks)", oDict
+
+    def test_same_results_as_words (self):
+        oGraph = IBDAWG(dSpfDic[1])
+        lValid = [ oGraph.isValid(sWord)  for sWord in self.lWord ]
+        lValidToken = [ oGraph.isValidToken(sToken)  for sToken in self.lToken ]
+        lMorph = [ oGraph.getMorph(sWord)  if sWord  else []  for sWord in self.lWord ]
+        dLookup = { sWord: bool(oGraph.lookup(sWord))  for sWord in self.lWord }
+        self.assertIn(True, lValid)
+        self.assertIn(False, lValid)
+        for sMode, oDict in self._genDictionaries():
+            with self.subTest(version=oDict.nVersion, mode=sMode):
+                self.assertEqual({ sWord: bool(bFound)  for sWord, bFound in oDict.lookupBatch(self.lWord).items() }, dLookup)
+                self.assertEqual([ bool(bValid)  if bValid is not None  else None  for bValid in oDict.isValidBatch(self.lWord) ],
+                                 [ bool(bValid)  if bValid is not None  else None  for bValid in lValid ])
+                self.assertEqual([ bool(bValid)  for bValid in oDict.isValidTokenBatch(self.lToken) ], [ bool(bValid)  for bValid in lValidToken ])
+                self.assertEqual(oDict.getMorphBatch(self.lWord), lMorph)
+
+    def test_empty (self):
+        for sMode, oDict in self._genDictionaries():
+            with self.subTest(version=oDict.nVersion, mode=sMode):
+                self.assertEqual(oDict.lookupBatch([]), {})
+                self.assertEqual(oDict.isValidBatch([]), [])
+                self.assertEqual(oDict.isValidTokenBatch([]), [])
+                self.assertEqual(oDict.getMorphBatch([]), [])
+
+    def test_numpy_not_available (self):
+        # the import of the NumPy backend fails: batch lookups walk the word graph
+        with mock.patch.dict(sys.modules, { "grammalecte.numpydawg": None }), contextlib.redirect_stdout(io.StringIO()):
+            oDict = IBDAWG(dSpfDic[5], bNumpy=True)
+        self.assertIsNone(oDict.oNumpyDawg)
+        self.assertEqual(oDict.isValidBatch(["mange", "xyz"]), [True, False])
+
+
+class TestBloomFilter (unittest.TestCase):
+
+    def setUp (self):
+        self.spCache = os.path.join(oTempDir.name, "cache")
+
+    def tearDown (self):
+        shutil.rmtree(self.spCache, ignore_errors=True)
+
+    def test_no_false_negative (self):
+        for nVersion in (1, 5, 6):
+            for dParam in ({ "fBloomFalsePositiveRate": 0.01 }, { "fBloomFalsePositiveRate": 0.5, "nMaxBytes": 16 }):
+                with self.subTest(version=nVersion, **dParam):
+                    oGraph = IBDAWG(dSpfDic[nVersion])
+                    oDict = IBDAWG(dSpfDic[nVersion], spCache=self.spCache)
+                    oDict.setBloomFilter(dParam["fBloomFalsePositiveRate"], dParam.get("nMaxBytes", 0))
+                    self.assertIsNotNone(oDict.oBloomFilter)
+                    for sWord in lFlex:
+                        self.assertTrue(oDict.isValid(sWord), sWord)
+                        self.assertTrue(oDict.isValid(sWord.upper()), sWord)
+                        self.assertTrue(oDict.lookup(sWord), sWord)
+                        self.assertEqual(oDict.getMorph(sWord), oGraph.getMorph(sWord), sWord)
+                        self.assertEqual(oDict.getMorphTuples(sWord), oGraph.getMorphTuples(sWord), sWord)
+                    for sWord in lNotFlex:
+                        self.assertEqual(bool(oDict.isValid(sWord)), bool(oGraph.isValid(sWord)), sWord)
+                        self.assertEqual(oDict.getMorph(sWord), oGraph.getMorph(sWord), sWord)
+                    shutil.rmtree(self.spCache)
+
+    def test_rejected (self):
+        oDict = IBDAWG(dSpfDic[5], fBloomFalsePositiveRate=0.01, spCache=self.spCache)
+        nRejected = sum( sWord.lower() not in oDict.oBloomFilter  for sWord in lNotFlex )
+        self.assertGreater(nRejected, len(lNotFlex) * 0.9)
+
+    def test_file (self):
+        IBDAWG(dSpfDic[5], fBloomFalsePositiveRate=0.01, spCache=self.spCache)
+        self.assertTrue(os.path.isfile(os.path.join(self.spCache, "test5.bloom")))
+        # the filter is loaded, not built again, unless parameters differ
+        with mock.patch.object(IBDAWG, "buildBloomFilter", side_effect=AssertionError("filter built")):
+            oDict = IBDAWG(dSpfDic[5], fBloomFalsePositiveRate=0.01, spCache=self.spCache)
+        self.assertTrue(all( oDict.isValid(sWord)  for sWord in lFlex ))
+        with mock.patch.object(IBDAWG, "buildBloomFilter", wraps=oDict.buildBloomFilter) as xBuildBloomFilter:
+            IBDAWG(dSpfDic[5], fBloomFalsePositiveRate=0.02, spCache=self.spCache)
+        xBuildBloomFilter.assert_called_once_with(0.02, 0)
+
+
+class TestMaterialized (unittest.TestCase):
+
+    def setUp (self):
+        self.spCache = os.path.join(oTempDir.name, "cache")
+        self.spfDic = os.path.join(oTempDir.name, "materialized.bdic")
+        shutil.copyfile(dSpfDic[1], self.spfDic)
+
+    def tearDown (self):
+        shutil.rmtree(self.spCache, ignore_errors=True)
+
+    def test_same_results_as_graph (self):
+        oGraph = IBDAWG(self.spfDic)
+        oDict = IBDAWG(self.spfDic, bMaterialized=True, spCache=self.spCache)
+        for sWord in lFlex + lNotFlex + [ sFlex.upper()  for sFlex in lFlex ]:
+            self.assertEqual(bool(oDict.lookup(sWord)), bool(oGraph.lookup(sWord)), sWord)
+            self.assertEqual(bool(oDict.isValid(sWord)), bool(oGraph.isValid(sWord)), sWord)
+            self.assertEqual(oDict.morph(sWord), oGraph.morph(sWord), sWord)
+            self.assertEqual(oDict.getMorph(sWord), oGraph.getMorph(sWord), sWord)
+            self.assertEqual(oDict.stem(sWord), oGraph.stem(sWord), sWord)
+
+    def test_snapshot (self):
+        oDict = IBDAWG(self.spfDic, bMaterialized=True, spCache=self.spCache)
+        self.assertTrue(os.path.isfile(os.path.join(self.spCache, "materialized.mdic")))
+        # the snapshot is loaded: the word graph is not expanded again
+        with mock.patch.object(IBDAWG, "_expandWords", side_effect=AssertionError("snapshot not used")):
+            oDict2 = IBDAWG(self.spfDic, bMaterialized=True, spCache=self.spCache)
+        self.assertEqual(oDict2._dWord, oDict._dWord)
+        # another dictionary with the same name: the snapshot is outdated, the word graph is expanded
+        shutil.copyfile(dSpfDic[3], self.spfDic)
+        with mock.patch.object(IBDAWG, "_expandWords", return_value={}) as xExpandWords:
+            IBDAWG(self.spfDic, bMaterialized=True, spCache=self.spCache)
+        xExpandWords.assert_called_once_with()
+
+    def test_cache_required (self):
+        self.assertRaises(ValueError, IBDAWG, self.spfDic, bMaterialized=True)
+
+
+if __name__ == '__main__':
+    unittest.main()